@@ -0,0 +1,81 @@
+"""
+Micro-benchmark of the per-request allocations of building an ApiGatewayRequestEvent.
+
+The headers, cookies (web session) and body of an ApiGatewayRequestEvent are computed on first access.  Compares the
+memory allocated (and retained by the event) for a route which reads none of them, with one which reads all of them
+(the cost every request paid when they were computed eagerly).
+
+Run from the project root:
+> python -m benchmarks.api_event_allocations
+"""
+import json
+import timeit
+import tracemalloc
+
+from metis_fn import monad
+
+from metis_app import app, app_events
+
+ITERATIONS = 2000
+
+
+@app.route(pattern=('API', 'POST', '/benchmark/lazy/{id}'), opts={'body_parser': json.loads})
+def post_resource(request):
+    return monad.Right(request)
+
+
+def api_event():
+    return {"httpMethod": "POST",
+            "path": "/benchmark/lazy/uuid1",
+            "headers": {**{"X-Header-{}".format(i): "value-{}".format(i) for i in range(20)},
+                        "Content-Type": "application/json",
+                        "Cookie": "session=uuid; theme=dark; locale=en"},
+            "queryStringParameters": None,
+            "isBase64Encoded": False,
+            "body": json.dumps({"items": [{"id": i, "name": "item-{}".format(i)} for i in range(20)]})}
+
+
+def build_only(event):
+    return app_events.event_factory(event)
+
+
+def build_and_read(event):
+    request_event = app_events.event_factory(event)
+    request_event.headers.get('content-type')
+    request_event.body
+    request_event.web_session
+    return request_event
+
+
+def allocations(fn):
+    events = [api_event() for _ in range(ITERATIONS)]
+    fn(events[0])  # warm the route cache and imports
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    retained = [fn(event) for event in events]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, 'filename')
+    size = sum(stat.size_diff for stat in stats)
+    blocks = sum(stat.count_diff for stat in stats)
+    del retained
+    return size / ITERATIONS, blocks / ITERATIONS
+
+
+def report(name, fn):
+    size, blocks = allocations(fn)
+    event = api_event()
+    seconds = min(timeit.repeat(lambda: fn(event), number=ITERATIONS, repeat=3))
+    print("{:<40} {:>8.0f} bytes {:>6.0f} blocks {:>8.1f} us/request".format(name,
+                                                                            size,
+                                                                            blocks,
+                                                                            seconds / ITERATIONS * 1e6))
+
+
+def main():
+    report("event (fields not read)", build_only)
+    report("event (headers, body, session read)", build_and_read)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Micro-benchmark of the per-invocation overhead of the app pipeline.
+
+Compares the "before" pipeline (baseline_pipeline; a copy of app.pipeline as it was before compile_pipeline, which
+built the request a second time when the guard failed) with app.pipeline, which now configures a compiled pipeline on
+every invocation, and with a handler returned by app.compile_pipeline, which is configured once.  Each is run with a
+guard which passes and a guard which fails.
+
+Run from the project root:
+> python -m benchmarks.pipeline_overhead
+"""
+import timeit
+
+from metis_fn import monad
+
+from metis_app import app, app_cors, app_route, app_value, logger
+
+ITERATIONS = 5000
+
+
+class Env:
+    env = "benchmark"
+
+
+def noop(value):
+    return monad.Right(value)
+
+
+def failed_guard(value):
+    return monad.Left(app.AppError(message="guard failure", code=401))
+
+
+@app.route(pattern=('API', 'GET', '/benchmark/resource/{id}'))
+def get_resource(request):
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser({'id': 1}))))
+
+
+def api_event():
+    return {"httpMethod": "GET",
+            "path": "/benchmark/resource/uuid1",
+            "headers": {"Content-Type": "application/json", "Cookie": "session=uuid"},
+            "queryStringParameters": None,
+            "isBase64Encoded": False,
+            "body": None}
+
+
+def baseline_pipeline(event, context, env, params_parser, pip_initiator, handler_guard_fn):
+    """
+    app.pipeline before compile_pipeline; the request is built again (with the guard's error) when the guard fails.
+    """
+    if app_cors.is_preflight(event):
+        return app_cors.preflight_response(event)
+
+    value = app.build_value(event, context, env, None, {})
+
+    if app_route.is_router_rejection(value.value.event.request_function):
+        return app.responder(value >> app.log_start >> app.route_invoker)
+
+    request = pip_initiator(value.value)
+
+    guard_outcome = handler_guard_fn(request)
+
+    if guard_outcome.is_right():
+        result = app.run_pipeline(request=request, params_parser=params_parser)
+    else:
+        result = monad.Left(app.build_value(event=event,
+                                            context=context,
+                                            env=env,
+                                            status_code=app_value.HttpStatusCode(guard_outcome.error().code),
+                                            error=guard_outcome.error()).value)
+    return app.responder(result)
+
+
+def before(guard):
+    return lambda: baseline_pipeline(event=api_event(),
+                                     context=None,
+                                     env=Env(),
+                                     params_parser=noop,
+                                     pip_initiator=noop,
+                                     handler_guard_fn=guard)
+
+
+def per_invocation(guard):
+    return lambda: app.pipeline(event=api_event(),
+                                context=None,
+                                env=Env(),
+                                params_parser=noop,
+                                pip_initiator=noop,
+                                handler_guard_fn=guard)
+
+
+def compiled(guard):
+    handler = app.compile_pipeline(env=Env(), params_parser=noop, pip_initiator=noop, handler_guard_fn=guard)
+    return lambda: handler(api_event(), None)
+
+
+def report(name, fn):
+    fn()  # warm the route cache and imports
+    seconds = min(timeit.repeat(fn, number=ITERATIONS, repeat=3))
+    print("{:<40} {:>8.1f} us/invocation".format(name, seconds / ITERATIONS * 1e6))
+
+
+def main():
+    logger.LogConfig().configure(level='error')
+    report("before: pipeline (guard ok)", before(noop))
+    report("after: pipeline (guard ok)", per_invocation(noop))
+    report("after: compile_pipeline (guard ok)", compiled(noop))
+    report("before: pipeline (guard failure)", before(failed_guard))
+    report("after: pipeline (guard failure)", per_invocation(failed_guard))
+    report("after: compile_pipeline (guard failure)", compiled(failed_guard))
+
+
+if __name__ == '__main__':
+    main()
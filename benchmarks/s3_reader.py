@@ -0,0 +1,92 @@
+"""
+Benchmark of streaming an S3 object (app_s3_reader) against reading the whole object with get_object()['Body'].read(),
+for a large JSON lines object.
+
+Throughput is measured against moto.  moto materialises the whole object on every (ranged) GET, so the memory
+comparison uses an in-memory client which serves ranges without copying the object, to measure only what the reader
+holds.
+
+Run from the project root:
+> python -m benchmarks.s3_reader
+"""
+import io
+import json
+import os
+import time
+import tracemalloc
+
+import boto3
+from moto import mock_aws
+
+from metis_app import app_s3_reader
+
+OBJECT_MB = 32
+CHUNK_SIZE = 8 * 1024 * 1024
+BUCKET = 'benchmark'
+KEY = 'records.jsonl'
+
+
+class InMemoryClient:
+    def __init__(self, body: bytes):
+        self.body = memoryview(body)
+
+    def head_object(self, Bucket, Key):
+        return {'ContentLength': len(self.body)}
+
+    def get_object(self, Bucket, Key, Range=None):
+        if Range is None:
+            return {'Body': io.BytesIO(self.body)}
+        first, last = Range.removeprefix('bytes=').split('-')
+        return {'Body': io.BytesIO(self.body[int(first):int(last) + 1])}
+
+
+def jsonl_object(size_mb: int) -> bytes:
+    line = (json.dumps({'id': 0, 'name': 'x' * 80, 'amount': 12.5}) + "\n").encode('utf-8')
+    return line * (size_mb * 1024 * 1024 // len(line))
+
+
+def whole_object(client) -> int:
+    body = client.get_object(Bucket=BUCKET, Key=KEY)['Body'].read()
+    return sum(1 for line in body.decode('utf-8').splitlines() if json.loads(line))
+
+
+def streamed_object(client) -> int:
+    return sum(1 for record in app_s3_reader.iter_records(BUCKET, KEY, client=client, chunk_size=CHUNK_SIZE)
+               if record)
+
+
+def throughput(fn, client, size: int):
+    start = time.perf_counter()
+    records = fn(client)
+    elapsed = time.perf_counter() - start
+    return records, size / (1024 * 1024) / elapsed
+
+
+def peak_memory(fn, client) -> int:
+    tracemalloc.start()
+    fn(client)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'benchmark')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark')
+    body = jsonl_object(OBJECT_MB)
+    with mock_aws():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket=BUCKET)
+        client.put_object(Bucket=BUCKET, Key=KEY, Body=body)
+        print("{} MB object; chunk size {} MB, read ahead {}".format(
+            OBJECT_MB, CHUNK_SIZE // (1024 * 1024), app_s3_reader.DEFAULT_READ_AHEAD))
+        for name, fn in (('whole object', whole_object), ('streamed', streamed_object)):
+            records, mb_per_s = throughput(fn, client, len(body))
+            print("{:>14}: {} records, {:8.1f} MB/s (moto)".format(name, records, mb_per_s))
+    in_memory = InMemoryClient(body)
+    for name, fn in (('whole object', whole_object), ('streamed', streamed_object)):
+        print("{:>14}: peak {:8.1f} MB allocated".format(name, peak_memory(fn, in_memory) / (1024 * 1024)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Micro-benchmark of compiled JSON schema validation (app_schema.compile_schema) against interpreting the schema for
+each request, on the largest request payload shapes (an order with many lines).
+
+The interpreter below walks the schema dict on every validation, as hand written or generic validators do; it
+supports the same keywords used by the benchmark schema.
+
+Run from the project root:
+> python -m benchmarks.schema_validation
+"""
+import re
+import timeit
+
+from metis_app import app_schema
+
+ITERATIONS = 200
+
+ORDER_SCHEMA = {
+    'type': 'object',
+    'required': ['id', 'customer', 'lines'],
+    'additionalProperties': False,
+    'properties': {
+        'id': {'type': 'string', 'pattern': '^ord-[0-9]+$'},
+        'customer': {'type': 'object',
+                     'required': ['id', 'email'],
+                     'properties': {'id': {'type': 'string'},
+                                    'email': {'type': 'string', 'pattern': '^[^@]+@[^@]+$'},
+                                    'tier': {'enum': ['standard', 'gold', 'platinum']}}},
+        'lines': {'type': 'array',
+                  'minItems': 1,
+                  'items': {'type': 'object',
+                            'required': ['sku', 'qty', 'price'],
+                            'additionalProperties': False,
+                            'properties': {'sku': {'type': 'string', 'pattern': '^[A-Z]{3}-[0-9]+$'},
+                                           'qty': {'type': 'integer', 'minimum': 1, 'maximum': 1000},
+                                           'price': {'type': 'number', 'exclusiveMinimum': 0},
+                                           'tags': {'type': 'array', 'items': {'type': 'string'}}}}}}}
+
+TYPES = {'object': dict, 'array': list, 'string': str, 'integer': int, 'number': (int, float)}
+
+
+def interpret(schema, instance, path="$", violations=None):
+    violations = [] if violations is None else violations
+    for keyword, value in schema.items():
+        if keyword == 'type' and not isinstance(instance, TYPES[value]):
+            violations.append({'path': path, 'keyword': keyword})
+        elif keyword == 'enum' and instance not in value:
+            violations.append({'path': path, 'keyword': keyword})
+        elif keyword == 'pattern' and isinstance(instance, str) and not re.search(value, instance):
+            violations.append({'path': path, 'keyword': keyword})
+        elif keyword == 'minimum' and isinstance(instance, (int, float)) and instance < value:
+            violations.append({'path': path, 'keyword': keyword})
+        elif keyword == 'maximum' and isinstance(instance, (int, float)) and instance > value:
+            violations.append({'path': path, 'keyword': keyword})
+        elif keyword == 'exclusiveMinimum' and isinstance(instance, (int, float)) and instance <= value:
+            violations.append({'path': path, 'keyword': keyword})
+        elif keyword == 'minItems' and isinstance(instance, list) and len(instance) < value:
+            violations.append({'path': path, 'keyword': keyword})
+        elif keyword == 'required' and isinstance(instance, dict):
+            violations.extend({'path': path, 'keyword': keyword} for name in value if name not in instance)
+        elif keyword == 'additionalProperties' and value is False and isinstance(instance, dict):
+            violations.extend({'path': path, 'keyword': keyword}
+                              for name in instance if name not in schema.get('properties', {}))
+        elif keyword == 'properties' and isinstance(instance, dict):
+            for name, sub_schema in value.items():
+                if name in instance:
+                    interpret(sub_schema, instance[name], "{}.{}".format(path, name), violations)
+        elif keyword == 'items' and isinstance(instance, list):
+            for i, item in enumerate(instance):
+                interpret(value, item, "{}[{}]".format(path, i), violations)
+    return violations
+
+
+def order(lines: int):
+    return {'id': 'ord-1',
+            'customer': {'id': 'c1', 'email': 'c1@example.com', 'tier': 'gold'},
+            'lines': [{'sku': 'ABC-{}'.format(i), 'qty': i % 10 + 1, 'price': 9.95, 'tags': ['a', 'b']}
+                      for i in range(lines)]}
+
+
+def report(name, fn):
+    seconds = min(timeit.repeat(fn, number=ITERATIONS, repeat=3))
+    print("{:<40} {:>8.1f} us/validation".format(name, seconds / ITERATIONS * 1e6))
+
+
+def main():
+    validator = app_schema.compile_schema(ORDER_SCHEMA)
+    for lines in [10, 100, 1000]:
+        instance = order(lines)
+        assert validator(instance) == [] and interpret(ORDER_SCHEMA, instance) == []
+        report("interpreted ({} lines)".format(lines), lambda: interpret(ORDER_SCHEMA, instance))
+        report("compiled ({} lines)".format(lines), lambda: validator(instance))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,5 @@
+import base64
+import inspect
 from functools import reduce
 from aws_lambda_powertools.utilities.data_classes import (
     S3Event,
@@ -5,7 +7,7 @@ from aws_lambda_powertools.utilities.data_classes import (
     KafkaEvent)
 from aws_lambda_powertools.utilities.data_classes.s3_event import S3EventRecord
 
-from typing import Callable, Any, Type
+from typing import Callable, Any, Tuple, Type
 
 from metis_fn import monad, fn, chronos
 from . import (env as environment,
@@ -14,6 +16,15 @@ from . import (env as environment,
                app_events,
                app_value,
                app_route,
+               app_cors,
+               app_async,
+               app_compression,
+               app_etag,
+               app_api_source,
+               app_schema,
+               app_warmer,
+               app_idempotency,
+               app_response_cache,
                app_serialisers, observable)
 
 DEFAULT_SUCCESS_HTTP_CODE = 200
@@ -51,6 +62,10 @@ property (dict) which will extract the templated arguments; for example:
 
 > {'id': uuid1}     
 
+Templated segments can be typed; e.g. ('API', 'GET', '/resourceBase/resource/{id:int}'), with int, float, uuid, and 
+re:{regex} (e.g. '{slug:re:[a-z-]+}') supported.  The path param is provided converted to the type.  A path whose segment
+is not valid for the type is rejected with a 400 before the PIP, the guard, or the route function are called.
+
  
 
 app.pipeline
@@ -65,9 +80,10 @@ The main event pipeline handler.  Your lambda initiates the pipeline by calling
 
 It parses the event, using hints within the event to determine the app.route to be called.
 + S3 events.  The object S3StateChangeEvent is created with a collection of S3Object.  S3StateChangeEvent.kind is 
-              used to determine the app.route symbol.  The fn domain_from_bucket_name() collects the unique bucket names
-              (there should only be one), and takes the most significant part based on the default separator (DEFAULT_S3_BUCKET_SEP)
-              This then is the symbol expected on an app.route.  
+              used to determine the app.route symbol.  Each object is first matched against any pattern routes
+              for its bucket, e.g. ('S3', 'bucket-name', 'incoming/*.csv').  Otherwise the most significant part of
+              the bucket name, based on the default separator (DEFAULT_S3_BUCKET_SEP), is the symbol expected on an
+              app.route.  When the objects match different routes, each route is invoked with its own objects.
 
 On Errors.  Remember when you want your handler to generate an error that is parsable by the responder:
 + Use the request.error property to hold the error.
@@ -84,19 +100,41 @@ ApiGatewayRequestEvent = app_value.ApiGatewayRequestEvent
 S3StateChangeEvent = app_value.S3StateChangeEvent
 S3Object = app_value.S3Object
 KafkaRecordsEvent = app_value.KafkaRecordsEvent
+SqsMessagesEvent = app_value.SqsMessagesEvent
+DynamoStreamEvent = app_value.DynamoStreamEvent
 EventBridgePublishEvent = app_value.EventBridgePublishEvent
+WarmerEvent = app_value.WarmerEvent
 
 Serialiser = app_serialisers.SerialiserProtocol
 DictToJsonSerialiser = app_serialisers.DictToJsonSerialiser
+BinarySerialiser = app_serialisers.BinarySerialiser
 DictToJsonLDSerialiser = app_serialisers.DictToJsonLDSerialiser
 
 AppError = app_value.AppError
 
+CorsConfig = app_cors.CorsConfig
+CompressionConfig = app_compression.CompressionConfig
+
 
 def route(pattern, opts=None):
     return app_route.route(pattern, opts)
 
 
+def route_ref(pattern, reference: str, opts=None):
+    """
+    Registers a route whose function is imported on first dispatch; e.g.
+    > app.route_ref(('API', 'GET', '/orders/{id}'), 'svc.orders:get_order')
+    """
+    return app_route.route_ref(pattern, reference, opts)
+
+
+def preload_routes():
+    """
+    Eagerly imports every route registered with route_ref.
+    """
+    return app_route.preload_routes()
+
+
 def pipeline(event: dict,
              context: dict,
              env: environment.EnvironmentProtocol,
@@ -119,31 +157,175 @@ def pipeline(event: dict,
                                           s3 override provide a dict in the form of {'s3': callable_function}
     + handler_guard_fn: A pre-processing guard fn to determine whether the handler should be invoked.  It returns an Either.  When the handler
                         shouldnt run the Either wraps an Exception.  In this case, the request is passed directly to the responder
+
+    The pipeline is configured on every call.  To configure it once, at module import, use compile_pipeline.
+    """
+    return compile_pipeline(env=env,
+                            params_parser=params_parser,
+                            pip_initiator=pip_initiator,
+                            handler_guard_fn=handler_guard_fn,
+                            event_source_cls=event_source_cls,
+                            factory_overrides=factory_overrides)(event, context)
+
+
+def compile_pipeline(env: environment.EnvironmentProtocol,
+                     params_parser: Callable,
+                     pip_initiator: Callable,
+                     handler_guard_fn: Callable,
+                     event_source_cls: Type[S3Event | APIGatewayProxyEvent] | None = None,
+                     factory_overrides: dict = None) -> Callable[[dict, Any], dict]:
+    """
+    Configures the pipeline once and returns a handler(event, context) fn which runs it.  The args are the same as
+    for pipeline.  The stages (with the params_parser) are composed into a tuple, and the Observer is resolved, when the
+    pipeline is compiled, so configure the Observer before compiling.  That, and not building the request a second
+    time when the guard fails, is the whole saving; the request (and its tracer) is still built for each invocation.
+
+    > handler = app.compile_pipeline(env=env.Env(),
+    >                                params_parser=request_builder,
+    >                                pip_initiator=pip,
+    >                                handler_guard_fn=check_env_established)
     """
+    overrides = factory_overrides if factory_overrides else {}
+    observer = _configured_observer()
+    stages = pipeline_stages(params_parser)
+
+    def handler(event: dict, context: Any) -> dict:
+        if app_warmer.is_warmer(event):
+            # A warmer event is answered with a static response, without the tracer, PIP, guard or logs.
+            return app_warmer.warm()
+
+        if app_cors.is_preflight(event):
+            # CORS preflight is answered from the route table, without building the request.
+            return app_cors.preflight_response(event)
+
+        request = _build_request(event, context, env, event_source_cls, overrides, observer)
+
+        if app_route.is_router_rejection(request.event.request_function):
+            # The router has rejected the path (e.g. a typed path param is invalid); no need for the PIP or the guard.
+            return responder(monad.Right(request) >> log_start >> route_invoker)
 
-    request = pip_initiator(build_value(event,
-                                        context,
-                                        env,
-                                        event_source_cls,
-                                        factory_overrides if factory_overrides else {}).value)
+        return responder(_guarded_pipeline(request, stages, pip_initiator, handler_guard_fn))
 
-    guard_outcome = handler_guard_fn(request)
+    return handler
+
+
+def _guarded_pipeline(request: app_value.Request,
+                      stages: Tuple[Callable, ...],
+                      pip_initiator: Callable,
+                      handler_guard_fn: Callable) -> monad.EitherMonad[app_value.Request]:
+    pip_request = pip_initiator(request)
+
+    guard_outcome = handler_guard_fn(pip_request)
 
     if guard_outcome.is_right():
-        result = run_pipeline(request=request,
-                              params_parser=params_parser)
-    else:
-        result = monad.Left(build_value(event=event,
-                                        context=context,
-                                        env=env,
-                                        status_code=app_value.HttpStatusCode(guard_outcome.error().code),
-                                        error=guard_outcome.error()).value)
-    return responder(result)
+        return _run_stages(pip_request, stages)
+    return monad.Left(request.replace('status_code', app_value.HttpStatusCode(guard_outcome.error().code))
+                      .replace('error', guard_outcome.error()))
 
 
 def run_pipeline(request: monad.EitherMonad[app_value.Request],
                  params_parser: Callable):
-    return request >> log_start >> params_parser >> route_invoker
+    return _run_stages(request, pipeline_stages(params_parser))
+
+
+def pipeline_stages(params_parser: Callable) -> Tuple[Callable, ...]:
+    return (log_start,
+            app_response_cache.lookup,
+            parse_body,
+            app_schema.validate_body,
+            params_parser,
+            app_idempotency.claim,
+            route_invoker)
+
+
+def _run_stages(request: monad.EitherMonad[app_value.Request],
+                stages: Tuple[Callable, ...]) -> monad.EitherMonad[app_value.Request]:
+    """
+    The equivalent of request >> stage1 >> stage2 ...; each stage is called directly, stopping at the first Left.
+    """
+    result = request
+    for stage in stages:
+        if result.is_left():
+            return result
+        result = stage(result.value)
+    return result
+
+
+def pipeline_async(event: dict,
+                   context: dict,
+                   env: environment.EnvironmentProtocol,
+                   params_parser: Callable,
+                   pip_initiator: Callable,
+                   handler_guard_fn: Callable,
+                   event_source_cls: Type[S3Event | APIGatewayProxyEvent] | None = None,
+                   factory_overrides: dict = None) -> dict:
+    """
+    As pipeline, but params_parser, pip_initiator, handler_guard_fn and the route functions may be coroutine fns
+    (async def).  Each still returns a monad.MEither.  The pipeline is run on the container's event loop
+    (app_async.EventLoop), which persists across warm invocations, so route functions can await concurrent downstream
+    calls (e.g. asyncio.gather).  Call this from the (sync) Lambda handler.
+    """
+    return compile_pipeline_async(env=env,
+                                  params_parser=params_parser,
+                                  pip_initiator=pip_initiator,
+                                  handler_guard_fn=handler_guard_fn,
+                                  event_source_cls=event_source_cls,
+                                  factory_overrides=factory_overrides)(event, context)
+
+
+def compile_pipeline_async(env: environment.EnvironmentProtocol,
+                           params_parser: Callable,
+                           pip_initiator: Callable,
+                           handler_guard_fn: Callable,
+                           event_source_cls: Type[S3Event | APIGatewayProxyEvent] | None = None,
+                           factory_overrides: dict = None) -> Callable[[dict, Any], dict]:
+    """
+    The async equivalent of compile_pipeline.  The returned handler(event, context) is a sync fn which runs the
+    pipeline on the container's event loop.  The coroutine is available as handler.coroutine(event, context), for
+    callers which already have a running loop.
+    """
+    overrides = factory_overrides if factory_overrides else {}
+    observer = _configured_observer()
+    stages = pipeline_stages(params_parser)
+
+    async def coroutine(event: dict, context: Any) -> dict:
+        if app_warmer.is_warmer(event):
+            return app_warmer.warm()
+
+        if app_cors.is_preflight(event):
+            return app_cors.preflight_response(event)
+
+        request = _build_request(event, context, env, event_source_cls, overrides, observer)
+
+        if app_route.is_router_rejection(request.event.request_function):
+            return await responder_async(app_async.pipe(monad.Right(request), log_start, route_invoker))
+
+        return await responder_async(_guarded_pipeline_async(request, stages, pip_initiator, handler_guard_fn))
+
+    def handler(event: dict, context: Any) -> dict:
+        return app_async.EventLoop().run(coroutine(event, context))
+
+    handler.coroutine = coroutine
+    return handler
+
+
+async def _guarded_pipeline_async(request: app_value.Request,
+                                  stages: Tuple[Callable, ...],
+                                  pip_initiator: Callable,
+                                  handler_guard_fn: Callable) -> monad.EitherMonad[app_value.Request]:
+    pip_request = await app_async.resolve(pip_initiator(request))
+
+    guard_outcome = await app_async.resolve(handler_guard_fn(pip_request))
+
+    if guard_outcome.is_right():
+        return await app_async.pipe(pip_request, *stages)
+    return monad.Left(request.replace('status_code', app_value.HttpStatusCode(guard_outcome.error().code))
+                      .replace('error', guard_outcome.error()))
+
+
+async def run_pipeline_async(request: monad.EitherMonad[app_value.Request],
+                             params_parser: Callable) -> monad.EitherMonad[app_value.Request]:
+    return await app_async.pipe(request, *pipeline_stages(params_parser))
 
 
 def build_value(event,
@@ -156,20 +338,84 @@ def build_value(event,
     """
     Initialises the app_value.Request object to be passed to the pipeline
     """
-    req = app_value.Request(event=app_events.event_factory(event, factory_overrides, event_source_cls),
-                            context=context,
-                            tracer=init_tracer(env=env, aws_context=context),
-                            event_time=chronos.time_now(tz=chronos.tz_utc()),
-                            observer=observable.Observer() if observable.Observer().is_configured else None,
-                            pip=None,
-                            response=None,
-                            status_code=status_code,
-                            error=error)
-    return monad.Right(req)
+    return monad.Right(_build_request(event,
+                                      context,
+                                      env,
+                                      event_source_cls,
+                                      factory_overrides,
+                                      _configured_observer(),
+                                      status_code,
+                                      error))
+
+
+def _build_request(event,
+                   context,
+                   env,
+                   event_source_cls,
+                   factory_overrides: dict,
+                   observer: observable.Observer | None,
+                   status_code: app_value.HttpStatusCode = None,
+                   error=None) -> app_value.Request:
+    return app_value.Request(event=app_events.event_factory(event, factory_overrides, event_source_cls),
+                             context=context,
+                             tracer=init_tracer(env=env, aws_context=context),
+                             event_time=chronos.time_now(tz=chronos.tz_utc()),
+                             observer=observer,
+                             pip=None,
+                             response=None,
+                             status_code=status_code,
+                             error=error)
+
+
+def _configured_observer() -> observable.Observer | None:
+    observer = observable.Observer()
+    return observer if observer.is_configured else None
 
 
 def route_invoker(request):
-    return request.event.request_function(request=request)
+    if (not_modified := app_etag.not_modified_precondition(request)):
+        return not_modified
+    if app_idempotency.is_replay(request) or app_response_cache.is_hit(request):
+        # A duplicate of a completed idempotent request, or a cached response; the response is already on the request.
+        return monad.Right(request)
+    try:
+        result = request.event.request_function(request=request)
+    except app_value.RequestBodyError as e:
+        # The body, decoded when the route fn read it, is malformed.
+        return app_value.failed_request(request, monad.Left(e))
+    except Exception:
+        # Release the idempotency claim, so a redelivery of the event is not rejected as in progress.
+        app_idempotency.settle(monad.Left(request))
+        raise
+    if inspect.isawaitable(result):
+        return _settled_on_raise(request, result)
+    return app_value.failed_request(request, result)
+
+
+async def _settled_on_raise(request, result):
+    try:
+        return app_value.failed_request(request, await result)
+    except app_value.RequestBodyError as e:
+        return app_value.failed_request(request, monad.Left(e))
+    except Exception:
+        app_idempotency.settle(monad.Left(request))
+        raise
+
+
+def parse_body(request):
+    """
+    Parses the body, before the body is validated or the route fn invoked, when the route's body_parser opts in with
+    parse_event (e.g. app_multipart.MultipartParser, which enforces its size limits).  Other body parsers run when
+    request.event.body is first read.  A RequestBodyError raised by the parser (e.g. a 413 when the body exceeds the
+    parser's limits) becomes a Left with the error's status code.
+    """
+    if not hasattr(getattr(request.event, 'body_parser', None), 'parse_event'):
+        return monad.Right(request)
+    try:
+        request.event.body
+    except app_value.RequestBodyError as e:
+        return app_value.failed_request(request, monad.Left(e))
+    return monad.Right(request)
 
 
 def template_from_route_fn(route_fn: Callable) -> str | tuple:
@@ -203,7 +449,15 @@ def responder(request_or_error: monad.Either) -> dict:
     return _body_from_pipeline_response(request_or_error)
 
 
+async def responder_async(request_or_error: monad.Either | Any) -> dict:
+    """
+    As responder, but accepts the pipeline outcome as an awaitable.
+    """
+    return responder(await app_async.resolve(request_or_error))
+
+
 def _body_from_pipeline_response(request):
+    request = app_response_cache.store(app_idempotency.settle(request))
     response = {'multiValueHeaders': build_multi_headers(request.lift().event)}
 
     if request.is_right() and request.value.response.is_right():
@@ -230,11 +484,60 @@ def _body_from_pipeline_response(request):
         response['body'] = body.serialise()
         status = 'fail'
 
-    logger.info(msg="End Handler", tracer=request.lift().tracer, status=status)
+    response_ctx = {**_apply_api_response_rules(request.lift().event, response),
+                    **app_idempotency.log_ctx(request.lift()),
+                    **app_response_cache.log_ctx(request.lift())}
+    _encode_binary_body(response)
+
+    if (failures := request.lift().batch_item_failures) is not None:
+        # The partial batch failure response, so only the failed records are redelivered.
+        response['batchItemFailures'] = failures
+        response_ctx = {**response_ctx, 'batch_item_failures': len(failures)}
+
+    logger.info(msg="End Handler", tracer=request.lift().tracer, status=status, **response_ctx)
 
     return response
 
 
+def _apply_api_response_rules(event: app_value.RequestEvent, response: dict) -> dict:
+    """
+    Applies the API body rules, and then reshapes the response for the API source (REST API, HTTP API or ALB).
+    Returns additional context for the End Handler log.
+    """
+    if not isinstance(event, app_value.ApiGatewayRequestEvent):
+        return {}
+    response_ctx = _apply_api_body_rules(event, response)
+    app_api_source.shape_response(event.api_source, response, event.multi_value_headers)
+    return response_ctx
+
+
+def _apply_api_body_rules(event: app_value.ApiGatewayRequestEvent, response: dict) -> dict:
+    """
+    Adds the CORS headers to API responses, applies the ETag (which may convert the response to a 304), drops the body
+    from a HEAD response, and otherwise compresses the body when negotiated (with the content coding on the ETag).
+    """
+    if (cors_headers := app_cors.origin_response_headers(event.headers.get('origin', None))):
+        response['headers'] = {**response['headers'], **cors_headers}
+    etag_ctx = app_etag.apply_etag(event, response)
+    if event.method == 'HEAD' or not response['body']:
+        response['body'] = ''
+        return etag_ctx
+    compression_ctx = app_compression.compress_response(response,
+                                                        event.headers.get('accept-encoding', None),
+                                                        event.route_opts)
+    app_etag.apply_content_coding(response)
+    return {**etag_ctx, **compression_ctx}
+
+
+def _encode_binary_body(response: dict):
+    """
+    A binary body (e.g. from a BinarySerialiser) is base64 encoded once, directly from its buffer.
+    """
+    if isinstance(response.get('body', None), (bytes, bytearray, memoryview)):
+        response['body'] = base64.b64encode(response['body']).decode('ascii')
+        response['isBase64Encoded'] = True
+
+
 def _body_from_base_error(error: AppError):
     body = {'headers': {}, 'multiValueHeaders': {}}
     body['statusCode'] = error.code
@@ -258,7 +561,8 @@ def build_headers(hdrs: dict | None = None, returning_serialiser: Any | None = N
     if not hdrs and not returning_serialiser:
         return {}
     provided_headers = hdrs if hdrs else {}
-    body_content_type = {'Content-Type': returning_serialiser.content_type} if returning_serialiser else {}
+    body_content_type = {'Content-Type': returning_serialiser.content_type} if (
+            returning_serialiser and returning_serialiser.content_type) else {}
     return {**provided_headers, **body_content_type}
 
 
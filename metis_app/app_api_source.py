@@ -0,0 +1,91 @@
+from http import HTTPStatus
+from typing import Dict, Optional, Tuple
+
+"""
+The API sources which map onto an ApiGatewayRequestEvent, and the response shape for each.
+
++ rest. API Gateway REST API (payload v1): httpMethod, path, headers and multiValueHeaders.
++ http. API Gateway HTTP API (payload v2): requestContext.http, rawPath, and a cookies array.  Set-Cookie headers are
+  returned in the cookies array of the response, and other multi-value headers are comma joined.
++ alb.  An Application Load Balancer target: requestContext.elb.  The response includes a statusDescription and
+  isBase64Encoded, and uses multiValueHeaders only when the target group has multi-value headers enabled (in which case
+  the request has multiValueHeaders).  Without multi-value headers only the last Set-Cookie is returned.
+"""
+
+REST_API = 'rest'
+HTTP_API = 'http'
+ALB = 'alb'
+
+
+def source_of(event: dict) -> Optional[str]:
+    """
+    The API source of a raw Lambda event; None when the event is not an API event.
+    """
+    request_context = event.get('requestContext', None) or {}
+    if 'elb' in request_context:
+        return ALB
+    if 'http' in request_context and 'rawPath' in event:
+        return HTTP_API
+    if 'httpMethod' in event:
+        return REST_API
+    return None
+
+
+def method_and_path(event: dict) -> Tuple[Optional[str], Optional[str]]:
+    """
+    The method and path of a raw Lambda API event.
+    """
+    if source_of(event) == HTTP_API:
+        return event['requestContext']['http'].get('method', None), event.get('rawPath', None)
+    return event.get('httpMethod', None), event.get('path', None)
+
+
+def shape_response(source: Optional[str], response: dict, multi_value_headers: bool = False) -> dict:
+    """
+    Reshapes a (REST API shaped) response for the API source.
+    """
+    match source:
+        case 'http':
+            return _http_api_response(response)
+        case 'alb':
+            return _alb_response(response, multi_value_headers)
+        case _:
+            return response
+
+
+def _http_api_response(response: dict) -> dict:
+    multi_headers = dict(response.pop('multiValueHeaders', None) or {})
+    if (cookies := multi_headers.pop('Set-Cookie', None)):
+        response['cookies'] = cookies
+    if multi_headers:
+        response['headers'] = {**(response.get('headers', None) or {}),
+                               **{name: ",".join(values) for name, values in multi_headers.items()}}
+    return response
+
+
+def _alb_response(response: dict, multi_value_headers: bool) -> dict:
+    headers = response.pop('headers', None) or {}
+    multi_headers = response.pop('multiValueHeaders', None) or {}
+    if multi_value_headers:
+        response['multiValueHeaders'] = {**{name: [value] for name, value in headers.items()}, **multi_headers}
+    else:
+        response['headers'] = {**headers, **{name: values[-1] for name, values in multi_headers.items() if values}}
+    response['statusDescription'] = _status_description(response['statusCode'])
+    response.setdefault('isBase64Encoded', False)
+    return response
+
+
+def _status_description(status_code: int) -> str:
+    try:
+        return "{} {}".format(status_code, HTTPStatus(status_code).phrase)
+    except ValueError:
+        return str(status_code)
+
+
+def single_value_headers(event: dict) -> Dict[str, str]:
+    """
+    The request headers of an ALB event, which has either headers or multiValueHeaders (the last value is used).
+    """
+    if (headers := event.get('headers', None)) is not None:
+        return headers
+    return {name: values[-1] for name, values in (event.get('multiValueHeaders', None) or {}).items() if values}
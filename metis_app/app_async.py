@@ -0,0 +1,65 @@
+import asyncio
+import inspect
+from typing import Any, Awaitable, Callable
+
+from metis_fn import monad, singleton
+
+"""
+Support for running the app pipeline with coroutine (async def) stage functions.
+
+A Lambda container processes 1 invocation at a time, so a single event loop is created on first use and reused across
+warm invocations.  Connections and other state bound to the loop (e.g. aiohttp sessions) can therefore be kept between
+invocations.
+
+Stage functions (params_parser, pip_initiator, guard, and route functions) may be either sync fns or coroutine fns;
+both return a monad.MEither, and the pipeline awaits the result when it is awaitable.
+"""
+
+
+class EventLoop(singleton.Singleton):
+    loop = None
+
+    def get(self) -> asyncio.AbstractEventLoop:
+        if self.loop is None or self.loop.is_closed():
+            self.loop = asyncio.new_event_loop()
+        return self.loop
+
+    def run(self, coro: Awaitable) -> Any:
+        """
+        Runs the coroutine to completion on the container's event loop.
+        """
+        return self.get().run_until_complete(coro)
+
+    def close(self):
+        if self.loop and not self.loop.is_closed():
+            self.loop.close()
+        self.loop = None
+        return self
+
+
+async def resolve(result: Any) -> Any:
+    """
+    Awaits the result of a stage fn when it is a coroutine (or other awaitable), otherwise returns it.
+    """
+    if inspect.isawaitable(result):
+        return await result
+    return result
+
+
+async def bind(either: monad.MEither, f: Callable) -> monad.MEither:
+    """
+    The async equivalent of either >> f, where f may be a sync or a coroutine fn.
+    """
+    if either.is_left():
+        return either
+    return await resolve(f(either.value))
+
+
+async def pipe(either: monad.MEither, *fns: Callable) -> monad.MEither:
+    """
+    The async equivalent of either >> f1 >> f2 ...
+    """
+    result = await resolve(either)
+    for f in fns:
+        result = await bind(result, f)
+    return result
@@ -0,0 +1,272 @@
+import asyncio
+import copy
+import dataclasses
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from metis_fn import monad
+
+from . import app_async, app_value, app_serialisers, app_idempotency, logger
+
+"""
+Per-record processing of batch events (e.g. Kafka records), enabled with the route opts:
+> @app.route(('KAFKA', 'orders.*'), opts={'mode': 'per_record', 'max_workers': 8})
+
+In per_record mode the route function is invoked once per record, with a copy of the request whose event holds only
+that record.  Records are grouped by an ordering key (e.g. the Kafka topic-partition).  The records in a group are
+processed in order, and the groups are processed concurrently on a bounded thread pool.  A coroutine route fn (from
+pipeline_async) is instead invoked on the event loop, with the groups processed concurrently and at most max_workers
+records in flight.
+
+When a record fails (the route function returns a Left, a Left response, or raises), the remaining records in its
+group are not processed (to maintain order), and all are reported as failed.  The failures are set on
+request.batch_item_failures, which the responder returns in the partial batch failure shape:
+> {'batchItemFailures': [{'itemIdentifier': '...'}]}
+so that only the failed records are redelivered.
+
+SQS routes are in per_record mode by default; use opts={'mode': 'batch'} to invoke the route fn once with all messages.
+When an SQS or DynamoDB Streams route in batch mode fails (returns a Left or a Left response), every item in the batch
+is reported in batchItemFailures, so the batch is redelivered rather than deleted.
+
+S3 routes can also run in per_record mode, invoking the route fn once per S3Object.  S3 has no partial batch response,
+so the failed objects are listed in the response body (failed_items), and each outcome is in request.results.
+
+With opts={'remaining_time_margin_ms': 5000} (the default for S3), no further records are started once the Lambda's
+remaining time (context.get_remaining_time_in_millis()) is below the margin; these records are reported as failed
+(timed_out).
+"""
+
+PER_RECORD_MODE = 'per_record'
+BATCH_MODE = 'batch'
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_S3_REMAINING_TIME_MARGIN_MS = 5000
+
+
+@dataclasses.dataclass
+class RecordOutcome:
+    item: Any
+    identifier: str
+    result: Optional[monad.MEither] = None
+    skipped: bool = False
+    timed_out: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return not self.skipped and succeeded(self.result)
+
+
+class RecordDispatcher:
+    """
+    The request function for a route in per_record mode.
+    """
+    # With {'idempotency': ...} route opts, each record is claimed (see app_idempotency), rather than the event.
+    idempotent_per_record = True
+
+    def __init__(self,
+                 route_fn: Callable,
+                 items_property: str,
+                 item_identifier: Callable[[Any], str],
+                 ordering_key: Optional[Callable[[Any], Hashable]] = None,
+                 max_workers: int = DEFAULT_MAX_WORKERS,
+                 remaining_time_margin_ms: Optional[int] = None,
+                 reports_batch_item_failures: bool = True):
+        self.route_fn = route_fn
+        self.items_property = items_property
+        self.item_identifier = item_identifier
+        self.ordering_key = ordering_key
+        self.max_workers = max_workers
+        self.remaining_time_margin_ms = remaining_time_margin_ms
+        self.reports_batch_item_failures = reports_batch_item_failures
+
+    def __call__(self, request):
+        groups = self.ordered_groups(getattr(request.event, self.items_property))
+        if inspect.iscoroutinefunction(self.loaded_route_fn()):
+            return self.dispatch_async(request, groups)
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(groups) or 1))) as pool:
+            outcomes = [outcome for group_outcomes in pool.map(lambda group: self.process_group(request, group), groups)
+                        for outcome in group_outcomes]
+        return self.outcome(request, outcomes)
+
+    def loaded_route_fn(self) -> Callable:
+        """
+        The route fn, loading a route registered by reference (an app_route.LazyRouteFunction), so that a coroutine fn
+        is dispatched on the event loop.
+        """
+        if (load := getattr(self.route_fn, 'load', None)):
+            return load()
+        return self.route_fn
+
+    async def dispatch_async(self, request, groups: List[List]) -> monad.MEither:
+        semaphore = asyncio.Semaphore(max(1, self.max_workers))
+        group_outcomes = await asyncio.gather(*[self.process_group_async(request, group, semaphore) for group in groups])
+        return self.outcome(request, [outcome for outcomes in group_outcomes for outcome in outcomes])
+
+    def ordered_groups(self, items: List) -> List[List]:
+        if not self.ordering_key:
+            return [[item] for item in items]
+        groups = {}
+        for item in items:
+            groups.setdefault(self.ordering_key(item), []).append(item)
+        return list(groups.values())
+
+    def process_group(self, request, items: List) -> List[RecordOutcome]:
+        outcomes = []
+        for item in items:
+            if (skipped := self.skipped(request, outcomes, item)):
+                outcomes.append(skipped)
+                continue
+            outcomes.append(RecordOutcome(item=item,
+                                          identifier=self.item_identifier(item),
+                                          result=self.invoke(request, item)))
+        return outcomes
+
+    async def process_group_async(self, request, items: List, semaphore: asyncio.Semaphore) -> List[RecordOutcome]:
+        outcomes = []
+        for item in items:
+            if (skipped := self.skipped(request, outcomes, item)):
+                outcomes.append(skipped)
+                continue
+            async with semaphore:
+                result = await self.invoke_async(request, item)
+            outcomes.append(RecordOutcome(item=item, identifier=self.item_identifier(item), result=result))
+        return outcomes
+
+    def skipped(self, request, outcomes: List[RecordOutcome], item) -> Optional[RecordOutcome]:
+        """
+        The outcome of an item which is not processed; because an earlier item in its group failed, or the Lambda is
+        out of time.
+        """
+        if outcomes and not outcomes[-1].ok:
+            return RecordOutcome(item=item, identifier=self.item_identifier(item), skipped=True)
+        if self.out_of_time(request):
+            return RecordOutcome(item=item, identifier=self.item_identifier(item), skipped=True, timed_out=True)
+        return None
+
+    def out_of_time(self, request) -> bool:
+        if self.remaining_time_margin_ms is None:
+            return False
+        if not (remaining_time := getattr(request.context, 'get_remaining_time_in_millis', None)):
+            return False
+        return remaining_time() < self.remaining_time_margin_ms
+
+    def invoke(self, request, item) -> monad.MEither:
+        record_request = self.record_request(request, item)
+        try:
+            if app_idempotency.is_enabled(record_request.event.route_opts):
+                return app_idempotency.invoke(record_request, self.route_fn)
+            return self.route_fn(request=record_request)
+        except Exception as e:
+            return self.failure(request, record_request, e)
+
+    async def invoke_async(self, request, item) -> monad.MEither:
+        record_request = self.record_request(request, item)
+        try:
+            if app_idempotency.is_enabled(record_request.event.route_opts):
+                return await app_idempotency.invoke_async(record_request, self.route_fn)
+            return await app_async.resolve(self.route_fn(request=record_request))
+        except Exception as e:
+            return self.failure(request, record_request, e)
+
+    def record_request(self, request, item):
+        return copy.copy(request).replace('event', dataclasses.replace(request.event, **{self.items_property: [item]}))
+
+    def failure(self, request, record_request, e: Exception) -> monad.MEither:
+        logger.error(msg="Record Processing Failure", tracer=request.tracer, error=str(e))
+        return monad.Left(record_request.replace('error', app_value.AppError(message=str(e), code=500)))
+
+    def outcome(self, request, outcomes: List[RecordOutcome]) -> monad.MEither:
+        request.results = [outcome.result for outcome in outcomes]
+        failures = [{'itemIdentifier': outcome.identifier} for outcome in outcomes if not outcome.ok]
+        summary = {'processed': len(outcomes), 'failed': len(failures)}
+        if (timed_out := sum(1 for outcome in outcomes if outcome.timed_out)):
+            logger.warn(msg="Record Processing Stopped", tracer=request.tracer, timed_out=timed_out)
+            summary['timed_out'] = timed_out
+        if self.reports_batch_item_failures:
+            request.batch_item_failures = failures
+        else:
+            summary['failed_items'] = [failure['itemIdentifier'] for failure in failures]
+        return monad.Right(request.replace('response',
+                                           monad.Right(app_serialisers.DictToJsonSerialiser(summary))))
+
+
+class BatchDispatcher:
+    """
+    The request function for a route in batch mode whose event source takes a partial batch failure response (SQS and
+    DynamoDB Streams).  The route fn is invoked once with all the items; when it fails, all the items are reported as
+    failed.  Without this, the failure response has no batchItemFailures, which Lambda treats as the batch succeeding.
+    """
+
+    def __init__(self, route_fn: Callable, items_property: str, item_identifier: Callable[[Any], str]):
+        self.route_fn = route_fn
+        self.items_property = items_property
+        self.item_identifier = item_identifier
+
+    def __call__(self, request):
+        result = self.route_fn(request=request)
+        if inspect.isawaitable(result):
+            return self.outcome_async(request, result)
+        return self.outcome(request, result)
+
+    async def outcome_async(self, request, result) -> monad.MEither:
+        return self.outcome(request, await result)
+
+    def outcome(self, request, result: monad.MEither) -> monad.MEither:
+        if succeeded(result):
+            return result
+        failures = [{'itemIdentifier': self.item_identifier(item)} for item in getattr(request.event, self.items_property)]
+        failed_request = result.lift()
+        if not isinstance(failed_request, app_value.Request):
+            # A Left of the error, rather than of the request.
+            return monad.Left(request.replace('error', failed_request).replace('batch_item_failures', failures))
+        failed_request.batch_item_failures = failures
+        return result
+
+
+def is_per_record(route_opts: Optional[Dict], default_mode: str = BATCH_MODE) -> bool:
+    return (route_opts or {}).get('mode', default_mode) == PER_RECORD_MODE
+
+
+def succeeded(result: Optional[monad.MEither]) -> bool:
+    if result is None or result.is_left():
+        return False
+    return not isinstance(result.value.response, monad.MEither) or result.value.response.is_right()
+
+
+def record_dispatcher(route_fn: Callable,
+                      route_opts: Optional[Dict],
+                      items_property: str,
+                      item_identifier: Callable[[Any], str],
+                      ordering_key: Optional[Callable[[Any], Hashable]] = None,
+                      default_mode: str = BATCH_MODE,
+                      default_remaining_time_margin_ms: Optional[int] = None,
+                      reports_batch_item_failures: bool = True,
+                      fails_whole_batch: bool = False) -> Callable:
+    """
+    Wraps the route fn in a RecordDispatcher when the route is in per_record mode.  Otherwise, with fails_whole_batch,
+    the route fn is wrapped in a BatchDispatcher, which reports all the items as failed when the route fails.
+    """
+    if not is_per_record(route_opts, default_mode):
+        if fails_whole_batch:
+            return BatchDispatcher(route_fn=route_fn, items_property=items_property, item_identifier=item_identifier)
+        return route_fn
+    opts = route_opts or {}
+    return RecordDispatcher(route_fn=route_fn,
+                            items_property=items_property,
+                            item_identifier=item_identifier,
+                            ordering_key=ordering_key,
+                            max_workers=opts.get('max_workers', DEFAULT_MAX_WORKERS),
+                            remaining_time_margin_ms=opts.get('remaining_time_margin_ms',
+                                                              default_remaining_time_margin_ms),
+                            reports_batch_item_failures=reports_batch_item_failures)
+
+
+def batch_item_failures(results: List[monad.MEither]) -> Optional[List[Dict]]:
+    """
+    Collects the batch item failures from the results of routes invoked for parts of a batch.
+    """
+    failures = [result.lift().batch_item_failures for result in results
+                if result.lift() is not None and getattr(result.lift(), 'batch_item_failures', None) is not None]
+    if not failures:
+        return None
+    return [failure for route_failures in failures for failure in route_failures]
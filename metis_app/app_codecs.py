@@ -0,0 +1,121 @@
+import base64
+import fnmatch
+import json
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Tuple
+
+from metis_fn import singleton
+
+"""
+Codecs for decoding Kafka record values.
+
+A KafkaTopicEvent keeps the raw (base64) value from the event, and only decodes it when its value property is first
+accessed.  The base64 decoded bytes are provided to the codec as a memoryview.  The codec is selected by topic from the
+KafkaCodecs registry, defaulting to json:
+
+> app_codecs.KafkaCodecs().register('orders.*', 'json')
+> app_codecs.KafkaCodecs().register('audit.raw', 'bytes')
+> app_codecs.KafkaCodecs().register('metrics', my_protobuf_decoder)
+
+A codec is either the name of a built-in codec (json, text, bytes), or a fn which takes a memoryview and returns the
+decoded value.  Topics may be globs; the first registered matching topic is used.
+
+Also decoding of DynamoDB attribute value maps (e.g. a stream record's NewImage) into plain python values:
+
+> app_codecs.dynamodb_image({'id': {'S': 'a'}, 'qty': {'N': '2'}})  # {'id': 'a', 'qty': 2}
+
+The whole image is decoded in one pass, dispatching on the type tag, rather than per attribute through the boto3
+TypeDeserializer.  Integral numbers are decoded to int, other numbers to Decimal; sets to python sets.
+"""
+
+Codec = Callable[[memoryview], Any]
+
+DEFAULT_CODEC = 'json'
+
+
+def json_codec(view: memoryview) -> Any:
+    return json.loads(_buffer_bytes(view))
+
+
+def text_codec(view: memoryview) -> str:
+    return str(view, 'utf-8')
+
+
+def bytes_codec(view: memoryview) -> memoryview:
+    """
+    The raw bytes, as a (zero-copy) memoryview.
+    """
+    return view
+
+
+CODECS: Dict[str, Codec] = {'json': json_codec, 'text': text_codec, 'bytes': bytes_codec}
+
+
+class KafkaCodecs(singleton.Singleton):
+    topic_codecs: List[Tuple[str, Codec]] = []
+    resolved: Dict[str, Codec] = {}
+
+    def register(self, topic: str, codec: str | Codec):
+        self.topic_codecs = self.topic_codecs + [(topic, codec_from(codec))]
+        self.resolved = {}
+        return self
+
+    def clear(self):
+        self.topic_codecs = []
+        self.resolved = {}
+        return self
+
+    def codec_for(self, topic: str) -> Codec:
+        if (codec := self.resolved.get(topic, None)):
+            return codec
+        codec = next((codec for pattern, codec in self.topic_codecs if fnmatch.fnmatchcase(topic, pattern)),
+                     CODECS[DEFAULT_CODEC])
+        self.resolved[topic] = codec
+        return codec
+
+
+def codec_from(codec: str | Codec) -> Codec:
+    if callable(codec):
+        return codec
+    if codec not in CODECS:
+        raise ValueError("Unknown codec {}".format(codec))
+    return CODECS[codec]
+
+
+def _buffer_bytes(view: memoryview) -> bytes:
+    """
+    The bytes underlying the view, without a copy when the view covers them all.
+    """
+    if isinstance(view.obj, bytes) and len(view.obj) == view.nbytes:
+        return view.obj
+    return view.tobytes()
+
+
+def dynamodb_image(image: Dict[str, Dict]) -> Dict[str, Any]:
+    return {name: dynamodb_value(attribute_value) for name, attribute_value in image.items()}
+
+
+def dynamodb_value(attribute_value: Dict) -> Any:
+    for tag, value in attribute_value.items():
+        return DYNAMODB_DECODERS[tag](value)
+    raise ValueError("Empty DynamoDB attribute value")
+
+
+def _dynamodb_number(value: str) -> int | Decimal:
+    if value.lstrip('-').isdigit():
+        return int(value)
+    return Decimal(value)
+
+
+DYNAMODB_DECODERS: Dict[str, Callable[[Any], Any]] = {
+    'S': lambda value: value,
+    'N': _dynamodb_number,
+    'B': base64.b64decode,
+    'BOOL': lambda value: value,
+    'NULL': lambda _value: None,
+    'M': dynamodb_image,
+    'L': lambda values: [dynamodb_value(value) for value in values],
+    'SS': set,
+    'NS': lambda values: {_dynamodb_number(value) for value in values},
+    'BS': lambda values: {base64.b64decode(value) for value in values},
+}
@@ -0,0 +1,135 @@
+import base64
+import gzip
+import zlib
+from typing import Callable, Dict, List, Optional
+
+from metis_fn import singleton
+
+try:
+    import brotli
+except ImportError:  # brotli is optional
+    brotli = None
+
+"""
+Compression of API response bodies, negotiated from the request's accept-encoding header.
+
+Compression is off until configured:
+> app_compression.CompressionConfig().configure(threshold=1024, level=6, encodings=['br', 'gzip', 'deflate'])
+
+A body is compressed when it is at least threshold bytes, and the client accepts one of the configured encodings (in
+order of preference).  Brotli ('br') is only used when the brotli package is installed.  The compressed body is base64
+encoded, and the response sets Content-Encoding and isBase64Encoded.  A route can opt out with
+> @app.route(('API', 'GET', '/resource'), opts={'compress': False})
+"""
+
+DEFAULT_THRESHOLD = 1024
+DEFAULT_LEVEL = 6
+DEFAULT_ENCODINGS = ['br', 'gzip', 'deflate']
+
+
+def _gzip(body: bytes, level: int) -> bytes:
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def _deflate(body: bytes, level: int) -> bytes:
+    return zlib.compress(body, level)
+
+
+def _brotli(body: bytes, level: int) -> bytes:
+    # brotli quality is 0-11, compared to 1-9 for zlib
+    return brotli.compress(body, quality=min(level, 11))
+
+
+COMPRESSORS: Dict[str, Callable[[bytes, int], bytes]] = {'gzip': _gzip, 'deflate': _deflate}
+if brotli:
+    COMPRESSORS['br'] = _brotli
+
+
+class CompressionConfig(singleton.Singleton):
+    encodings: Optional[List[str]] = None
+
+    def configure(self,
+                  threshold: int = DEFAULT_THRESHOLD,
+                  level: int = DEFAULT_LEVEL,
+                  encodings: List[str] = None):
+        """
+        Args:
+            threshold: The minimum size in bytes of a body to be compressed.
+            level: The compression level (1-9).
+            encodings: The encodings to use, in order of preference.  Unavailable encodings are ignored.
+        Returns:
+            self
+        """
+        self.threshold = threshold
+        self.level = level
+        self.encodings = [enc for enc in (encodings if encodings else DEFAULT_ENCODINGS) if enc in COMPRESSORS]
+        return self
+
+    def clear(self):
+        self.encodings = None
+        return self
+
+    @property
+    def is_configured(self):
+        return bool(self.encodings)
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Selects the most preferred configured encoding accepted by the client; e.g. 'gzip, deflate;q=0.5, br;q=0'
+    """
+    if not accept_encoding:
+        return None
+    accepted = _accepted_encodings(accept_encoding)
+    wildcard = accepted.get('*', 0)
+    return next((enc for enc in CompressionConfig().encodings if accepted.get(enc, wildcard) > 0), None)
+
+
+def compress_response(response: dict, accept_encoding: Optional[str], route_opts: Optional[dict]) -> Dict:
+    """
+    Compresses the response body in place, when configured, enabled for the route, the body is large enough, and the
+    client accepts a configured encoding.  Returns the context to log.
+    """
+    if not CompressionConfig().is_configured or (route_opts and route_opts.get('compress', True) is False):
+        return {}
+    body = response.get('body', None)
+    if not body or response.get('isBase64Encoded', False):
+        return {}
+    encoded = body.encode('utf-8') if isinstance(body, str) else body
+    if len(encoded) < CompressionConfig().threshold or not (encoding := negotiate(accept_encoding)):
+        return {}
+    compressed = COMPRESSORS[encoding](encoded, CompressionConfig().level)
+    response['body'] = base64.b64encode(compressed).decode('ascii')
+    response['isBase64Encoded'] = True
+    headers = response.get('headers', {})
+    response['headers'] = {**headers, 'Content-Encoding': encoding, 'Vary': _vary(headers.get('Vary', None))}
+    return {'content_encoding': encoding, 'body_size': len(encoded), 'compressed_size': len(compressed)}
+
+
+def _vary(vary: Optional[str]) -> str:
+    """
+    Adds Accept-Encoding to the response's Vary header (e.g. Vary: Origin, from CORS).
+    """
+    if not vary:
+        return 'Accept-Encoding'
+    if 'accept-encoding' in (name.strip().lower() for name in vary.split(",")):
+        return vary
+    return "{}, Accept-Encoding".format(vary)
+
+
+def _accepted_encodings(accept_encoding: str) -> Dict[str, float]:
+    accepted = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        accepted[coding.strip().lower()] = _quality(params)
+    return accepted
+
+
+def _quality(params: str) -> float:
+    name, _, value = params.strip().partition("=")
+    if name.strip() != 'q':
+        return 1.0
+    try:
+        return float(value)
+    except ValueError:
+        return 0.0
@@ -0,0 +1,126 @@
+from typing import Dict, List, Optional
+
+from metis_fn import singleton
+
+from . import app_route, app_api_source
+
+"""
+CORS support for API Gateway routes.
+
+Configure CORS once, outside the handler:
+> app_cors.CorsConfig().configure(allow_origins=['https://app.example.com'], allow_credentials=True)
+
+When configured, an OPTIONS (preflight) request is answered directly by app.pipeline from the route table, without
+building the request, calling the PIP or the handler guard, or invoking a route function.  The allowed methods are
+those with a route matching the request path (HEAD is allowed wherever GET is).  A path with an explicit OPTIONS route
+is dispatched to that route as normal.
+
+The Access-Control-Allow-Origin (and credentials/expose) headers are also added to all other API responses.
+"""
+
+DEFAULT_ALLOW_HEADERS = ['Content-Type', 'Authorization', 'X-Amz-Date', 'X-Api-Key', 'X-Amz-Security-Token']
+DEFAULT_MAX_AGE = 600
+ANY_ORIGIN = '*'
+
+
+class CorsConfig(singleton.Singleton):
+    allow_origins: Optional[List[str]] = None
+
+    def configure(self,
+                  allow_origins: List[str] = None,
+                  allow_headers: List[str] = None,
+                  expose_headers: List[str] = None,
+                  max_age: int = DEFAULT_MAX_AGE,
+                  allow_credentials: bool = False):
+        """
+        Args:
+            allow_origins: The origins allowed to make requests.  Defaults to ['*'].
+            allow_headers: The request headers allowed in a preflight.  Defaults to DEFAULT_ALLOW_HEADERS.
+            expose_headers: The response headers the browser may expose.
+            max_age: The number of seconds a preflight response may be cached.
+            allow_credentials: Whether credentials (cookies, Authorization) may be sent.  When True, the request's
+                               origin is returned rather than '*'.
+        Returns:
+            self
+        """
+        self.allow_origins = allow_origins if allow_origins else [ANY_ORIGIN]
+        self.allow_headers = allow_headers if allow_headers else DEFAULT_ALLOW_HEADERS
+        self.expose_headers = expose_headers
+        self.max_age = max_age
+        self.allow_credentials = allow_credentials
+        return self
+
+    def clear(self):
+        self.allow_origins = None
+        return self
+
+    @property
+    def is_configured(self):
+        return bool(self.allow_origins)
+
+
+def is_preflight(event: dict) -> bool:
+    """
+    A preflight is an OPTIONS request, when CORS is configured and no OPTIONS route matches the path.
+    """
+    if not CorsConfig().is_configured:
+        return False
+    method, path = app_api_source.method_and_path(event)
+    if method != 'OPTIONS':
+        return False
+    return not app_route.RouteMap().event_match('API', 'OPTIONS', path or '/')
+
+
+def preflight_response(event: dict) -> dict:
+    """
+    The preflight response, in the response shape of the event's API source.
+    """
+    return app_api_source.shape_response(app_api_source.source_of(event),
+                                         _preflight_response(event),
+                                         'multiValueHeaders' in event)
+
+
+def _preflight_response(event: dict) -> dict:
+    _method, path = app_api_source.method_and_path(event)
+    methods = app_route.RouteMap().allowed_methods(path or '/')
+    if not methods:
+        return _response(404, {})
+    origin_headers = origin_response_headers(_header(app_api_source.single_value_headers(event), 'origin'))
+    if not origin_headers:
+        return _response(403, {})
+    return _response(204, {**origin_headers,
+                           'Access-Control-Allow-Methods': ", ".join(methods + ['OPTIONS']),
+                           'Access-Control-Allow-Headers': ", ".join(CorsConfig().allow_headers),
+                           'Access-Control-Max-Age': str(CorsConfig().max_age)})
+
+
+def origin_response_headers(origin: Optional[str]) -> Dict[str, str]:
+    """
+    The CORS headers to add to a response for a request from origin.  Empty when CORS is not configured or the
+    origin is not allowed.
+    """
+    if not CorsConfig().is_configured:
+        return {}
+    config = CorsConfig()
+    any_origin = ANY_ORIGIN in config.allow_origins
+    if any_origin and not config.allow_credentials:
+        hdrs = {'Access-Control-Allow-Origin': ANY_ORIGIN}
+    elif origin and (any_origin or origin in config.allow_origins):
+        hdrs = {'Access-Control-Allow-Origin': origin, 'Vary': 'Origin'}
+    else:
+        return {}
+    if config.allow_credentials:
+        hdrs['Access-Control-Allow-Credentials'] = 'true'
+    if config.expose_headers:
+        hdrs['Access-Control-Expose-Headers'] = ", ".join(config.expose_headers)
+    return hdrs
+
+
+def _header(hdrs: Optional[dict], name: str) -> Optional[str]:
+    if not hdrs:
+        return None
+    return next((value for key, value in hdrs.items() if key.lower() == name), None)
+
+
+def _response(status_code: int, hdrs: dict) -> dict:
+    return {'statusCode': status_code, 'headers': hdrs, 'multiValueHeaders': {}, 'body': ''}
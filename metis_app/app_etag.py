@@ -0,0 +1,105 @@
+import hashlib
+from typing import Optional
+
+from metis_fn import monad
+
+from . import app_value, app_serialisers, app_compression
+
+"""
+ETags and conditional (304 Not Modified) responses for API GET (and HEAD) routes.
+
+Enable on a route with either:
++ {'etag': True}.  The responder computes a strong ETag by hashing the serialised body.  When it matches the request's
+  if-none-match header, a 304 without a body is returned.
++ {'etag_version': fn}.  A cheap fn, taking the request and returning a version str (e.g. an updated timestamp).  The
+  version is checked before the route function is invoked, so when it matches if-none-match the route function and the
+  serialisation of the body are skipped.  The version is also used as the ETag of a full response.
+
+A compressed response has the ETag with its content coding appended (e.g. "abc-gzip"), so that the identity and
+compressed representations have distinct strong ETags.  if-none-match matches either.
+
+> @app.route(('API', 'GET', '/reference/{id}'), opts={'etag_version': reference_version})
+"""
+
+CONDITIONAL_METHODS = ('GET', 'HEAD')
+
+
+def is_enabled(route_opts: Optional[dict]) -> bool:
+    return bool(route_opts) and bool(route_opts.get('etag', False) or route_opts.get('etag_version', None))
+
+
+def not_modified_precondition(request: app_value.Request) -> Optional[monad.MEither]:
+    """
+    When the route declares an etag_version fn, and the version matches if-none-match, returns the request with a
+    304 response.  Otherwise, returns None and the route function is to be invoked.
+    """
+    event = request.event
+    if not _conditional_request(event):
+        return None
+    if not (version_fn := (event.route_opts or {}).get('etag_version', None)):
+        return None
+    etag = strong_etag(version_fn(request))
+    request.response_headers = {**(request.response_headers or {}), 'ETag': etag}
+    if not matches(event.headers.get('if-none-match', None), etag):
+        return None
+    request.status_code = app_value.HttpStatusCode.NotModified
+    return monad.Right(request.replace('response', monad.Right(app_serialisers.NoContentSerialiser())))
+
+
+def apply_etag(event: app_value.RequestEvent, response: dict) -> dict:
+    """
+    Adds the ETag to a successful response, and converts the response to a bodyless 304 when it matches the
+    if-none-match header.  Returns the context to log.
+    """
+    if not _conditional_request(event) or not is_enabled(event.route_opts):
+        return {}
+    if response['statusCode'] == app_value.HttpStatusCode.NotModified.value:
+        response['body'] = ''
+        return {'not_modified': True}
+    if response['statusCode'] != app_value.HttpStatusCode.OK.value:
+        return {}
+    etag = response['headers'].get('ETag', None) or body_etag(response['body'])
+    response['headers'] = {**response['headers'], 'ETag': etag}
+    if not matches(event.headers.get('if-none-match', None), etag):
+        return {}
+    response['statusCode'] = app_value.HttpStatusCode.NotModified.value
+    response['body'] = ''
+    return {'not_modified': True}
+
+
+def apply_content_coding(response: dict):
+    """
+    Appends the response's content coding (from app_compression) to its ETag.
+    """
+    headers = response.get('headers', None) or {}
+    if (etag := headers.get('ETag', None)) and (coding := headers.get('Content-Encoding', None)):
+        response['headers'] = {**headers, 'ETag': coded_etag(etag, coding)}
+
+
+def coded_etag(etag: str, coding: str) -> str:
+    return '{}-{}"'.format(etag.removesuffix('"'), coding)
+
+
+def body_etag(body: str | bytes) -> str:
+    return strong_etag(hashlib.blake2b(body.encode('utf-8') if isinstance(body, str) else body,
+                                       digest_size=16).hexdigest())
+
+
+def strong_etag(version: str) -> str:
+    return '"{}"'.format(str(version).strip('"'))
+
+
+def matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    if-none-match uses the weak comparison; a W/ prefix is ignored.  The ETag of a compressed representation of the
+    response also matches.
+    """
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    etags = {etag} | {coded_etag(etag, coding) for coding in app_compression.COMPRESSORS}
+    return '*' in candidates or any(candidate.removeprefix('W/') in etags for candidate in candidates)
+
+
+def _conditional_request(event: app_value.RequestEvent) -> bool:
+    return isinstance(event, app_value.ApiGatewayRequestEvent) and event.method in CONDITIONAL_METHODS
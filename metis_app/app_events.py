@@ -1,26 +1,32 @@
-import base64
-import json
-from functools import reduce
-
 from aws_lambda_powertools.utilities.data_classes import (
     S3Event,
     APIGatewayProxyEvent,
+    APIGatewayProxyEventV2,
+    ALBEvent,
     KafkaEvent,
-    EventBridgeEvent
+    EventBridgeEvent,
+    SQSEvent,
+    DynamoDBStreamEvent
 )
 from aws_lambda_powertools.utilities.data_classes.s3_event import S3EventRecord
 from aws_lambda_powertools.utilities.data_classes.kafka_event import KafkaEventRecord
-from metis_fn import fn
+from aws_lambda_powertools.utilities.data_classes.sqs_event import SQSRecord
+
+from urllib.parse import unquote_plus
 
-from . import app_value, app_route, app_web_session
+from . import app_value, app_route, app_batch, app_codecs, app_api_source, app_warmer
 
 DEFAULT_S3_BUCKET_SEP = "."
 NO_MATCHING_ROUTE = "no_matching_route"
+MULTIPLE_ROUTES = "multiple_routes"
 
 
 def event_factory(event: dict,
                   factory_overrides: dict = None,
                   event_source_class=None) -> app_value.RequestEvent:
+    if app_warmer.is_warmer(event):
+        # Checked before the event is parsed
+        return build_warmer_event(event)
     if event_source_class:
         ev_fn, ev = event_match_fn_from_event_source(event, event_source_class)
     else:
@@ -29,22 +35,64 @@ def event_factory(event: dict,
 
 
 def dynamic_event_match(event):
-    ev_keys = event.keys()
-    if 'Records' in ev_keys:
-        return build_s3_state_change_event, S3Event(event)
-    if 'httpMethod' in ev_keys:
-        return build_http_event, APIGatewayProxyEvent(event)
-    if 'eventSource' in ev_keys:
-        return build_kafka_event, KafkaEvent(event)
-    if 'source' in ev_keys:
-        return build_event_bridge_event, EventBridgeEvent(event)
+    """
+    Matches the event against the EVENT_SIGNATURES table; the first signature key present in the event selects the
+    event builder.
+    """
+    for signature_key, match_fn in EVENT_SIGNATURES.items():
+        if signature_key in event:
+            return match_fn(event)
     return build_noop_event, event
 
 
+def _records_event_match(event):
+    """
+    S3, SQS (and other stream) events all hold their records in Records; they are distinguished by the eventSource of
+    the first record.
+    """
+    match _records_event_source(event):
+        case 'aws:sqs':
+            return build_sqs_event, SQSEvent(event)
+        case 'aws:dynamodb':
+            return build_dynamo_stream_event, DynamoDBStreamEvent(event)
+        case _:
+            return build_s3_state_change_event, S3Event(event)
+
+
+def _records_event_source(event) -> str | None:
+    records = event.get('Records', None)
+    if not records or not isinstance(records[0], dict):
+        return None
+    return records[0].get('eventSource', records[0].get('EventSource', None))
+
+
+def _api_event_match(event):
+    match app_api_source.source_of(event):
+        case 'alb':
+            return build_alb_event, ALBEvent(event)
+        case 'http':
+            return build_http_api_event, APIGatewayProxyEventV2(event)
+        case _:
+            return build_http_event, APIGatewayProxyEvent(event)
+
+
+EVENT_SIGNATURES = {
+    'Records': _records_event_match,
+    'rawPath': _api_event_match,
+    'httpMethod': _api_event_match,
+    'eventSource': lambda event: (build_kafka_event, KafkaEvent(event)),
+    'source': lambda event: (build_event_bridge_event, EventBridgeEvent(event)),
+}
+
+
 def event_match_fn_from_event_source(event, event_source_cls):
     match event_source_cls.__name__:
         case 'S3Event':
             return build_s3_state_change_event, event_source_cls(event)
+        case 'SQSEvent':
+            return build_sqs_event, event_source_cls(event)
+        case 'DynamoDBStreamEvent':
+            return build_dynamo_stream_event, event_source_cls(event)
         case _:
             return build_noop_event, event
 
@@ -53,45 +101,123 @@ def build_noop_event(event: app_value.RequestEvent, _factory_overrides: dict = N
     template, route_fn, opts = route_fn_from_kind(NO_MATCHING_ROUTE)
     return app_value.NoopEvent(event=event,
                                kind=template,
-                               request_function=route_fn)
+                               request_function=route_fn,
+                               route_opts=opts)
+
+
+def build_warmer_event(event: dict, _factory_overrides: dict = None) -> app_value.WarmerEvent:
+    return app_value.WarmerEvent(event=event,
+                                 kind=app_warmer.WARMER_KIND,
+                                 request_function=app_warmer.warmer_route)
 
 
 def build_s3_state_change_event(event: S3Event, factory_overrides: dict) -> app_value.S3StateChangeEvent:
     objects = _s3_objects_from_event(event)
-    factory = _domain_from_bucket_name if not factory_overrides.get('s3', None) else factory_overrides.get('s3', None)
-    kind = factory(objects)
-    template, route_fn, _opts = route_fn_from_kind(kind)
+    if (factory := factory_overrides.get('s3', None)):
+        kind = factory(objects)
+        template, route_fn, opts = route_fn_from_kind(kind)
+        return app_value.S3StateChangeEvent(event=event,
+                                            kind=kind,
+                                            request_function=_s3_object_dispatcher(route_fn, opts),
+                                            route_opts=opts,
+                                            objects=objects)
+    kind, route_fn, opts = _kind_and_route_fn_from_groups(_route_groups(objects,
+                                                                        _s3_object_route_kinds,
+                                                                        _s3_object_dispatcher),
+                                                          'objects')
     return app_value.S3StateChangeEvent(event=event,
                                         kind=kind,
                                         request_function=route_fn,
+                                        route_opts=opts,
                                         objects=objects)
 
 
 def build_kafka_event(event: KafkaEvent, factory_overrides) -> app_value.KafkaRecordsEvent:
     evs = _kafka_events_from_event(event)
-    factory = _domain_from_kafka_topic if not factory_overrides.get('kafka', None) else factory_overrides.get('kafka',
-                                                                                                              None)
-    kind = factory(evs)
-    template, route_fn, _opts = route_fn_from_kind(kind)
+    if (factory := factory_overrides.get('kafka', None)):
+        kind = factory(evs)
+        template, route_fn, opts = route_fn_from_kind(kind)
+        return app_value.KafkaRecordsEvent(event=event,
+                                           kind=kind,
+                                           request_function=_kafka_record_dispatcher(route_fn, opts),
+                                           route_opts=opts,
+                                           events=evs)
+    kind, route_fn, opts = _kind_and_route_fn_from_groups(_route_groups(evs,
+                                                                        _kafka_event_route_kinds,
+                                                                        _kafka_record_dispatcher),
+                                                          'events')
     return app_value.KafkaRecordsEvent(event=event,
                                        kind=kind,
                                        request_function=route_fn,
+                                       route_opts=opts,
                                        events=evs)
 
 
+def build_sqs_event(event: SQSEvent, factory_overrides) -> app_value.SqsMessagesEvent:
+    """
+    Messages are routed by queue, with the pattern route ('SQS', queue-arn-or-name-glob), or the queue name.  The route
+    fn is invoked per message unless the route opts include {'mode': 'batch'}.
+    """
+    messages = _sqs_messages_from_event(event)
+    if (factory := factory_overrides.get('sqs', None)):
+        kind = factory(messages)
+        template, route_fn, opts = route_fn_from_kind(kind)
+        return app_value.SqsMessagesEvent(event=event,
+                                          kind=kind,
+                                          request_function=_sqs_message_dispatcher(route_fn, opts),
+                                          route_opts=opts,
+                                          messages=messages)
+    kind, route_fn, opts = _kind_and_route_fn_from_groups(_route_groups(messages,
+                                                                        _sqs_message_route_kinds,
+                                                                        _sqs_message_dispatcher),
+                                                          'messages')
+    return app_value.SqsMessagesEvent(event=event,
+                                      kind=kind,
+                                      request_function=route_fn,
+                                      route_opts=opts,
+                                      messages=messages)
+
+
+def build_dynamo_stream_event(event: DynamoDBStreamEvent, factory_overrides) -> app_value.DynamoStreamEvent:
+    """
+    Records are routed by table and event name, with the pattern route ('DYNAMODB', table-arn-or-name, event-name-glob),
+    or the table name.  The route fn is invoked per record, in order per item key, unless the route opts include
+    {'mode': 'batch'}.
+    """
+    records = _dynamo_stream_records_from_event(event)
+    if (factory := factory_overrides.get('dynamodb', None)):
+        kind = factory(records)
+        template, route_fn, opts = route_fn_from_kind(kind)
+        return app_value.DynamoStreamEvent(event=event,
+                                           kind=kind,
+                                           request_function=_dynamo_stream_record_dispatcher(route_fn, opts),
+                                           route_opts=opts,
+                                           records=records)
+    kind, route_fn, opts = _kind_and_route_fn_from_groups(_route_groups(records,
+                                                                        _dynamo_stream_record_route_kinds,
+                                                                        _dynamo_stream_record_dispatcher),
+                                                          'records')
+    return app_value.DynamoStreamEvent(event=event,
+                                       kind=kind,
+                                       request_function=route_fn,
+                                       route_opts=opts,
+                                       records=records)
+
+
 def build_event_bridge_event(event: EventBridgeEvent, factory_overrides) -> app_value.EventBridgePublishEvent:
     if not factory_overrides.get('eventbridge', None):
-        factory = _domain_from_event_bridge_topic
+        kind, route_fn, opts = _route_with_fallback(('EVENTBRIDGE', event.source, event.detail_type),
+                                                    _domain_from_event_bridge_topic(event.detail_type))
     else:
-        factory_overrides.get('eventbridge', None)
+        kind = factory_overrides.get('eventbridge', None)(event.detail_type)
+        template, route_fn, opts = route_fn_from_kind(kind)
 
-    kind = factory(event.detail_type)
-    template, route_fn, _opts = route_fn_from_kind(kind)
     return app_value.EventBridgePublishEvent(topic=event.detail_type,
                                              kind=kind,
                                              event=event,
                                              body=event.detail,
-                                             request_function=route_fn)
+                                             request_function=route_fn,
+                                             route_opts=opts)
 
 
 def build_http_event(event: APIGatewayProxyEvent,
@@ -103,29 +229,67 @@ def build_http_event(event: APIGatewayProxyEvent,
     body: str
     query_params: Optional[dict]=None
     """
-    kind = _route_from_http_event(event.http_method, event.path)
-    template, route_fn, opts = route_fn_from_kind(kind)
-    hdrs = _standardise_headers(event.headers)
-    body = _body_parser(opts, event)
+    return _api_request_event(event=event,
+                              api_source=app_api_source.REST_API,
+                              method=event['httpMethod'],
+                              path=event['path'],
+                              raw_headers=event.get('headers', None) or {},
+                              query_params=event['queryStringParameters'])
+
+
+def build_http_api_event(event: APIGatewayProxyEventV2,
+                         _factory_overrides: dict) -> app_value.ApiGatewayRequestEvent:
+    """
+    An API Gateway HTTP API (payload v2) event.  The headers are already lower case, and the cookies are provided as
+    an array rather than a cookie header.
+    """
+    return _api_request_event(event=event,
+                              api_source=app_api_source.HTTP_API,
+                              method=event['requestContext']['http']['method'],
+                              path=event['rawPath'],
+                              raw_headers=event.get('headers', None) or {},
+                              query_params=event.get('queryStringParameters', None),
+                              cookies=event.get('cookies', None))
+
+
+def build_alb_event(event: ALBEvent,
+                    _factory_overrides: dict) -> app_value.ApiGatewayRequestEvent:
+    """
+    An ALB target event.  The query string parameters are not url decoded by the ALB.
+    """
+    query_params = event.get('queryStringParameters', None)
+    if query_params is None and (multi_query_params := event.get('multiValueQueryStringParameters', None)):
+        query_params = {name: values[-1] for name, values in multi_query_params.items() if values}
+    return _api_request_event(event=event,
+                              api_source=app_api_source.ALB,
+                              method=event['httpMethod'],
+                              path=event['path'],
+                              raw_headers=event.get('headers', None) or event.get('multiValueHeaders', None) or {},
+                              query_params={unquote_plus(name): unquote_plus(value)
+                                            for name, value in query_params.items()} if query_params else query_params)
+
+
+def _api_request_event(event, api_source, method, path, raw_headers, query_params, cookies=None):
+    """
+    The headers, body and web session are not parsed here; they are parsed on first access.
+    """
+    kind = _route_from_http_event(method, path)
+    template, route_fn, opts, path_params = route_match_from_kind(kind)
+    if method == 'HEAD' and app_route.is_no_route(template):
+        # HEAD is derived from the GET route; the responder drops the body.
+        template, route_fn, opts, path_params = route_match_from_kind(_route_from_http_event('GET', path))
     return app_value.ApiGatewayRequestEvent(kind=kind,
                                             request_function=route_fn,
+                                            route_opts=opts,
                                             event=event,
-                                            method=event['httpMethod'],
-                                            headers=hdrs,
-                                            path=event['path'],
-                                            path_params=_path_template_to_params(kind[2], template[2]),
-                                            body=body,
-                                            query_params=event['queryStringParameters'],
-                                            web_session=app_web_session.WebSession().session_from_headers(hdrs))
-
-
-def _body_parser(route_options, event: APIGatewayProxyEvent):
-    body = event.body
-    if route_options and (parse_fn := route_options.get('body_parser', None)):
-        return parse_fn(body)
-    if event.is_base64_encoded:
-        return base64.b64decode(body).decode('utf-8')
-    return body
+                                            method=method,
+                                            path=path,
+                                            path_params=path_params,
+                                            query_params=query_params,
+                                            api_source=api_source,
+                                            raw_headers=raw_headers,
+                                            cookies=cookies,
+                                            body_parser=opts.get('body_parser', None) if opts else None)
 
 
 def route_fn_from_kind(kind):
@@ -135,37 +299,192 @@ def route_fn_from_kind(kind):
     return app_route.RouteMap().get_route(kind)
 
 
+def route_match_from_kind(kind):
+    """
+    As route_fn_from_kind, but also returns the path params extracted by the router when matching the kind.
+    """
+    return app_route.RouteMap().match_route(kind)
+
+
+def _route_with_fallback(pattern_kind: tuple, fallback_kind: str, alternative_pattern_kinds: tuple = ()):
+    """
+    Matches the pattern kind (e.g. ('S3', 'bucket', 'key')), and then any alternative pattern kinds, against the
+    pattern routes.  When there is no pattern route the fallback kind (e.g. the bucket token) is matched against the str
+    routes.  Returns the kind, route fn and opts.
+    """
+    kind, template, route_fn, opts = _match_with_fallback(pattern_kind, fallback_kind, alternative_pattern_kinds)
+    return kind, route_fn, opts
+
+
+def _match_with_fallback(pattern_kind: tuple, fallback_kind: str, alternative_pattern_kinds: tuple = ()):
+    """
+    As _route_with_fallback, but also returns the matched template, which is the NO_ROUTE_TEMPLATE when neither the
+    pattern kinds nor the fallback kind match a route.
+    """
+    for kind in (pattern_kind, *alternative_pattern_kinds):
+        if app_route.RouteMap().has_pattern_routes(kind[:-1]):
+            template, route_fn, opts = route_fn_from_kind(kind)
+            if not app_route.is_no_route(template):
+                return template, template, route_fn, opts
+    template, route_fn, opts = route_fn_from_kind(fallback_kind)
+    return fallback_kind, template, route_fn, opts
+
+
+def _route_groups(items: list, kinds_fn, dispatcher_fn=None) -> list[app_route.RouteGroup]:
+    """
+    Groups the items of a batch event by the route each item matches.  The dispatcher_fn optionally wraps the route fn
+    (e.g. for per_record mode).
+    """
+    groups = {}
+    for item in items:
+        kind, template, route_fn, opts = _match_with_fallback(*kinds_fn(item))
+        if kind not in groups:
+            groups[kind] = app_route.RouteGroup(kind=kind,
+                                                request_function=dispatcher_fn(route_fn, opts) if dispatcher_fn else route_fn,
+                                                items=[],
+                                                opts=opts,
+                                                no_route=app_route.is_no_route(template))
+        groups[kind].items.append(item)
+    return list(groups.values())
+
+
+def _kind_and_route_fn_from_groups(groups: list[app_route.RouteGroup], items_property: str):
+    """
+    A batch whose items match no route at all (e.g. S3 objects from buckets without a route) falls back to the no
+    matching route, as an event with a single unrouted item does.
+    """
+    if not groups or (len(groups) > 1 and all(group.no_route for group in groups)):
+        template, route_fn, opts = route_fn_from_kind(NO_MATCHING_ROUTE)
+        return NO_MATCHING_ROUTE, route_fn, opts
+    if len(groups) == 1:
+        return groups[0].kind, groups[0].request_function, groups[0].opts
+    return MULTIPLE_ROUTES, app_route.BatchRouteDispatcher(groups, items_property), None
+
+
+def _kafka_record_dispatcher(route_fn, opts):
+    return app_batch.record_dispatcher(route_fn=route_fn,
+                                       route_opts=opts,
+                                       items_property='events',
+                                       item_identifier=_kafka_item_identifier,
+                                       ordering_key=_kafka_ordering_key(opts))
+
+
+def _kafka_ordering_key(opts):
+    """
+    Records are processed in order per topic-partition, or per key within a topic-partition when the route opts
+    include {'ordering': 'key'}
+    """
+    if opts and opts.get('ordering', None) == 'key':
+        return lambda ev: (ev.topic, ev.partition, ev.key)
+    return lambda ev: (ev.topic, ev.partition)
+
+
+def _kafka_item_identifier(ev: app_value.KafkaTopicEvent) -> str:
+    return "{topic}-{partition}:{offset}".format(topic=ev.topic, partition=ev.partition, offset=ev.offset)
+
+
+def _sqs_message_dispatcher(route_fn, opts):
+    return app_batch.record_dispatcher(route_fn=route_fn,
+                                       route_opts=opts,
+                                       items_property='messages',
+                                       item_identifier=lambda message: message.message_id,
+                                       ordering_key=_sqs_ordering_key,
+                                       default_mode=app_batch.PER_RECORD_MODE,
+                                       fails_whole_batch=True)
+
+
+def _sqs_ordering_key(message: app_value.SqsMessage):
+    """
+    Messages from a FIFO queue are processed in order per message group; all other messages are independent.
+    """
+    if message.message_group_id:
+        return message.queue_arn, message.message_group_id
+    return message.message_id
+
+
+def _dynamo_stream_record_dispatcher(route_fn, opts):
+    return app_batch.record_dispatcher(route_fn=route_fn,
+                                       route_opts=opts,
+                                       items_property='records',
+                                       item_identifier=lambda record: record.sequence_number,
+                                       ordering_key=_dynamo_stream_ordering_key,
+                                       default_mode=app_batch.PER_RECORD_MODE,
+                                       fails_whole_batch=True)
+
+
+def _dynamo_stream_ordering_key(record: app_value.DynamoStreamRecord):
+    """
+    Records are processed in order per item key (from the raw keys, so that the keys are not decoded).
+    """
+    return record.table_arn, tuple((name, *attribute_value.items()) for name, attribute_value in
+                                   sorted(record.raw_keys.items()))
+
+
+def _s3_object_dispatcher(route_fn, opts):
+    """
+    In per_record mode, the objects are processed concurrently (without ordering), until the Lambda's remaining time
+    falls below the margin.
+    """
+    return app_batch.record_dispatcher(route_fn=route_fn,
+                                       route_opts=opts,
+                                       items_property='objects',
+                                       item_identifier=lambda obj: obj.s3_event_path(),
+                                       default_remaining_time_margin_ms=app_batch.DEFAULT_S3_REMAINING_TIME_MARGIN_MS,
+                                       reports_batch_item_failures=False)
+
+
+def _s3_object_route_kinds(obj: app_value.S3Object):
+    """
+    A pattern route may name the bucket in full (e.g. 'imports.example.io'), or by its token ('imports').
+    """
+    token = obj.bucket.split(DEFAULT_S3_BUCKET_SEP)[0]
+    if token == obj.bucket:
+        return ('S3', token, obj.key), token
+    return ('S3', obj.bucket, obj.key), token, (('S3', token, obj.key),)
+
+
+def _kafka_event_route_kinds(ev: app_value.KafkaTopicEvent):
+    return ('KAFKA', ev.topic), ev.topic
+
+
+def _sqs_message_route_kinds(message: app_value.SqsMessage):
+    return ('SQS', message.queue_arn), message.queue_name, (('SQS', message.queue_name),)
+
+
+def _dynamo_stream_record_route_kinds(record: app_value.DynamoStreamRecord):
+    """
+    A record without a table name (from an empty or malformed eventSourceARN) falls through to the no matching route.
+    """
+    if not (table_name := record.table_name):
+        return ('DYNAMODB', record.table_arn, record.event_name), NO_MATCHING_ROUTE
+    return (('DYNAMODB', record.table_arn, record.event_name),
+            table_name,
+            (('DYNAMODB', table_name, record.event_name),))
+
+
 def _s3_objects_from_event(s3_event: S3Event) -> list[dict]:
-    return [_s3_object(s3_event.bucket_name, record) for record in s3_event.records]
+    return [_s3_object(record.s3.bucket.name, record) for record in s3_event.records]
 
 
 def _kafka_events_from_event(event: KafkaEvent) -> list[dict]:
     """
-    Assumes that the event is in JSON
+    The record values are not decoded here; they are decoded on first access with the codec for the topic.
     """
     return [_kafka_event(record) for record in event.records]
 
 
-def _domain_from_bucket_name(objects: list[app_value.S3Object]) -> str:
+def _sqs_messages_from_event(event: SQSEvent) -> list[app_value.SqsMessage]:
     """
-    The handler is expected to deal with only 1 bucket as its a domain concept.  Multiple buckets
-    indicate concern separation issues.
+    The message bodies are not parsed here; they are parsed on first access.
     """
-    domain = {obj.bucket for obj in objects}
-    if len(domain) > 1:
-        return NO_MATCHING_ROUTE
-    return domain.pop().split(DEFAULT_S3_BUCKET_SEP)[0]
+    return [_sqs_message(record) for record in event.records]
 
 
-def _domain_from_kafka_topic(events: list[KafkaEventRecord]) -> str:
+def _dynamo_stream_records_from_event(event: DynamoDBStreamEvent) -> list[app_value.DynamoStreamRecord]:
     """
-    The handler is expected to deal with only 1 topic as it's a domain concept.  Multiple buckets
-    indicate concern separation issues.
+    The keys and images are not decoded here; they are decoded on first access.
     """
-    domain = {ev.topic for ev in events}
-    if len(domain) > 1:
-        return NO_MATCHING_ROUTE
-    return domain.pop()
+    return [_dynamo_stream_record(record) for record in event['Records']]
 
 
 def _domain_from_event_bridge_topic(topic) -> str:
@@ -176,42 +495,46 @@ def _domain_from_event_bridge_topic(topic) -> str:
 
 def _s3_object(bucket_name, record: S3EventRecord) -> app_value.S3Object:
     return app_value.S3Object(bucket=bucket_name,
-                              key=record.s3.get_object.key)
+                              key=record.s3.get_object.key,
+                              sequencer=record.s3.get_object.get('sequencer', None))
 
 
 def _kafka_event(record: KafkaEventRecord) -> app_value.KafkaTopicEvent:
     return app_value.KafkaTopicEvent(topic=record.topic,
                                      key=record.decoded_key if 'key' in record._data.keys() else None,
-                                     value=record.json_value)
-
-
-def _route_from_http_event(method, path):
-    return ('API', method, path)
-
-
-def _path_template_to_params(kind, template) -> dict:
+                                     partition=record.partition,
+                                     offset=record.offset,
+                                     raw_value=record.value,
+                                     codec=app_codecs.KafkaCodecs().codec_for(record.topic))
+
+
+def _sqs_message(record: SQSRecord) -> app_value.SqsMessage:
+    return app_value.SqsMessage(message_id=record.message_id,
+                                queue_arn=record.event_source_arn,
+                                receipt_handle=record.receipt_handle,
+                                message_group_id=record.get('attributes', {}).get('MessageGroupId', None),
+                                attributes=record.get('attributes', None),
+                                message_attributes=record.get('messageAttributes', None),
+                                raw_body=record.body)
+
+
+def _dynamo_stream_record(record: dict) -> app_value.DynamoStreamRecord:
+    stream_record = record.get('dynamodb', {})
+    return app_value.DynamoStreamRecord(event_id=record.get('eventID', None),
+                                        event_name=record.get('eventName', None),
+                                        table_arn=_table_arn_from_stream_arn(record.get('eventSourceARN', '')),
+                                        sequence_number=stream_record.get('SequenceNumber', None),
+                                        raw_keys=stream_record.get('Keys', {}),
+                                        raw_new_image=stream_record.get('NewImage', None),
+                                        raw_old_image=stream_record.get('OldImage', None))
+
+
+def _table_arn_from_stream_arn(stream_arn: str) -> str:
     """
-    Remove the leading "/"
+    arn:aws:dynamodb:region:account:table/table-name/stream/label
     """
-    return _params_comparer_builder(kind[1::].split("/"), template[1::].split("/"), {})
-
-
-def _params_comparer_builder(kind_xs, template_xs, injector):
-    template_fst, template_rst = fn.first(template_xs), fn.rest(template_xs)
-    kind_fst, kind_rst = fn.first(kind_xs), fn.rest(kind_xs)
-    if not template_fst:
-        return injector
-    if "{" in template_fst:
-        return _params_comparer_builder(kind_rst,
-                                        template_rst,
-                                        {**injector, **{template_fst.replace("{", "").replace("}", ""): kind_fst}})
-    return _params_comparer_builder(kind_rst, template_rst, injector)
+    return stream_arn.split("/stream/")[0]
 
 
-def _standardise_headers(hdrs):
-    def to_lower(acc, kv):
-        k, v = kv
-        acc[k.lower()] = v
-        return acc
-
-    return reduce(to_lower, hdrs.items(), {})
+def _route_from_http_event(method, path):
+    return ('API', method, path)
@@ -0,0 +1,332 @@
+import base64
+import hashlib
+import inspect
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+from metis_fn import monad, singleton
+
+from . import app_async, app_value, app_serialisers, cache, logger
+
+"""
+Idempotent routes, for events which are redelivered (e.g. S3, EventBridge and Kafka).  Enable on a route with:
+> @app.route(('S3', 'imports', 'incoming/*'), opts={'idempotency': {'ttl': 3600}})
+> @app.route(('EVENTBRIDGE', 'orders', 'OrderPlaced'), opts={'idempotency': {'key_fn': lambda request: ...}})
+
+and configure the persistence provider once, outside the handler:
+> app_idempotency.IdempotencyConfig().configure(persistence_provider=dynamo_idempotency_store)
+
+The idempotency key is derived from the event:
++ S3. The bucket, key and sequencer of each object.
++ EventBridge. The event id.
++ Kafka. The topic, partition and offset of each record.
++ SQS. The message id of each message.
++ DynamoDB Streams. The event id of each record.
+or from the route's key_fn, which takes the request and returns a str.  In per_record mode, the key is derived for each
+record, so each record is processed once.  When the records of an event match different routes (see
+app_route.BatchRouteDispatcher), the key is derived, and claimed, for each route's group of records.
+
+The claim stage (after the params_parser) records the key as IN_PROGRESS.  When the route succeeds, the serialised
+response is recorded as COMPLETED, for the ttl (default 3600 seconds); when it fails, the key is released, so that the
+redelivery is processed.  A duplicate of a COMPLETED key is answered with the stored response, without invoking the
+route function; a duplicate of an IN_PROGRESS key is rejected with a 409.  An IN_PROGRESS key which is never settled
+(e.g. the Lambda times out) expires after the in_progress_ttl.
+
+The persistence provider implements cache.KeyValueCachePersistenceProviderProtocol; it is written a dict (or None, to
+release the key) and read as a monad wrapping an object whose value is that dict.  The dict includes expires_at (epoch
+seconds), which a DynamoDB backed provider can map to the table's TTL attribute.  The protocol has no conditional
+write, so the provider can not stop 2 containers claiming the same key at the same time; within a container, claims are
+exclusive.  Completed records are also kept in an in-memory LRU, so duplicates within a warm container are answered
+without reading the provider.  Without a provider, only the in-memory LRU is used.
+"""
+
+IN_PROGRESS = 'IN_PROGRESS'
+COMPLETED = 'COMPLETED'
+DEFAULT_TTL = 60 * 60
+DEFAULT_IN_PROGRESS_TTL = 15 * 60
+DEFAULT_LRU_SIZE = 256
+KEY_PREFIX = 'idempotency'
+
+
+class IdempotencyInProgressError(app_value.AppError):
+    pass
+
+
+class IdempotencyConfig(singleton.Singleton):
+    persistence_provider: Optional[cache.KeyValueCachePersistenceProviderProtocol] = None
+    ttl: int = DEFAULT_TTL
+    in_progress_ttl: int = DEFAULT_IN_PROGRESS_TTL
+    completed = cache.TtlLru(DEFAULT_LRU_SIZE)
+    in_flight = set()
+    lock = threading.Lock()
+    replayed: int = 0
+    rejected: int = 0
+
+    def configure(self,
+                  persistence_provider: Optional[cache.KeyValueCachePersistenceProviderProtocol] = None,
+                  ttl: int = DEFAULT_TTL,
+                  in_progress_ttl: int = DEFAULT_IN_PROGRESS_TTL,
+                  lru_size: int = DEFAULT_LRU_SIZE):
+        """
+        Args:
+            persistence_provider: Records the IN_PROGRESS and COMPLETED state of each key.
+            ttl: The default seconds a completed key is kept; routes may override it with {'idempotency': {'ttl': n}}.
+            in_progress_ttl: The seconds after which an unsettled claim expires.
+            lru_size: The number of completed records kept in memory.  0 disables the LRU.
+        Returns:
+            self
+        """
+        self.persistence_provider = persistence_provider
+        self.ttl = ttl
+        self.in_progress_ttl = in_progress_ttl
+        self.completed = cache.TtlLru(lru_size)
+        return self
+
+    def clear(self):
+        self.persistence_provider = None
+        self.ttl = DEFAULT_TTL
+        self.in_progress_ttl = DEFAULT_IN_PROGRESS_TTL
+        self.completed.clear()
+        with self.lock:
+            self.in_flight.clear()
+        self.replayed = 0
+        self.rejected = 0
+        return self
+
+    def stats(self) -> Dict[str, int]:
+        return {'replayed': self.replayed, 'rejected': self.rejected, 'in_flight': len(self.in_flight)}
+
+
+@dataclass
+class IdempotencyClaim:
+    key: str
+    ttl: int
+    replayed: bool = False
+    settled: bool = False
+
+
+def is_enabled(route_opts: Optional[Dict]) -> bool:
+    return bool(route_opts) and bool(route_opts.get('idempotency', None))
+
+
+def claim(request: app_value.Request) -> monad.MEither:
+    """
+    The pipeline stage which claims the request's idempotency key.  A duplicate of a completed key is returned with the
+    stored response, and marked as replayed (so route_invoker does not invoke the route function).
+    """
+    event = request.event
+    if not is_enabled(event.route_opts) or getattr(event.request_function, 'idempotent_per_record', False):
+        return monad.Right(request)
+    return _claim(request)
+
+
+def _claim(request: app_value.Request) -> monad.MEither:
+    opts = _opts(request.event.route_opts)
+    if (key := idempotency_key(request, opts)) is None:
+        return monad.Right(request)
+    config = IdempotencyConfig()
+    with config.lock:
+        if key in config.in_flight:
+            return _reject(request, key)
+        config.in_flight.add(key)
+    record = config.completed.get(key) or _read(key)
+    if record and record['status'] in (COMPLETED, IN_PROGRESS):
+        with config.lock:
+            config.in_flight.discard(key)
+        if record['status'] == COMPLETED:
+            return monad.Right(_replay(request, key, record))
+        return _reject(request, key)
+    _write(key, _record(IN_PROGRESS, config.in_progress_ttl))
+    request.idempotency = IdempotencyClaim(key=key, ttl=opts.get('ttl', config.ttl))
+    return monad.Right(request)
+
+
+def is_replay(request: app_value.Request) -> bool:
+    return bool(request.idempotency) and request.idempotency.replayed
+
+
+def settle(result: monad.MEither) -> monad.MEither:
+    """
+    Records the serialised response of a successful claimed request as COMPLETED (and replaces the response with the
+    serialised body, so it is not serialised again), or releases the claim when the request failed.
+    """
+    request = result.lift()
+    if not isinstance(request, app_value.Request) or not request.idempotency:
+        return result
+    claimed = request.idempotency
+    if claimed.replayed or claimed.settled:
+        return result
+    claimed.settled = True
+    config = IdempotencyConfig()
+    try:
+        if not _succeeded(result):
+            _write(claimed.key, None)
+            return result
+        body = request.response.value
+        stored = _stored_response(request, body.serialise(), body.content_type)
+        record = {**_record(COMPLETED, claimed.ttl), 'response': stored}
+        _write(claimed.key, record)
+        config.completed.put(claimed.key, record, record['expires_at'])
+        request.response = monad.Right(app_serialisers.PreSerialisedSerialiser(_body(stored),
+                                                                               content_type=body.content_type))
+        return result
+    finally:
+        with config.lock:
+            config.in_flight.discard(claimed.key)
+
+
+def invoke(request: app_value.Request, route_fn: Callable) -> monad.MEither:
+    """
+    Claims, invokes the route fn, and settles; for the records of a route in per_record mode, and for each route's
+    group of records in a batch event.  A coroutine route fn's result is settled when awaited.
+    """
+    claimed = _claim(request)
+    if claimed.is_left() or is_replay(request):
+        return claimed
+    try:
+        result = route_fn(request=request)
+    except Exception:
+        settle(monad.Left(request))
+        raise
+    if inspect.isawaitable(result):
+        return _settled_when_awaited(request, result)
+    return settle(app_value.failed_request(request, result))
+
+
+async def _settled_when_awaited(request: app_value.Request, result) -> monad.MEither:
+    try:
+        return settle(app_value.failed_request(request, await result))
+    except Exception:
+        settle(monad.Left(request))
+        raise
+
+
+async def invoke_async(request: app_value.Request, route_fn: Callable) -> monad.MEither:
+    """
+    As invoke, for a coroutine route fn.
+    """
+    claimed = _claim(request)
+    if claimed.is_left() or is_replay(request):
+        return claimed
+    try:
+        return settle(app_value.failed_request(request, await app_async.resolve(route_fn(request=request))))
+    except Exception:
+        settle(monad.Left(request))
+        raise
+
+
+def idempotency_key(request: app_value.Request, opts: Dict) -> Optional[str]:
+    if (key_fn := opts.get('key_fn', None)):
+        source = key_fn(request)
+    else:
+        source = event_key(request.event)
+    if source is None:
+        return None
+    return "{prefix}#{kind}#{digest}".format(prefix=KEY_PREFIX,
+                                             kind=request.event.kind,
+                                             digest=hashlib.sha256(str(source).encode('utf-8')).hexdigest())
+
+
+def event_key(event: app_value.RequestEvent) -> Optional[str]:
+    match event:
+        case app_value.S3StateChangeEvent():
+            return "|".join("{}@{}".format(obj.s3_event_path(), obj.sequencer or '') for obj in event.objects)
+        case app_value.EventBridgePublishEvent():
+            return event.event.get_id
+        case app_value.KafkaRecordsEvent():
+            return "|".join("{}-{}:{}".format(ev.topic, ev.partition, ev.offset) for ev in event.events)
+        case app_value.SqsMessagesEvent():
+            return "|".join(message.message_id for message in event.messages)
+        case app_value.DynamoStreamEvent():
+            return "|".join(record.event_id for record in event.records)
+    return None
+
+
+def log_ctx(request: app_value.Request) -> Dict:
+    if not request.idempotency:
+        return {}
+    return {'idempotency': 'replayed' if request.idempotency.replayed else 'claimed'}
+
+
+def expired(record: Dict) -> bool:
+    return record.get('expires_at', 0) <= time.time()
+
+
+def _opts(route_opts: Dict) -> Dict:
+    opts = route_opts['idempotency']
+    return opts if isinstance(opts, dict) else {}
+
+
+def _replay(request: app_value.Request, key: str, record: Dict) -> app_value.Request:
+    stored = record['response']
+    IdempotencyConfig().replayed += 1
+    logger.info(msg="Idempotent Replay", tracer=request.tracer, key=key)
+    request.idempotency = IdempotencyClaim(key=key, ttl=0, replayed=True, settled=True)
+    if stored.get('status_code', None):
+        request.status_code = app_value.HttpStatusCode(stored['status_code'])
+    if stored.get('headers', None):
+        request.response_headers = {**(request.response_headers or {}), **stored['headers']}
+    if stored.get('batch_item_failures', None) is not None:
+        request.batch_item_failures = stored['batch_item_failures']
+    return request.replace('response', monad.Right(app_serialisers.PreSerialisedSerialiser(
+        _body(stored), content_type=stored.get('content_type', None))))
+
+
+def _reject(request: app_value.Request, key: str) -> monad.MEither:
+    IdempotencyConfig().rejected += 1
+    logger.info(msg="Idempotent Request In Progress", tracer=request.tracer, key=key)
+    request.status_code = app_value.HttpStatusCode.Conflict
+    return monad.Left(request.replace('error', IdempotencyInProgressError(message='duplicate request in progress',
+                                                                          code=409)))
+
+
+def _stored_response(request: app_value.Request, body: str | bytes, content_type: Optional[str]) -> Dict:
+    binary = isinstance(body, (bytes, bytearray, memoryview))
+    return {'body': base64.b64encode(body).decode('ascii') if binary else body,
+            'is_base64': binary,
+            'content_type': content_type,
+            'status_code': request.status_code.value if request.status_code else None,
+            'headers': request.response_headers,
+            'batch_item_failures': request.batch_item_failures}
+
+
+def _body(stored: Dict) -> str | bytes:
+    if stored.get('is_base64', False):
+        return base64.b64decode(stored['body'])
+    return stored['body']
+
+
+def _succeeded(result: monad.MEither) -> bool:
+    if result.is_left():
+        return False
+    response = result.value.response
+    return isinstance(response, monad.MEither) and response.is_right()
+
+
+def _record(status: str, ttl: int) -> Dict:
+    return {'status': status, 'expires_at': int(time.time()) + ttl}
+
+
+def _read(key: str) -> Optional[Dict]:
+    provider = IdempotencyConfig().persistence_provider
+    if not hasattr(provider, 'read'):
+        return None
+    result = provider.read(key=key)
+    if result is None or result.is_left():
+        return None
+    record = getattr(result.value, 'value', None)
+    if not record or expired(record):
+        return None
+    return record
+
+
+def _write(key: str, record: Optional[Dict]):
+    provider = IdempotencyConfig().persistence_provider
+    if not hasattr(provider, 'write'):
+        return
+    result = provider.write(key=key, value=record)
+    if result is not None and result.is_left():
+        logger.warn(msg="Idempotency Record Not Written", key=key, status=record['status'] if record else 'released')
+    pass
@@ -0,0 +1,213 @@
+from dataclasses import dataclass, field
+from email.message import Message
+from tempfile import SpooledTemporaryFile
+from typing import Dict, Iterator, List, Optional
+
+from . import app_value
+
+"""
+A multipart/form-data body parser, for use as a route's body_parser:
+
+> @app.route(('API', 'POST', '/documents'), opts={'body_parser': app_multipart.MultipartParser(max_part_size=5_000_000)})
+> def upload(request):
+>     form = request.event.body
+>     document = form.files['document']   # a file-like Part, with name, filename, content_type and headers
+>     ...
+
+The parser walks the decoded body (request.event.body_bytes) without copying it, and copies each part once, into a
+SpooledTemporaryFile, which stays in memory up to spool_threshold bytes and then spills to a file in /tmp.  The limits
+are enforced before anything is copied; the body size (estimated from the base64 length) before the body is decoded,
+and the size of each part when its boundary is found.  Exceeding a limit raises a MultipartError with code 413, and a
+malformed body a MultipartError with code 400, when request.event.body is read.  As the parser has parse_event, the
+pipeline reads the body (see app.parse_body) before the route is invoked, so the error is returned as a response with
+its status code.
+"""
+
+DEFAULT_SPOOL_THRESHOLD = 1024 * 1024
+DEFAULT_MAX_BODY_SIZE = 6 * 1024 * 1024
+DEFAULT_MAX_PARTS = 100
+CRLF = b"\r\n"
+
+
+class MultipartError(app_value.RequestBodyError):
+    pass
+
+
+@dataclass
+class Part:
+    """
+    A file-like form part.
+    """
+    name: Optional[str]
+    filename: Optional[str]
+    content_type: Optional[str]
+    headers: Dict[str, str]
+    size: int
+    file: SpooledTemporaryFile = field(repr=False)
+
+    def read(self, size: int = -1) -> bytes:
+        return self.file.read(size)
+
+    def readline(self, size: int = -1) -> bytes:
+        return self.file.readline(size)
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        return self.file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self.file.tell()
+
+    def __iter__(self):
+        return iter(self.file)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc):
+        self.close()
+
+    def text(self, encoding: str = 'utf-8') -> str:
+        self.file.seek(0)
+        return str(self.file.read(), encoding)
+
+    @property
+    def is_file(self) -> bool:
+        return self.filename is not None
+
+
+@dataclass
+class MultipartForm:
+    parts: List[Part]
+
+    @property
+    def fields(self) -> Dict[str, str]:
+        """
+        The (non-file) form fields, as str.
+        """
+        return {part.name: part.text() for part in self.parts if not part.is_file}
+
+    @property
+    def files(self) -> Dict[str, Part]:
+        return {part.name: part for part in self.parts if part.is_file}
+
+    def get(self, name: str) -> Optional[Part]:
+        return next((part for part in self.parts if part.name == name), None)
+
+    def close(self):
+        for part in self.parts:
+            part.close()
+
+
+class MultipartParser:
+
+    def __init__(self,
+                 spool_threshold: int = DEFAULT_SPOOL_THRESHOLD,
+                 max_part_size: Optional[int] = None,
+                 max_body_size: int = DEFAULT_MAX_BODY_SIZE,
+                 max_parts: int = DEFAULT_MAX_PARTS,
+                 tmp_dir: str = '/tmp'):
+        """
+        Args:
+            spool_threshold: The size above which a part is spilled from memory to a temporary file.
+            max_part_size: The maximum size of a part.  Defaults to max_body_size.
+            max_body_size: The maximum size of the decoded body.
+            max_parts: The maximum number of parts.
+            tmp_dir: The directory of the temporary files.
+        """
+        self.spool_threshold = spool_threshold
+        self.max_part_size = max_part_size if max_part_size else max_body_size
+        self.max_body_size = max_body_size
+        self.max_parts = max_parts
+        self.tmp_dir = tmp_dir
+
+    def parse_event(self, event) -> MultipartForm:
+        """
+        Parses the body of an ApiGatewayRequestEvent; the boundary is taken from its content-type header.
+        """
+        boundary = content_type_boundary(event.headers.get('content-type', None))
+        self.check_body_size(_decoded_size_estimate(event.event.get('body', None) or '',
+                                                    event.event.get('isBase64Encoded', False)))
+        return self.parse(event.body_bytes or b'', boundary)
+
+    def parse(self, body: bytes, boundary: bytes) -> MultipartForm:
+        self.check_body_size(len(body))
+        return MultipartForm(parts=list(self.iter_parts(body, boundary)))
+
+    def iter_parts(self, body: bytes, boundary: bytes) -> Iterator[Part]:
+        view = memoryview(body)
+        delimiter = b"--" + boundary
+        pos = body.find(delimiter)
+        if pos < 0:
+            raise MultipartError(message="multipart boundary not found", code=400)
+        count = 0
+        while True:
+            pos += len(delimiter)
+            if body.startswith(b"--", pos):
+                return
+            if body.startswith(CRLF, pos):
+                pos += len(CRLF)
+            headers_end = body.find(CRLF + CRLF, pos)
+            if headers_end < 0:
+                raise MultipartError(message="multipart part headers not terminated", code=400)
+            data_start = headers_end + 2 * len(CRLF)
+            data_end = body.find(CRLF + delimiter, data_start)
+            if data_end < 0:
+                raise MultipartError(message="multipart closing boundary not found", code=400)
+            count += 1
+            if count > self.max_parts:
+                raise MultipartError(message="multipart body has too many parts", code=413,
+                                     ctx={'max_parts': self.max_parts})
+            if data_end - data_start > self.max_part_size:
+                raise MultipartError(message="multipart part too large", code=413,
+                                     ctx={'max_part_size': self.max_part_size})
+            yield self.part(_part_headers(view[pos:headers_end]), view[data_start:data_end])
+            pos = data_end + len(CRLF)
+
+    def part(self, headers: Dict[str, str], data: memoryview) -> Part:
+        spool = SpooledTemporaryFile(max_size=self.spool_threshold, dir=self.tmp_dir)
+        spool.write(data)
+        spool.seek(0)
+        disposition = Message()
+        disposition['content-disposition'] = headers.get('content-disposition', '')
+        return Part(name=disposition.get_param('name', header='content-disposition'),
+                    filename=disposition.get_param('filename', header='content-disposition'),
+                    content_type=headers.get('content-type', None),
+                    headers=headers,
+                    size=len(data),
+                    file=spool)
+
+    def check_body_size(self, size: int):
+        if size > self.max_body_size:
+            raise MultipartError(message="multipart body too large", code=413,
+                                 ctx={'max_body_size': self.max_body_size})
+
+
+def content_type_boundary(content_type: Optional[str]) -> bytes:
+    message = Message()
+    message['content-type'] = content_type or ''
+    if message.get_content_type() != 'multipart/form-data' or not (boundary := message.get_param('boundary')):
+        raise MultipartError(message="not a multipart/form-data body", code=400)
+    try:
+        return boundary.encode('latin-1')
+    except UnicodeEncodeError:
+        raise MultipartError(message="multipart boundary is not valid", code=400)
+
+
+def _part_headers(raw_headers: memoryview) -> Dict[str, str]:
+    try:
+        decoded = str(raw_headers, 'utf-8', errors='strict')
+    except UnicodeDecodeError:
+        raise MultipartError(message="multipart part headers are not valid utf-8", code=400)
+    headers = {}
+    for line in decoded.split("\r\n"):
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return headers
+
+
+def _decoded_size_estimate(body: str, is_base64_encoded: bool) -> int:
+    return len(body) * 3 // 4 if is_base64_encoded else len(body)
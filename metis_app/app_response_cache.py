@@ -0,0 +1,214 @@
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from metis_fn import monad, singleton
+
+from . import app_value, app_serialisers, cache
+
+"""
+An in-process cache of serialised responses, for API GET (and HEAD) routes whose responses change slowly (e.g. reference
+data).  Enable on a route with:
+> @app.route(('API', 'GET', '/reference/{kind}'), opts={'cache': {'ttl': 60, 'vary': ['path_params', 'query_params']}})
+
+Cached responses are always keyed by the route and the request's concrete path params and query params, so each
+resource of a templated route is cached separately.  vary lists the further parts of the request which key the cached
+response:
++ sub.  The subject of the request's id token (from the PIP).  A request without a valid token is not cached.  Without
+  sub, a cached response is shared by all (authorised) subjects.
++ header:{name}.  A request header; e.g. 'header:accept-language'.
+path_params and query_params are also accepted in vary, and are always part of the key.
+
+The cache is checked after the PIP and the guard (so authorisation still runs for every request), and before the
+params_parser.  On a hit, the route function and the serialisation of the body are skipped.  On a miss, a successful
+(200) response is serialised once, by the responder, and cached for the ttl.  The hit ratio is added to the End Handler
+log.
+
+Cached responses can be invalidated (e.g. from a route which updates the data) by route or by tag:
+> app_response_cache.ResponseCache().invalidate(route=('API', 'GET', '/reference/{kind}'))
+> app_response_cache.ResponseCache().invalidate(tag='reference')
+
+Tags are declared on the route, opts={'cache': {'ttl': 60, 'tags': ['reference']}}, or added to a response by the route
+function with app_response_cache.tag(request, 'customer:123').
+
+The cache is held per container, so is not shared between (or invalidated across) containers; the ttl bounds how stale
+a response can be.
+"""
+
+DEFAULT_CACHE_SIZE = 256
+CACHEABLE_METHODS = ('GET', 'HEAD')
+VARY_PARTS = ('path_params', 'query_params', 'sub')
+KEYED_PARTS = ('path_params', 'query_params')
+HEADER_VARY_PREFIX = 'header:'
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    route: Union[str, Tuple]
+    ttl: int
+    vary: Tuple[str, ...] = ()
+    tags: Tuple[str, ...] = ()
+
+
+@dataclass
+class CachedResponse:
+    body: str | bytes
+    content_type: Optional[str]
+    headers: Optional[Dict]
+    route: Union[str, Tuple]
+    tags: frozenset
+
+
+@dataclass
+class CacheLookup:
+    key: Tuple
+    policy: CachePolicy
+    hit: bool = False
+    tags: List[str] = field(default_factory=list)
+
+
+class ResponseCache(singleton.Singleton):
+    responses = cache.TtlLru(DEFAULT_CACHE_SIZE)
+
+    def configure(self, max_size: int = DEFAULT_CACHE_SIZE):
+        """
+        Sets the maximum number of cached responses.  A max_size of 0 disables the cache.
+        """
+        self.responses = cache.TtlLru(max_size)
+        return self
+
+    def invalidate(self, route: Union[str, Tuple, None] = None, tag: Optional[str] = None) -> int:
+        """
+        Removes the cached responses of the route, or with the tag; or all cached responses when neither is given.
+        Returns the number removed.
+        """
+        if route is None and tag is None:
+            return self.responses.remove_if(lambda _key, _response: True)
+        return self.responses.remove_if(lambda _key, response: (route is not None and response.route == route) or
+                                                               (tag is not None and tag in response.tags))
+
+    def clear(self):
+        self.responses.clear()
+        return self
+
+    def stats(self) -> Dict[str, Any]:
+        return self.responses.stats()
+
+
+def compile_policy(route: Union[str, Tuple], opts: Dict) -> CachePolicy:
+    """
+    Compiles the route's cache opts, once, when the route is added.  An unknown vary part raises a ValueError.
+    """
+    unknown = [part for part in opts.get('vary', [])
+               if part not in VARY_PARTS and not part.startswith(HEADER_VARY_PREFIX)]
+    if unknown:
+        raise ValueError("Unsupported cache vary {}; use {} or header:name".format(unknown, VARY_PARTS))
+    return CachePolicy(route=route,
+                       ttl=opts['ttl'],
+                       vary=tuple(part.lower() for part in opts.get('vary', [])),
+                       tags=tuple(opts.get('tags', [])))
+
+
+def lookup(request: app_value.Request) -> monad.MEither:
+    """
+    The pipeline stage which answers the request from the cache.  A hit sets the cached response on the request, and
+    is marked, so route_invoker does not invoke the route function.
+    """
+    event = request.event
+    if not (policy := _policy(event)):
+        return monad.Right(request)
+    if (key := cache_key(request, policy)) is None:
+        return monad.Right(request)
+    cached = ResponseCache().responses.get(key)
+    request.response_cache = CacheLookup(key=key, policy=policy, hit=cached is not None)
+    if cached is None:
+        return monad.Right(request)
+    if cached.headers:
+        request.response_headers = {**(request.response_headers or {}), **cached.headers}
+    return monad.Right(request.replace('response', monad.Right(
+        app_serialisers.PreSerialisedSerialiser(cached.body, content_type=cached.content_type))))
+
+
+def is_hit(request: app_value.Request) -> bool:
+    return bool(request.response_cache) and request.response_cache.hit
+
+
+def tag(request: app_value.Request, *tags: str) -> app_value.Request:
+    """
+    Tags the response to be cached, for invalidation by tag.
+    """
+    if request.response_cache:
+        request.response_cache.tags.extend(tags)
+    return request
+
+
+def store(result: monad.MEither) -> monad.MEither:
+    """
+    Caches the serialised body of a successful response to a missed lookup, and replaces the response with the
+    serialised body, so it is not serialised again.
+    """
+    request = result.lift()
+    if not isinstance(request, app_value.Request) or not request.response_cache or request.response_cache.hit:
+        return result
+    if not _cacheable(result):
+        return result
+    body = request.response.value
+    lookup_state = request.response_cache
+    cached = CachedResponse(body=body.serialise(),
+                            content_type=body.content_type,
+                            headers=request.response_headers,
+                            route=lookup_state.policy.route,
+                            tags=frozenset((*lookup_state.policy.tags, *lookup_state.tags)))
+    ResponseCache().responses.put(lookup_state.key, cached, time.time() + lookup_state.policy.ttl)
+    request.response = monad.Right(app_serialisers.PreSerialisedSerialiser(cached.body,
+                                                                           content_type=cached.content_type))
+    return result
+
+
+def cache_key(request: app_value.Request, policy: CachePolicy) -> Optional[Tuple]:
+    event = request.event
+    parts = [policy.route, _params_key(event.path_params), _params_key(event.query_params)]
+    for part in policy.vary:
+        if part in KEYED_PARTS:
+            continue
+        if part == 'sub':
+            if (sub := _subject(request)) is None:
+                return None
+            parts.append(sub)
+        else:
+            parts.append(event.headers.get(part.removeprefix(HEADER_VARY_PREFIX), None))
+    return tuple(parts)
+
+
+def log_ctx(request: app_value.Request) -> Dict:
+    if not request.response_cache:
+        return {}
+    return {'response_cache': 'hit' if request.response_cache.hit else 'miss',
+            'response_cache_hit_ratio': ResponseCache().responses.hit_ratio()}
+
+
+def _params_key(params: Optional[Dict]) -> Tuple:
+    return tuple(sorted((name, tuple(value) if isinstance(value, list) else value)
+                        for name, value in (params or {}).items()))
+
+
+def _policy(event: app_value.RequestEvent) -> Optional[CachePolicy]:
+    if not isinstance(event, app_value.ApiGatewayRequestEvent) or event.method not in CACHEABLE_METHODS:
+        return None
+    return (event.route_opts or {}).get('cache_policy', None)
+
+
+def _subject(request: app_value.Request) -> Optional[str]:
+    pip = request.pip
+    if not pip or not getattr(pip, 'token_valid', None) or not pip.token_valid():
+        return None
+    return pip.id_token.value.sub()
+
+
+def _cacheable(result: monad.MEither) -> bool:
+    if result.is_left():
+        return False
+    request = result.value
+    if request.status_code and request.status_code != app_value.HttpStatusCode.OK:
+        return False
+    return isinstance(request.response, monad.MEither) and request.response.is_right()
@@ -1,58 +1,472 @@
-from typing import Optional, Dict, Any, List, Callable, Union, Tuple
+import asyncio
+import copy
+import dataclasses
+import fnmatch
+import importlib
+import inspect
+import re
+import threading
+import uuid
+from typing import Optional, Dict, List, Callable, Union, Tuple
+from dataclasses import dataclass, field
 from pymonad.tools import curry
 
 from metis_fn import singleton, fn, monad
 
-from . import app
+from . import (app, app_value, app_serialisers, app_async, app_batch, app_schema, app_response_cache,
+               app_idempotency, cache)
+
+"""
+Routes defined with the 3-part tuple form, e.g. ('API', 'GET', '/resourceBase/resource/{id}'), are compiled into a
+segment trie when they are registered.  The trie is keyed first on the event type and qualifier (e.g. ('API', 'GET')),
+and then on each path segment.  A node has literal children (by segment value) and templated children ('{...}'
+segments), one per param type; e.g. '/t/{id:int}' and '/t/{slug:re:[a-z]+}' are different children.
+
+Matching a path therefore costs in proportion to the depth of the path rather than the number of routes, and the
+templated arguments are collected during the same walk.
+
+When a path matches both a literal and a templated route, the literal route is preferred.  For example:
+> @app.route(pattern=('API', 'GET', '/resourceBase/resource/ACollection'))
+> @app.route(pattern=('API', 'GET', '/resourceBase/resource/{id1}'))
+The event path /resourceBase/resource/ACollection matches the first route regardless of the order of definition.
+
+When 2 different templated routes compile to the same trie node (e.g. '/resource/{id1}' and '/resource/{id2}') the
+second route is ambiguous, and add_route raises a ValueError; re-registering the same template replaces its route.
+
+The result of resolving a concrete event kind (e.g. ('API', 'GET', '/resourceBase/resource/uuid1') or an S3 bucket
+token) is memoised in a bounded LRU cache (RouteCache) in front of the router.  Pattern kinds (e.g. ('S3', 'bucket',
+'incoming/a.csv'), which are resolved by a PatternTable) are not cached, as each S3 object or Kafka topic would take an
+entry, evicting the hot API routes.  The cache is invalidated whenever a route is added.  Its size can be changed with RouteMap().configure_cache(max_size=...), and its hit/miss counters are
+available from RouteMap().cache_stats().
+
+Templated segments may be typed, e.g. '/orders/{id:int}', '/orders/{id:uuid}' or '/articles/{slug:re:[a-z-]+}'.  The
+type is compiled into a converter when the route is registered, and the converted value is provided in the event's
+path_params.  An untyped segment ('{id}') is provided as the str from the path.  The typed children of a node are tried
+in the order they were registered, and the untyped child last; so with '/t/{id:int}' and '/t/{slug:re:[a-z]+}', '/t/12'
+matches the first route and '/t/abc' the second.  When no route matches a path, but a route has a segment which fails
+its converter, the router returns a PathParamRejection as the route function.  The pipeline responds to a rejection
+with a 400 without running the PIP, the handler guard, or the route function.
+
+Routes can also be registered by reference with route_ref, e.g.
+> app.route_ref(('API', 'GET', '/orders/{id}'), 'svc.orders:get_order')
+The module is not imported until the first dispatch to the route, after which the loaded function replaces the reference
+in the route table.  preload_routes() imports all referenced routes eagerly (for instance, when using provisioned
+concurrency).  A referenced function must not itself be decorated with @app.route.
+
+S3, Kafka and EventBridge routes can be defined as patterns, where all but the last part of the tuple must match exactly
+and the last part is a glob (fnmatch), compiled into a regex when the route is registered:
+> @app.route(('S3', 'bucket-name', 'incoming/*.csv'))      # bucket name (or token) and object key
+> @app.route(('KAFKA', 'orders.*'))                        # topic
+> @app.route(('EVENTBRIDGE', 'source', 'detail-type'))     # source and detail-type
+A pattern without glob characters is matched with a dict lookup.  Otherwise, the first registered glob which matches
+is used.  When the records of a batch event match different routes, the event is split into a group per route and the
+request function becomes a BatchRouteDispatcher, which invokes each route with its own group of records.
+
+Additional types can be added to PATH_PARAM_CONVERTERS; a converter takes the str segment and returns the typed value,
+raising ValueError when the segment is invalid.
+"""
+
+DEFAULT_ROUTE_CACHE_SIZE = 256
+NO_ROUTE_TEMPLATE = 'no_matching_routes'
+PATTERN_EVENT_TYPES = ('S3', 'KAFKA', 'SQS', 'DYNAMODB', 'EVENTBRIDGE')
+GLOB_CHARS = re.compile(r"[*?\[]")
+STR_PARAM_TYPE = 'str'
+
+
+def _int_converter(segment: str) -> int:
+    if not INT_SEGMENT.fullmatch(segment):
+        raise ValueError("{} is not an int".format(segment))
+    return int(segment)
+
+
+def _uuid_converter(segment: str) -> uuid.UUID:
+    return uuid.UUID(segment)
+
+
+def _str_converter(segment: str) -> str:
+    return segment
+
+
+def _regex_converter(pattern: str) -> Callable:
+    compiled = re.compile(pattern)
+
+    def converter(segment: str) -> str:
+        if not compiled.fullmatch(segment):
+            raise ValueError("{} does not match {}".format(segment, pattern))
+        return segment
+
+    return converter
+
+
+INT_SEGMENT = re.compile(r"-?\d+")
+
+PATH_PARAM_CONVERTERS = {'str': _str_converter,
+                         'int': _int_converter,
+                         'float': float,
+                         'uuid': _uuid_converter}
+
+
+@dataclass
+class CompiledRoute:
+    template: Tuple[str, str, str]
+    f: Callable
+    opts: Optional[Dict]
+    param_names: List[str]
+    converters: List[Callable] = field(default_factory=list)
+
+    def convert(self, param_values: List[str]) -> Tuple[Dict, Dict]:
+        """
+        Returns the typed params, and the raw value of any param which failed its converter.
+        """
+        params, invalid = {}, {}
+        for name, converter, value in zip(self.param_names, self.converters, param_values):
+            try:
+                params[name] = converter(value)
+            except ValueError:
+                invalid[name] = value
+        return params, invalid
+
+
+@dataclass
+class PathParamRejection:
+    """
+    The route function returned by the router when the path matches a route template, but a typed segment is
+    invalid.
+    """
+    template: Tuple[str, str, str]
+    invalid_params: Dict[str, str]
+
+    def __call__(self, request):
+        request.status_code = app_value.HttpStatusCode.BadRequest
+        return monad.Left(request.replace('error', app.AppError(message='invalid path params',
+                                                                 code=400,
+                                                                 ctx={'invalid_params': self.invalid_params})))
+
+
+@dataclass
+class RouteNode:
+    literals: Dict[str, 'RouteNode'] = field(default_factory=dict)
+    params: Dict[str, 'RouteNode'] = field(default_factory=dict)
+    route: Optional[CompiledRoute] = None
+
+    def param_child(self, param_type: str) -> 'RouteNode':
+        """
+        The templated child for the param type.  The untyped (str) child is kept last, so that it is tried after the
+        typed children.
+        """
+        if param_type not in self.params:
+            self.params[param_type] = RouteNode()
+            if STR_PARAM_TYPE in self.params:
+                self.params[STR_PARAM_TYPE] = self.params.pop(STR_PARAM_TYPE)
+        return self.params[param_type]
+
+
+@dataclass
+class PatternRoute:
+    template: Tuple
+    f: Callable
+    opts: Optional[Dict]
+    matcher: Optional[re.Pattern] = None
+
+
+@dataclass
+class PatternTable:
+    literals: Dict[str, PatternRoute] = field(default_factory=dict)
+    globs: List[PatternRoute] = field(default_factory=list)
+
+    def add(self, route: PatternRoute, glob: str):
+        if not GLOB_CHARS.search(glob):
+            self.literals[glob] = route
+            return self
+        self.globs = [existing for existing in self.globs if existing.template != route.template] + [route]
+        return self
+
+    def match(self, value: str) -> Optional[PatternRoute]:
+        if (literal := self.literals.get(value, None)):
+            return literal
+        return fn.find(lambda route: route.matcher.fullmatch(value), self.globs)
+
+
+@dataclass
+class RouteGroup:
+    kind: Union[str, Tuple]
+    request_function: Callable
+    items: List
+    opts: Optional[Dict] = None
+    no_route: bool = False
+
+
+class BatchRouteDispatcher:
+    """
+    The request function for a batch event (e.g. S3 objects or Kafka records) whose records match different routes.
+    Each route is invoked with a copy of the request, where the event holds only the records for that route.  The
+    outcome of each route is available in request.results.  A route with {'idempotency': ...} opts claims the key of
+    its group of records (see app_idempotency), unless its records are claimed individually (per_record mode).
+    """
+
+    def __init__(self, groups: List[RouteGroup], items_property: str):
+        self.groups = groups
+        self.items_property = items_property
+
+    def __call__(self, request):
+        results = [self.invoke_group(request, group) for group in self.groups]
+        if any(inspect.isawaitable(result) for result in results):
+            # coroutine route fns, from the async pipeline
+            return self.gather(request, results)
+        return self.outcome(request, results)
+
+    async def gather(self, request, results: List):
+        return self.outcome(request, await asyncio.gather(*[app_async.resolve(result) for result in results]))
+
+    def outcome(self, request, results: List[monad.MEither]):
+        request.results = list(results)
+        request.batch_item_failures = app_batch.batch_item_failures(request.results)
+        summary = [self.group_summary(group, result) for group, result in zip(self.groups, request.results)]
+        if any(route_summary['status'] == 'fail' for route_summary in summary):
+            return monad.Left(request.replace('error', app.AppError(message='batch route failure',
+                                                                     code=500,
+                                                                     ctx={'routes': summary})))
+        return monad.Right(request.replace('response',
+                                           monad.Right(app_serialisers.DictToJsonSerialiser({'routes': summary}))))
+
+    def invoke_group(self, request, group: RouteGroup):
+        group_event = dataclasses.replace(request.event,
+                                          kind=group.kind,
+                                          request_function=group.request_function,
+                                          route_opts=group.opts,
+                                          **{self.items_property: group.items})
+        group_request = copy.copy(request).replace('event', group_event)
+        if (app_idempotency.is_enabled(group.opts)
+                and not getattr(group.request_function, 'idempotent_per_record', False)):
+            return app_idempotency.invoke(group_request, group.request_function)
+        return group.request_function(request=group_request)
+
+    def group_summary(self, group: RouteGroup, result: monad.MEither) -> Dict:
+        ok = app_batch.succeeded(result)
+        return {'kind': group.kind, 'items': len(group.items), 'status': 'ok' if ok else 'fail'}
+
+
+class RouteCache(cache.TtlLru):
+    """
+    A bounded LRU of resolved routes keyed on the event kind.  Its entries never expire; they are invalidated when a
+    route is added.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_ROUTE_CACHE_SIZE):
+        super().__init__(max_size)
+
+    def invalidate(self):
+        with self.lock:
+            self.entries.clear()
+        pass
+
+
+class LazyRouteFunction:
+    """
+    Stands in the route table for a route function registered by reference ('module.path:function_name').  The module
+    is imported on the first call (or on load()), and the route table is updated with the loaded function.
+    """
+
+    def __init__(self, pattern: Union[str, Tuple[str, str, str]], reference: str):
+        self.pattern = pattern
+        self.reference = reference
+        self.f = None
+        self.lock = threading.Lock()
+
+    def __call__(self, request):
+        return self.load()(request=request)
+
+    def load(self) -> Callable:
+        if self.f:
+            return self.f
+        with self.lock:
+            if not self.f:
+                module_name, _, fn_name = self.reference.partition(":")
+                self.f = getattr(importlib.import_module(module_name), fn_name)
+                RouteMap().replace_route_function(self.pattern, self, self.f)
+        return self.f
 
 
 class RouteMap(singleton.Singleton):
     routes = {}
+    trie = {}
+    patterns = {}
+    route_cache = RouteCache()
 
-    def add_route(self, pattern: Union[str, Tuple[str,str,str]], f: Callable, opts: Dict):
+    def add_route(self, pattern: Union[str, Tuple[str, str, str]], f: Callable, opts: Dict):
+        if opts and 'schema' in opts and 'validator' not in opts:
+            # The schema is compiled once, here, into the validator used by app_schema.validate_body
+            opts = {**opts, 'validator': app_schema.compile_schema(opts['schema'])}
+        if opts and 'cache' in opts and 'cache_policy' not in opts:
+            opts = {**opts, 'cache_policy': app_response_cache.compile_policy(pattern, opts['cache'])}
+        if is_pattern_route(pattern):
+            self._compile_pattern(pattern, f, opts)
+        elif isinstance(pattern, tuple):
+            self._compile(pattern, f, opts)
         self.routes[pattern] = (f, opts)
+        self.route_cache.invalidate()
+        pass
+
+    def add_route_ref(self, pattern: Union[str, Tuple[str, str, str]], reference: str, opts: Dict):
+        self.add_route(pattern=pattern, f=LazyRouteFunction(pattern, reference), opts=opts)
+        pass
+
+    def replace_route_function(self, pattern: Union[str, Tuple[str, str, str]], current_f: Callable, f: Callable):
+        """
+        Replaces the route function for the pattern, provided the route still maps to current_f.
+        """
+        route_item = self.routes.get(pattern, None)
+        if not route_item or route_item[0] is not current_f:
+            return
+        self.add_route(pattern=pattern, f=f, opts=route_item[1])
         pass
 
+    def preload(self) -> List[Callable]:
+        return [route_item[0].load() for route_item in list(self.routes.values())
+                if isinstance(route_item[0], LazyRouteFunction)]
+
+    def configure_cache(self, max_size: int = DEFAULT_ROUTE_CACHE_SIZE):
+        """
+        Sets the maximum number of resolved event kinds held in the route cache.  A max_size of 0 disables the cache.
+        """
+        self.route_cache.resize(max_size)
+        return self
+
+    def cache_stats(self) -> Dict:
+        return self.route_cache.stats()
+
+    def has_pattern_routes(self, qualifiers: Tuple) -> bool:
+        """
+        Whether any pattern route is defined for the exactly matched parts of a pattern; e.g. ('S3', 'bucket-name')
+        """
+        return qualifiers in self.patterns
+
+    def _compile_pattern(self, pattern: Tuple, f: Callable, opts: Dict):
+        glob = pattern[-1]
+        self.patterns.setdefault(pattern[:-1], PatternTable()).add(PatternRoute(template=pattern,
+                                                                                 f=f,
+                                                                                 opts=opts,
+                                                                                 matcher=re.compile(
+                                                                                     fnmatch.translate(glob))),
+                                                                    glob)
+
+    def _compile(self, pattern: Tuple[str, str, str], f: Callable, opts: Dict):
+        event_type, event_qual, event_template = pattern
+        node = self.trie.setdefault((event_type, event_qual), RouteNode())
+        param_names, converters = [], []
+        for segment in path_segments(event_template):
+            if is_template_segment(segment):
+                name, converter = template_param(segment)
+                param_names.append(name)
+                converters.append(converter)
+                node = node.param_child(template_param_type(segment))
+            else:
+                node = node.literals.setdefault(segment, RouteNode())
+        if node.route and node.route.template != pattern:
+            raise ValueError("Route {} is ambiguous with the route {}".format(pattern, node.route.template))
+        node.route = CompiledRoute(template=pattern,
+                                   f=f,
+                                   opts=opts,
+                                   param_names=param_names,
+                                   converters=converters)
+
     def no_route(self, return_template=False) -> Union[Callable, Tuple[str, Callable]]:
         no_route_route = self.routes.get('no_matching_route', None)
         if not no_route_route:
             no_route_route = (self.default_no_route, None)
         if return_template:
-            return 'no_matching_routes', no_route_route[0], no_route_route[1]
+            return NO_ROUTE_TEMPLATE, no_route_route[0], no_route_route[1]
         return no_route_route
 
     def default_no_route(self, request):
         return monad.Left(request.replace('error', app.AppError(message='no matching route', code=404)))
 
-    def get_route(self, route: Union[str, Tuple]) -> Tuple[Union[str, Tuple], Callable]:
+    def get_route(self, route: Union[str, Tuple]) -> Tuple[Union[str, Tuple], Callable, Dict]:
+        template, route_fn, opts, _params = self.match_route(route)
+        return template, route_fn, opts
+
+    def match_route(self, route: Union[str, Tuple]) -> Tuple[Union[str, Tuple], Callable, Dict, Dict]:
+        """
+        Returns the route_pattern, route_fn, route_opts and the path params extracted from the event's templated
+        path segments.  Resolved routes are served from the route cache when the same kind has been seen before;
+        except for pattern kinds, which are matched in their PatternTable.
+        """
+        if is_pattern_route(route):
+            return self._resolve(route)
+        cached = self.route_cache.get(route)
+        if cached:
+            template, route_fn, opts, params = cached
+            return template, route_fn, opts, dict(params)
+        template, route_fn, opts, params = self.route_cache.put(route, self._resolve(route))
+        return template, route_fn, opts, dict(params)
+
+    def _resolve(self, route: Union[str, Tuple]) -> Tuple[Union[str, Tuple], Callable, Dict, Dict]:
         if isinstance(route, str):
-            match = self.routes.get(route, self.no_route())
-            return route, match[0], match[1]
-        possible_matching_routes = self._multi_match_determination(route,
-                                                                   self.event_matches(route[0], route[1], route[2]))
-        if not possible_matching_routes:
-            return self.no_route(True)
+            if route not in self.routes:
+                return *self.no_route(True), {}
+            match = self.routes[route]
+            return route, match[0], match[1], {}
+        if is_pattern_route(route):
+            return self.pattern_match(route)
+        rejections = []
+        compiled = self.event_match(route[0], route[1], route[2], rejections)
+        if compiled:
+            compiled_route, params = compiled
+            return compiled_route.template, compiled_route.f, compiled_route.opts, params
+        if rejections:
+            return rejections[0].template, rejections[0], None, {}
+        return *self.no_route(True), {}
 
-        # return the route_pattern, route_fn, and route_opts
-        return possible_matching_routes[0][0], possible_matching_routes[0][1][0], possible_matching_routes[0][1][1],
+    def pattern_match(self, route: Tuple) -> Tuple[Union[str, Tuple], Callable, Dict, Dict]:
+        table = self.patterns.get(route[:-1], None)
+        pattern_route = table.match(route[-1]) if table else None
+        if not pattern_route:
+            return *self.no_route(True), {}
+        return pattern_route.template, pattern_route.f, pattern_route.opts, {}
 
-    def _multi_match_determination(self, route, matches):
+    def allowed_methods(self, path: str) -> List[str]:
         """
-        Only for APIs with the route defined as ('API', 'GET', '/resourceBase/resource/ACollection')".
-
-        When a path has both an instance (id-based) and collection based route defined.
-        E.g. @app.route(pattern=('API', 'GET', '/resourceBase/resource/ACollection')) is the same as
-             @app.route(pattern=('API', 'GET', '/resourceBase/resource/{id1}'))
-        when the event path is /resourceBase/resource/ACollection (ACollection also matches {id1}
+        The API methods with a route matching the path.  HEAD is allowed wherever GET is.
         """
-        if not matches or len(matches) == 1:
-            return matches  # no matching routes or only 1 route
-        if all(["{" in m[0][2] for m in matches]):  # Each match is a templated path, so ambiguous
-            return None
-        # Otherwise the first one defined is used for the path.
-        return [matches[0]]
+        methods = [method for event_type, method in self.trie.keys()
+                   if event_type == 'API' and method != 'OPTIONS' and self.event_match('API', method, path)]
+        if 'GET' in methods and 'HEAD' not in methods:
+            methods.append('HEAD')
+        return methods
 
+    def event_match(self, pos1, pos2, pos3, rejections: List = None) -> Optional[Tuple[CompiledRoute, Dict]]:
+        root = self.trie.get((pos1, pos2), None)
+        if not root:
+            return None
+        return self.matcher(root, path_segments(pos3), 0, [], rejections if rejections is not None else [])
 
+    def matcher(self,
+                node: RouteNode,
+                event_xs: List[str],
+                position: int,
+                param_values: List[str],
+                rejections: List[PathParamRejection]):
+        """
+        Walks the trie, preferring a literal segment over a templated one, and backtracking to the templated
+        branches (in turn) when the literal branch does not lead to a route.  A route whose typed segments fail conversion
+        does not match, and is recorded in rejections.
+        """
+        if position == len(event_xs):
+            if not node.route:
+                return None
+            params, invalid = node.route.convert(param_values)
+            if invalid:
+                rejections.append(PathParamRejection(template=node.route.template, invalid_params=invalid))
+                return None
+            return node.route, params
+        segment = event_xs[position]
+        if (literal := node.literals.get(segment, None)) and (
+                found := self.matcher(literal, event_xs, position + 1, param_values, rejections)):
+            return found
+        for param in node.params.values():
+            if (found := self.matcher(param, event_xs, position + 1, param_values + [segment], rejections)):
+                return found
+        return None
 
     def route_pattern_from_function(self, route_fn: Callable):
         route_item = fn.find(self.route_function_predicate(route_fn), self.routes.items())
@@ -64,36 +478,57 @@ class RouteMap(singleton.Singleton):
     def route_function_predicate(self, route_fn, route):
         return route[1][0] == route_fn
 
-    def event_matches(self, pos1, pos2, pos3) -> Dict[Tuple, str]:
-        return list(fn.select(self.match_predicate(pos1, pos2, pos3), self.routes.items()))
 
-    @curry(5)
-    def match_predicate(self, pos1, pos2, pos3, route_item: Tuple[Union[str, Tuple], Callable]):
-        if isinstance(route_item[0], str):
-            return None
-        event_type, event_qual, event_template = route_item[0]
-        if event_type == pos1 and event_qual == pos2 and self.template_matches(event_template, pos3):
-            return True
-        return None
+def is_pattern_route(pattern: Union[str, Tuple]) -> bool:
+    return isinstance(pattern, tuple) and pattern[0] in PATTERN_EVENT_TYPES
+
+
+def is_no_route(template: Union[str, Tuple]) -> bool:
+    return template == NO_ROUTE_TEMPLATE
+
+
+def path_segments(path: str) -> List[str]:
+    return [segment for segment in path.split("/") if segment]
+
+
+def is_template_segment(segment: str) -> bool:
+    return "{" in segment and "}" in segment
+
+
+def template_param_type(segment: str) -> str:
+    """
+    The type of a templated segment, e.g. 'int' for '{id:int}'; an untyped segment is a str.
+    """
+    return _template_param_parts(segment)[1] or STR_PARAM_TYPE
+
+
+def _template_param_parts(segment: str) -> Tuple[str, str]:
+    if segment.startswith("{") and segment.endswith("}"):
+        name, _, param_type = segment[1:-1].partition(":")
+        return name, param_type
+    return segment.replace("{", "").replace("}", ""), ""
+
 
-    def template_matches(self, template, event):
-        return self.matcher(fn.rest(template.split("/")), fn.rest(event.split("/")))
+def template_param(segment: str) -> Tuple[str, Callable]:
+    """
+    Parses a templated segment into the param name and its converter, e.g.
+    > template_param('{id:int}')
+    ('id', _int_converter)
+    > template_param('{slug:re:[a-z-]+}')
+    ('slug', <regex converter>)
+    """
+    name, param_type = _template_param_parts(segment)
+    if not param_type:
+        return name, _str_converter
+    if param_type.startswith("re:"):
+        return name, _regex_converter(param_type[3:])
+    if param_type not in PATH_PARAM_CONVERTERS:
+        raise ValueError("Unknown path param type {} in template segment {}".format(param_type, segment))
+    return name, PATH_PARAM_CONVERTERS[param_type]
 
-    def matcher(self, template_xs: List, event_xs: List):
-        template_fst, template_rst = fn.first(template_xs), fn.rest(template_xs)
-        ev_fst, ev_rst = fn.first(event_xs), fn.rest(event_xs)
-        if not template_fst and not ev_fst:
-            return True
-        if not template_fst and ev_fst:
-            return False
-        if template_fst and not ev_fst:
-            return False
-        if not self.ismatch(template_fst, ev_fst):
-            return False
-        return self.matcher(template_rst, ev_rst)
 
-    def ismatch(self, template_token, ev_token):
-        return ("{" in template_token and "}" in template_token) or template_token == ev_token
+def is_router_rejection(route_fn: Callable) -> bool:
+    return isinstance(route_fn, PathParamRejection)
 
 
 def route(pattern: Union[str, Tuple[str, str, str]], opts: Dict = None):
@@ -105,6 +540,21 @@ def route(pattern: Union[str, Tuple[str, str, str]], opts: Dict = None):
     return inner
 
 
+def route_ref(pattern: Union[str, Tuple[str, str, str]], reference: str, opts: Dict = None):
+    """
+    Route Mapper for a route function given by reference; 'module.path:function_name'.  The module is imported on the
+    first dispatch to the route.
+    """
+    RouteMap().add_route_ref(pattern=pattern, reference=reference, opts=opts)
+    pass
+
+
+def preload_routes() -> List[Callable]:
+    """
+    Imports the modules of all routes registered by reference.
+    """
+    return RouteMap().preload()
+
+
 def std_noop_response(request):
     return monad.Right(request.replace('response', monad.Right({})))
-
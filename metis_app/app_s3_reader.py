@@ -0,0 +1,187 @@
+import csv
+import gzip
+import io
+import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, Optional
+
+from . import aws_client_helpers
+
+"""
+Streams an S3 object through ranged GETs, rather than reading the whole object into memory:
+
+> for record in obj.iter_records(format='jsonl'):     # obj is an app.S3Object from request.event.objects
+>     ...
+> for line in obj.iter_lines():
+>     ...
+> with obj.open(mode='rb') as stream:
+>     header = stream.read(1024)
+
+The object is fetched in chunk_size ranges, with up to read_ahead ranges fetched ahead (on a background thread) of the
+range being read, so memory is bounded by chunk_size * (read_ahead + 1), whatever the size of the object.  Each range is
+requested with the ETag from the initial HEAD, so an object replaced while it is being read fails the read rather than
+returning a mix of versions.
+
+Gzip objects (a '.gz' key or a ContentEncoding of gzip, with compression='auto') are decompressed as they are read.
+
+The client is the cached client from aws_client_helpers (aws_ctx().s3) unless one is provided.
+"""
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+DEFAULT_READ_AHEAD = 1
+RECORD_FORMATS = ('jsonl', 'csv')
+
+
+class S3RangeReader(io.RawIOBase):
+    """
+    A raw, read-only, stream of an object's bytes, fetched in ranges.
+    """
+
+    def __init__(self,
+                 bucket: str,
+                 key: str,
+                 client: Optional[Any] = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 read_ahead: int = DEFAULT_READ_AHEAD):
+        super().__init__()
+        if chunk_size < 1 or read_ahead < 0:
+            raise ValueError("chunk_size must be positive and read_ahead must not be negative")
+        self.bucket = bucket
+        self.key = key
+        self.client = client if client is not None else aws_client_helpers.aws_ctx().s3
+        self.chunk_size = chunk_size
+        self.read_ahead = read_ahead
+        head = self.client.head_object(Bucket=bucket, Key=key)
+        self.size = head['ContentLength']
+        self.etag = head.get('ETag', None)
+        self.content_encoding = head.get('ContentEncoding', None)
+        self._next_range_start = 0
+        self._pending = deque()
+        self._chunk = memoryview(b"")
+        self._executor = ThreadPoolExecutor(max_workers=1) if read_ahead else None
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if not self._chunk:
+            self._chunk = self._next_chunk()
+        n = min(len(buffer), len(self._chunk))
+        buffer[:n] = self._chunk[:n]
+        self._chunk = self._chunk[n:]
+        return n
+
+    def close(self):
+        if not self.closed:
+            for future in self._pending:
+                future.cancel()
+            self._pending.clear()
+            self._chunk = memoryview(b"")
+            if self._executor:
+                self._executor.shutdown(wait=False)
+        super().close()
+
+    def _next_chunk(self) -> memoryview:
+        while len(self._pending) <= self.read_ahead and self._next_range_start < self.size:
+            self._pending.append(self._request_range(self._next_range_start,
+                                                     min(self._next_range_start + self.chunk_size, self.size) - 1))
+            self._next_range_start += self.chunk_size
+        if not self._pending:
+            return memoryview(b"")
+        return memoryview(self._pending.popleft().result())
+
+    def _request_range(self, first: int, last: int):
+        if self._executor:
+            return self._executor.submit(self._get_range, first, last)
+        return _Completed(self._get_range(first, last))
+
+    def _get_range(self, first: int, last: int) -> bytes:
+        args = {'Bucket': self.bucket, 'Key': self.key, 'Range': "bytes={}-{}".format(first, last)}
+        if self.etag:
+            args['IfMatch'] = self.etag
+        return self.client.get_object(**args)['Body'].read()
+
+
+class _Completed:
+    def __init__(self, value):
+        self.value = value
+
+    def result(self):
+        return self.value
+
+    def cancel(self):
+        return False
+
+
+class _GzipStream(gzip.GzipFile):
+    """
+    A GzipFile which closes the stream it decompresses.
+    """
+
+    def close(self):
+        fileobj = self.fileobj
+        try:
+            super().close()
+        finally:
+            if fileobj is not None:
+                fileobj.close()
+
+
+def open_object(bucket: str,
+                key: str,
+                mode: str = 'rb',
+                encoding: str = 'utf-8',
+                newline: Optional[str] = None,
+                compression: Optional[str] = 'auto',
+                client: Optional[Any] = None,
+                chunk_size: int = DEFAULT_CHUNK_SIZE,
+                read_ahead: int = DEFAULT_READ_AHEAD) -> io.IOBase:
+    """
+    Opens the object as a buffered binary stream (mode 'rb'), or a text stream (mode 'r').  compression is 'auto'
+    (gzip when the key ends with '.gz' or the ContentEncoding is gzip), 'gzip' or None.
+    """
+    if mode not in ('r', 'rb'):
+        raise ValueError("S3 objects are opened with mode 'r' or 'rb', not {}".format(mode))
+    if compression not in ('auto', 'gzip', None):
+        raise ValueError("compression is 'auto', 'gzip' or None, not {}".format(compression))
+    raw = S3RangeReader(bucket, key, client=client, chunk_size=chunk_size, read_ahead=read_ahead)
+    stream = io.BufferedReader(raw, buffer_size=min(chunk_size, io.DEFAULT_BUFFER_SIZE * 8))
+    if compression == 'gzip' or (compression == 'auto' and _is_gzip(raw)):
+        stream = _GzipStream(fileobj=stream, mode='rb')
+    if mode == 'rb':
+        return stream
+    return io.TextIOWrapper(stream, encoding=encoding, newline=newline)
+
+
+def iter_lines(bucket: str, key: str, **open_args) -> Iterator[str]:
+    """
+    The object's lines, without their line endings.
+    """
+    with open_object(bucket, key, mode='r', **open_args) as stream:
+        for line in stream:
+            yield line.rstrip("\n")
+
+
+def iter_records(bucket: str,
+                 key: str,
+                 format: str = 'jsonl',
+                 csv_args: Optional[Dict] = None,
+                 **open_args) -> Iterator[Any]:
+    """
+    The object's records; a parsed JSON value for each non-blank line (jsonl), or a dict for each row, keyed by the
+    header row (csv, with csv_args passed to csv.DictReader).
+    """
+    if format not in RECORD_FORMATS:
+        raise ValueError("Record format is one of {}, not {}".format(RECORD_FORMATS, format))
+    if format == 'csv':
+        with open_object(bucket, key, mode='r', newline='', **open_args) as stream:
+            yield from csv.DictReader(stream, **(csv_args or {}))
+        return
+    for line in iter_lines(bucket, key, **open_args):
+        if line.strip():
+            yield json.loads(line)
+
+
+def _is_gzip(raw: S3RangeReader) -> bool:
+    return raw.key.endswith('.gz') or raw.content_encoding == 'gzip'
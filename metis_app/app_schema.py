@@ -0,0 +1,365 @@
+import json
+import re
+from decimal import Decimal, InvalidOperation
+from typing import Any, Callable, Dict, List, Tuple
+
+from metis_fn import monad
+
+from . import app_value
+
+"""
+JSON schema validation of API request bodies, enabled with the route opts:
+> @app.route(('API', 'POST', '/orders'), opts={'schema': ORDER_SCHEMA})
+
+The schema is compiled when the route is added, into a tree of closures (one per keyword), which is held in the route
+opts as 'validator'; so a request is validated without interpreting the schema.  Each keyword is compiled twice; into
+a predicate, used to check the (usually valid) body without tracking paths, and into a collector of the violations
+with their paths, used only when the predicate fails.  Unsupported keywords (e.g. $ref) raise a ValueError when the
+route is added.
+
+The body is validated by the pipeline, before the params_parser.  A str body (i.e. without a body_parser) is parsed
+as JSON, and the parsed body replaces request.event.body.  When the body is invalid, the pipeline responds with a 400,
+with all the violations in the error ctx:
+> {'error': 'request body failed schema validation', 'code': 400, 'ctx': {'violations': [{'path': '$.lines[0].qty',
+>  'keyword': 'minimum', 'message': 'must be >= 1'}]}}
+"""
+
+Path = Tuple[str | int, ...]
+Violations = List[Dict[str, str]]
+Predicate = Callable[[Any], bool]
+Collector = Callable[[Any, Path, Violations], None]
+Node = Tuple[Predicate, Collector]
+
+ANNOTATION_KEYWORDS = {'$schema', '$id', '$comment', 'title', 'description', 'default', 'examples', 'format',
+                       'readOnly', 'writeOnly', 'deprecated'}
+
+TYPES = {'object': dict, 'array': list, 'string': str, 'integer': int, 'number': (int, float), 'boolean': bool,
+         'null': type(None)}
+
+MISSING = object()
+
+
+def compile_schema(schema: Dict) -> Callable[[Any], Violations]:
+    """
+    Compiles the schema into a fn which takes an instance and returns its violations (empty when valid).
+    """
+    predicate, collector = _compile(schema)
+
+    def validator(instance: Any) -> Violations:
+        if predicate(instance):
+            return []
+        violations = []
+        collector(instance, (), violations)
+        return violations
+
+    return validator
+
+
+def validate_body(request: app_value.Request) -> monad.EitherMonad[app_value.Request]:
+    """
+    The pipeline step which validates the request body against the route's compiled schema.
+    """
+    validator = (request.event.route_opts or {}).get('validator', None)
+    if not validator:
+        return monad.Right(request)
+    try:
+        body = getattr(request.event, 'body', None)
+    except app_value.RequestBodyError as e:
+        return app_value.failed_request(request, monad.Left(e))
+    if isinstance(body, (str, bytes)):
+        try:
+            body = json.loads(body)
+        except ValueError:
+            return _rejection(request, [{'path': '$', 'keyword': 'json', 'message': 'is not valid JSON'}])
+        request.event.body = body
+    if (violations := validator(body)):
+        return _rejection(request, violations)
+    return monad.Right(request)
+
+
+def _rejection(request: app_value.Request, violations: Violations) -> monad.EitherMonad[app_value.Request]:
+    return monad.Left(request.replace('status_code', app_value.HttpStatusCode.BadRequest)
+                      .replace('error', app_value.AppError(message='request body failed schema validation',
+                                                           code=400,
+                                                           ctx={'violations': violations})))
+
+
+def _compile(schema: Dict | bool) -> Node:
+    if schema is True or schema == {}:
+        return _always_valid, _no_violations
+    if schema is False:
+        return _check('false', lambda _instance: False, 'is not allowed')
+    nodes = [node for node in (_compile_keyword(keyword, value, schema) for keyword, value in schema.items()
+                               if keyword not in ANNOTATION_KEYWORDS) if node is not None]
+    if len(nodes) == 1:
+        return nodes[0]
+    predicates = [predicate for predicate, _ in nodes]
+    collectors = [collector for _, collector in nodes]
+
+    def predicate(instance):
+        for keyword_predicate in predicates:
+            if not keyword_predicate(instance):
+                return False
+        return True
+
+    def collector(instance, path, violations):
+        for keyword_collector in collectors:
+            keyword_collector(instance, path, violations)
+
+    return predicate, collector
+
+
+def _compile_keyword(keyword: str, value: Any, schema: Dict) -> Node | None:
+    match keyword:
+        case 'type':
+            return _type(value)
+        case 'enum':
+            return _check('enum', lambda instance: any(_json_equal(instance, member) for member in value),
+                          "must be one of {}".format(value))
+        case 'const':
+            return _check('const', lambda instance: _json_equal(instance, value), "must be {}".format(value))
+        case 'properties':
+            return _properties(value)
+        case 'required':
+            return _required(value)
+        case 'additionalProperties':
+            return _additional_properties(value, frozenset(schema.get('properties', {})))
+        case 'items':
+            return _items(value)
+        case 'minItems' | 'maxItems' | 'minLength' | 'maxLength' | 'minProperties' | 'maxProperties':
+            return _size(keyword, value)
+        case 'uniqueItems':
+            return _unique_items() if value else None
+        case 'minimum' | 'maximum' | 'exclusiveMinimum' | 'exclusiveMaximum' | 'multipleOf':
+            return _number(keyword, value)
+        case 'pattern':
+            search = re.compile(value).search
+            return _check('pattern', lambda instance: instance.__class__ is not str or search(instance) is not None,
+                          "must match {}".format(value))
+        case 'allOf':
+            return _all_of([_compile(sub_schema) for sub_schema in value])
+        case 'anyOf' | 'oneOf':
+            return _any_or_one_of(keyword, [_compile(sub_schema)[0] for sub_schema in value])
+        case 'not':
+            sub_predicate, _ = _compile(value)
+            return _check('not', lambda instance: not sub_predicate(instance), "must not match the schema")
+        case _:
+            raise ValueError("Unsupported JSON schema keyword {}".format(keyword))
+
+
+def _always_valid(_instance) -> bool:
+    return True
+
+
+def _no_violations(_instance, _path, _violations):
+    pass
+
+
+def _violation(violations: Violations, path: Path, keyword: str, message: str):
+    violations.append({'path': format_path(path), 'keyword': keyword, 'message': message})
+
+
+def _check(keyword: str, predicate: Predicate, message: str) -> Node:
+    """
+    A keyword which validates the instance itself (rather than its members).
+    """
+    def collector(instance, path, violations):
+        if not predicate(instance):
+            _violation(violations, path, keyword, message)
+
+    return predicate, collector
+
+
+def _type(value: str | List[str]) -> Node:
+    types = [value] if isinstance(value, str) else value
+    python_types = tuple(python_type for type_name in types
+                         for python_type in (TYPES[type_name] if isinstance(TYPES[type_name], tuple)
+                                             else (TYPES[type_name],)))
+    # bool is an int; it is only a boolean
+    excludes_bool = 'boolean' not in types
+    if excludes_bool:
+        is_type = lambda instance: isinstance(instance, python_types) and instance.__class__ is not bool
+    else:
+        is_type = lambda instance: isinstance(instance, python_types)
+    if 'integer' in types and 'number' not in types:
+        # A float with a zero fractional part (e.g. 1.0) is an integer
+        predicate = lambda instance: is_type(instance) or (instance.__class__ is float and instance.is_integer())
+    else:
+        predicate = is_type
+    return _check('type', predicate, "must be of type {}".format(" or ".join(types)))
+
+
+def _properties(properties: Dict[str, Dict]) -> Node:
+    nodes = [(name, *_compile(sub_schema)) for name, sub_schema in properties.items()]
+
+    def predicate(instance):
+        if instance.__class__ is not dict:
+            return True
+        for name, property_predicate, _ in nodes:
+            if (value := instance.get(name, MISSING)) is not MISSING and not property_predicate(value):
+                return False
+        return True
+
+    def collector(instance, path, violations):
+        if instance.__class__ is not dict:
+            return
+        for name, _, property_collector in nodes:
+            if name in instance:
+                property_collector(instance[name], path + (name,), violations)
+
+    return predicate, collector
+
+
+def _required(names: List[str]) -> Node:
+    def predicate(instance):
+        if instance.__class__ is not dict:
+            return True
+        for name in names:
+            if name not in instance:
+                return False
+        return True
+
+    def collector(instance, path, violations):
+        if instance.__class__ is not dict:
+            return
+        for name in names:
+            if name not in instance:
+                _violation(violations, path + (name,), 'required', 'is required')
+
+    return predicate, collector
+
+
+def _additional_properties(schema: Dict | bool, defined: frozenset) -> Node:
+    additional_predicate, additional_collector = _compile(schema)
+
+    def predicate(instance):
+        if instance.__class__ is not dict or instance.keys() <= defined:
+            return True
+        return schema is not False and all(additional_predicate(instance[name]) for name in instance.keys() - defined)
+
+    def collector(instance, path, violations):
+        if instance.__class__ is not dict:
+            return
+        for name in instance.keys() - defined:
+            if schema is False:
+                _violation(violations, path + (name,), 'additionalProperties', 'is not an allowed property')
+            else:
+                additional_collector(instance[name], path + (name,), violations)
+
+    return predicate, collector
+
+
+def _items(schema: Dict | bool) -> Node:
+    if isinstance(schema, list):
+        raise ValueError("Unsupported JSON schema items array (tuple validation); items must be a schema")
+    item_predicate, item_collector = _compile(schema)
+
+    def predicate(instance):
+        if instance.__class__ is not list:
+            return True
+        for item in instance:
+            if not item_predicate(item):
+                return False
+        return True
+
+    def collector(instance, path, violations):
+        if instance.__class__ is not list:
+            return
+        for i, item in enumerate(instance):
+            item_collector(item, path + (i,), violations)
+
+    return predicate, collector
+
+
+def _size(keyword: str, limit: int) -> Node:
+    instance_type = {'Items': list, 'Length': str, 'Properties': dict}[keyword[3:]]
+    if keyword.startswith('min'):
+        return _check(keyword, lambda instance: not isinstance(instance, instance_type) or len(instance) >= limit,
+                      "must have a size >= {}".format(limit))
+    return _check(keyword, lambda instance: not isinstance(instance, instance_type) or len(instance) <= limit,
+                  "must have a size <= {}".format(limit))
+
+
+def _unique_items() -> Node:
+    return _check('uniqueItems',
+                  lambda instance: (not isinstance(instance, list)
+                                    or len({json.dumps(_normalised(item), sort_keys=True) for item in instance})
+                                    == len(instance)),
+                  "must have unique items")
+
+
+def _normalised(instance: Any) -> Any:
+    """
+    The instance with integral floats as ints, so that JSON equal numbers (e.g. 1 and 1.0) serialise alike.
+    """
+    if instance.__class__ is float and instance.is_integer():
+        return int(instance)
+    if instance.__class__ is list:
+        return [_normalised(item) for item in instance]
+    if instance.__class__ is dict:
+        return {name: _normalised(value) for name, value in instance.items()}
+    return instance
+
+
+def _number(keyword: str, limit: int | float) -> Node:
+    compare, message = {'minimum': (lambda instance: instance >= limit, ">= {}"),
+                        'maximum': (lambda instance: instance <= limit, "<= {}"),
+                        'exclusiveMinimum': (lambda instance: instance > limit, "> {}"),
+                        'exclusiveMaximum': (lambda instance: instance < limit, "< {}"),
+                        'multipleOf': (lambda instance: _is_multiple_of(instance, limit), "a multiple of {}")}[keyword]
+    number_types = (int, float)
+    return _check(keyword,
+                  lambda instance: (not isinstance(instance, number_types) or instance.__class__ is bool
+                                    or compare(instance)),
+                  "must be " + message.format(limit))
+
+
+def _is_multiple_of(instance: int | float, divisor: int | float) -> bool:
+    """
+    With decimal arithmetic, so that a float is a multiple of a decimal divisor (e.g. 0.3 of 0.1).  A non-finite
+    instance, or one whose quotient exceeds the decimal precision (e.g. 1e30 of 0.1), is not a multiple.
+    """
+    if instance.__class__ is int and divisor.__class__ is int:
+        return instance % divisor == 0
+    try:
+        return Decimal(str(instance)) % Decimal(str(divisor)) == 0
+    except InvalidOperation:
+        return False
+
+
+def _json_equal(instance: Any, value: Any) -> bool:
+    """
+    JSON equality; as ==, except that a boolean only equals a boolean (in Python, True == 1 and False == 0).
+    """
+    if instance.__class__ is bool or value.__class__ is bool:
+        return instance.__class__ is value.__class__ and instance == value
+    if instance.__class__ is list and value.__class__ is list:
+        return len(instance) == len(value) and all(_json_equal(item, other) for item, other in zip(instance, value))
+    if instance.__class__ is dict and value.__class__ is dict:
+        return instance.keys() == value.keys() and all(_json_equal(instance[name], value[name]) for name in instance)
+    return instance == value
+
+
+def _all_of(nodes: List[Node]) -> Node:
+    def predicate(instance):
+        return all(sub_predicate(instance) for sub_predicate, _ in nodes)
+
+    def collector(instance, path, violations):
+        for _, sub_collector in nodes:
+            sub_collector(instance, path, violations)
+
+    return predicate, collector
+
+
+def _any_or_one_of(keyword: str, predicates: List[Predicate]) -> Node:
+    if keyword == 'oneOf':
+        predicate = lambda instance: sum(1 for sub_predicate in predicates if sub_predicate(instance)) == 1
+        message = "must match exactly one of the schemas"
+    else:
+        predicate = lambda instance: any(sub_predicate(instance) for sub_predicate in predicates)
+        message = "must match at least one of the schemas"
+    return _check(keyword, predicate, message)
+
+
+def format_path(path: Path) -> str:
+    return "$" + "".join("[{}]".format(part) if isinstance(part, int) else ".{}".format(part) for part in path)
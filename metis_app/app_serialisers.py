@@ -1,4 +1,4 @@
-from typing import Optional, List, Dict, Tuple, Callable, Any, Protocol
+from typing import Optional, Callable, Any, Protocol
 import json
 
 from metis_fn import monad
@@ -35,6 +35,88 @@ class DictToJsonLDSerialiser(DictToJsonSerialiser):
     CONTENT_TYPE = "application/ld+json"
 
 
+class NoContentSerialiser(SerialiserProtocol):
+    """
+    The serialiser for a response without a body; e.g. a 304 Not Modified.
+    """
+
+    def __init__(self, serialisable=None, serialisaton=None):
+        self.serialisable = serialisable
+        self.serialisation = serialisaton
+
+    def serialise(self):
+        return ''
+
+    @property
+    def content_type(self):
+        return None
+
+
+class BinarySerialiser(SerialiserProtocol):
+    """
+    The serialiser for a binary body (bytes or a memoryview); the responder base64 encodes the body, once, and sets
+    isBase64Encoded.
+    """
+
+    def __init__(self, serialisable: bytes | memoryview, serialisaton=None, content_type="application/octet-stream"):
+        self.serialisable = serialisable
+        self.serialisation = serialisaton
+        self._content_type = content_type
+
+    def serialise(self):
+        return self.serialisable
+
+    @property
+    def content_type(self):
+        return self._content_type
+
+
+class PreSerialisedSerialiser(SerialiserProtocol):
+    """
+    The serialiser for a body which has already been serialised (e.g. a stored or cached response); serialise returns
+    it as is.
+    """
+
+    def __init__(self, serialisable: str | bytes, serialisaton=None, content_type: Optional[str] = None):
+        self.serialisable = serialisable
+        self.serialisation = serialisaton
+        self._content_type = content_type
+
+    def serialise(self):
+        return self.serialisable
+
+    @property
+    def content_type(self):
+        return self._content_type
+
+
+TEXT_CONTENT_TYPES = ('application/json',
+                      'application/xml',
+                      'application/x-www-form-urlencoded',
+                      'application/javascript',
+                      'application/graphql')
+DEFAULT_CHARSET = 'utf-8'
+
+
+def is_text_content_type(content_type: str) -> bool:
+    """
+    Whether a request body of the content type is text (and so is decoded from a base64 body to a str).
+    """
+    media_type = content_type.split(";")[0].strip().lower()
+    return (media_type.startswith('text/')
+            or media_type in TEXT_CONTENT_TYPES
+            or media_type.endswith('+json')
+            or media_type.endswith('+xml'))
+
+
+def content_type_charset(content_type: Optional[str]) -> str:
+    for param in (content_type or "").split(";")[1:]:
+        name, _, value = param.strip().partition("=")
+        if name.strip().lower() == 'charset' and value:
+            return value.strip().strip('"')
+    return DEFAULT_CHARSET
+
+
 def json_parser(body: str) -> str:
     """
     Attempts to parse the body as JSON.  If it fails it just returns the body
@@ -1,22 +1,36 @@
-from typing import Optional, Dict, Any, List, Callable
+import base64
+import json
+from collections.abc import Mapping
+from typing import Optional, Dict, Any, List, Callable, Iterator
+from urllib.parse import unquote_plus
 from datetime import datetime
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
+from http import HTTPStatus
 from aws_lambda_powertools.utilities.data_classes import (
     S3Event,
     APIGatewayProxyEvent,
+    APIGatewayProxyEventV2,
+    ALBEvent,
     KafkaEvent,
-    EventBridgeEvent)
+    EventBridgeEvent,
+    SQSEvent,
+    DynamoDBStreamEvent)
+from metis_fn import monad
 
-from . import tracer, error, app_serialisers, observable
+from . import tracer, error, app_serialisers, observable, app_codecs, app_web_session, app_s3_reader
 
 
 class HttpStatusCode(Enum):
     OK = 200
     CREATED = 201
+    NotModified = 304
     BadRequest = 400
     Unauthorized = 401
+    Conflict = 409
+    PayloadTooLarge = 413
     InternalServerError = 500
+    GatewayTimeout = 504
 
 
 @dataclass
@@ -28,9 +42,10 @@ class DataClassAbstract:
 
 @dataclass
 class RequestEvent(DataClassAbstract):
-    event: S3Event | APIGatewayProxyEvent | KafkaEvent | EventBridgeEvent
+    event: S3Event | APIGatewayProxyEvent | APIGatewayProxyEventV2 | ALBEvent | KafkaEvent | EventBridgeEvent | SQSEvent | DynamoDBStreamEvent
     kind: str
     request_function: Callable
+    route_opts: Optional[Dict] = field(default=None, kw_only=True)
 
     def returnable_session_state(self):
         return False
@@ -43,16 +58,167 @@ class S3Object(DataClassAbstract):
     event_time: Optional[datetime] = None
     object: Optional[list] = None
     meta: Optional[Dict] = None
+    sequencer: Optional[str] = None
 
     def s3_event_path(self):
         return "{bucket}/{key}".format(bucket=self.bucket, key=self.key)
 
+    @property
+    def object_key(self) -> str:
+        """
+        The key of the object in S3.  The key from an S3 event notification is URL encoded (e.g. a space as '+').
+        """
+        return unquote_plus(self.key)
+
+    def open(self, mode: str = 'rb', **open_args):
+        """
+        Streams the object through ranged GETs (see app_s3_reader.open_object), rather than reading it into memory.
+        """
+        return app_s3_reader.open_object(self.bucket, self.object_key, mode=mode, **open_args)
+
+    def iter_lines(self, **open_args) -> Iterator[str]:
+        return app_s3_reader.iter_lines(self.bucket, self.object_key, **open_args)
+
+    def iter_records(self, format: str = 'jsonl', **open_args) -> Iterator[Any]:
+        return app_s3_reader.iter_records(self.bucket, self.object_key, format=format, **open_args)
+
+
+class Undecoded:
+    def __repr__(self):
+        return "<undecoded>"
+
+
+UNDECODED = Undecoded()
+
+
+class LazyDecodedValue:
+    """
+    A data descriptor for a value decoded, on first access, from the instance's raw source attribute with the
+    instance's decoder method.  Setting the value (e.g. in the constructor) stores it as already decoded.
+    """
+
+    def __init__(self, source: str, decoder: str):
+        self.source = source
+        self.decoder = decoder
+
+    def __set_name__(self, owner, name):
+        self.attr = "_{}".format(name)
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return UNDECODED
+        value = obj.__dict__.get(self.attr, UNDECODED)
+        if value is UNDECODED and (raw := getattr(obj, self.source)) is not None:
+            value = getattr(obj, self.decoder)(raw)
+            obj.__dict__[self.attr] = value
+        return None if value is UNDECODED else value
+
+    def __set__(self, obj, value):
+        # As a dataclass field(default=descriptor), the default passed to __init__ is the descriptor itself.
+        obj.__dict__[self.attr] = UNDECODED if value is self else value
+
+    def is_decoded(self, obj) -> bool:
+        return obj.__dict__.get(self.attr, UNDECODED) is not UNDECODED
+
 
 @dataclass
 class KafkaTopicEvent(DataClassAbstract):
+    """
+    The value is decoded lazily, from raw_value (the base64 str from the Lambda event), using the codec for the topic
+    (see app_codecs).  Records which are never read are never decoded.
+    """
     topic: str
     key: str | bytes
-    value: str
+    value: Any = LazyDecodedValue(source='raw_value', decoder='decode_value')
+    partition: Optional[int] = None
+    offset: Optional[int] = None
+    raw_value: Optional[str] = field(default=None, repr=False)
+    codec: Callable[[memoryview], Any] = field(default=app_codecs.json_codec, repr=False, compare=False)
+
+    @property
+    def raw_bytes(self) -> Optional[memoryview]:
+        """
+        The base64 decoded value as a memoryview; decoded once.
+        """
+        if self.raw_value is None:
+            return None
+        if (view := self.__dict__.get('_raw_bytes', None)) is None:
+            view = memoryview(base64.b64decode(self.raw_value))
+            self.__dict__['_raw_bytes'] = view
+        return view
+
+    def decode_value(self, _raw_value: str) -> Any:
+        return self.codec(self.raw_bytes)
+
+    def is_decoded(self) -> bool:
+        return KafkaTopicEvent.__dict__['value'].is_decoded(self)
+
+
+@dataclass
+class SqsMessage(DataClassAbstract):
+    """
+    The body is parsed as JSON, from raw_body, on first access.  Messages which are not JSON are read from raw_body.
+    """
+    message_id: str
+    queue_arn: str
+    body: Any = LazyDecodedValue(source='raw_body', decoder='parse_body')
+    receipt_handle: Optional[str] = None
+    message_group_id: Optional[str] = None
+    attributes: Optional[Dict] = field(default=None, repr=False)
+    message_attributes: Optional[Dict] = field(default=None, repr=False)
+    raw_body: Optional[str] = field(default=None, repr=False)
+
+    @property
+    def queue_name(self) -> str:
+        return queue_name_from_arn(self.queue_arn)
+
+    def parse_body(self, raw_body: str) -> Any:
+        return json.loads(raw_body)
+
+    def is_parsed(self) -> bool:
+        return SqsMessage.__dict__['body'].is_decoded(self)
+
+
+@dataclass
+class DynamoStreamRecord(DataClassAbstract):
+    """
+    The keys and images are decoded into plain python values, from the raw attribute value maps, on first access (see
+    app_codecs.dynamodb_image).
+    """
+    event_id: str
+    event_name: str
+    table_arn: str
+    sequence_number: str
+    keys: Dict = LazyDecodedValue(source='raw_keys', decoder='decode_image')
+    new_image: Optional[Dict] = LazyDecodedValue(source='raw_new_image', decoder='decode_image')
+    old_image: Optional[Dict] = LazyDecodedValue(source='raw_old_image', decoder='decode_image')
+    raw_keys: Optional[Dict] = field(default=None, repr=False)
+    raw_new_image: Optional[Dict] = field(default=None, repr=False)
+    raw_old_image: Optional[Dict] = field(default=None, repr=False)
+
+    @property
+    def table_name(self) -> Optional[str]:
+        return table_name_from_arn(self.table_arn)
+
+    def decode_image(self, image: Dict) -> Dict:
+        return app_codecs.dynamodb_image(image)
+
+
+def table_name_from_arn(arn: Optional[str]) -> Optional[str]:
+    """
+    arn:aws:dynamodb:region:account:table/table-name.  None when the arn is empty or malformed.
+    """
+    resource = (arn or "").split(":")[-1].split("/")
+    if len(resource) < 2 or not resource[1]:
+        return None
+    return resource[1]
+
+
+def queue_name_from_arn(arn: str) -> str:
+    """
+    arn:aws:sqs:region:account:queue-name
+    """
+    return arn.split(":")[-1]
 
 
 @dataclass
@@ -60,6 +226,11 @@ class NoopEvent(RequestEvent):
     pass
 
 
+@dataclass
+class WarmerEvent(RequestEvent):
+    pass
+
+
 @dataclass
 class S3StateChangeEvent(RequestEvent):
     objects: List[S3Object]
@@ -70,21 +241,143 @@ class KafkaRecordsEvent(RequestEvent):
     events: List[KafkaTopicEvent]
 
 
+@dataclass
+class SqsMessagesEvent(RequestEvent):
+    messages: List[SqsMessage]
+
+
+@dataclass
+class DynamoStreamEvent(RequestEvent):
+    records: List[DynamoStreamRecord]
+
+
 @dataclass
 class EventBridgePublishEvent(RequestEvent):
     topic: str
     body: dict
 
 
+class Headers(Mapping):
+    """
+    A case-insensitive, read-only view of an event's headers, which does not copy them.  Keys are iterated in lower
+    case.  With multi_value, the raw headers are lists of values, and the last value is used (as for an ALB).
+    """
+
+    def __init__(self, raw: Dict, extra: Optional[Dict[str, str]] = None, multi_value: bool = False):
+        self.raw = raw
+        self.extra = extra or {}
+        self.multi_value = multi_value
+        self._index = None
+
+    def __getitem__(self, name: str):
+        lower_name = name.lower()
+        if lower_name in self.extra:
+            return self.extra[lower_name]
+        if lower_name in self.raw:
+            return self._value(self.raw[lower_name])
+        return self._value(self.raw[self.index()[lower_name]])
+
+    def __iter__(self):
+        yield from self.extra
+        yield from (lower_name for lower_name in self.index() if lower_name not in self.extra)
+
+    def __len__(self):
+        return len(self.extra) + sum(1 for lower_name in self.index() if lower_name not in self.extra)
+
+    def __repr__(self):
+        return "Headers({})".format(dict(self.items()))
+
+    def index(self) -> Dict[str, str]:
+        """
+        lower case name -> raw name; built on the first lookup of a name which is not already lower case.
+        """
+        if self._index is None:
+            self._index = {name.lower(): name for name in self.raw}
+        return self._index
+
+    def _value(self, value):
+        if self.multi_value:
+            return value[-1] if value else None
+        return value
+
+
 @dataclass
 class ApiGatewayRequestEvent(RequestEvent):
+    """
+    The headers, body and web_session are computed on first access, and cached.  The body is parsed with the route's
+    body_parser (from the route opts) when provided, otherwise it is base64 decoded when encoded (see decode_body).
+    """
     method: str
-    headers: Dict
     path: str
     path_params: Dict
-    body: str
     query_params: Optional[dict] = None
-    web_session: Optional[Any] = None
+    headers: Headers | Dict = field(default=LazyDecodedValue(source='raw_headers', decoder='decode_headers'),
+                                    kw_only=True, repr=False)
+    body: Any = field(default=LazyDecodedValue(source='event', decoder='decode_body'), kw_only=True, repr=False)
+    web_session: Optional[Any] = field(default=LazyDecodedValue(source='headers', decoder='decode_session'),
+                                       kw_only=True, repr=False)
+    api_source: str = field(default='rest', kw_only=True)
+    raw_headers: Optional[Dict] = field(default=None, kw_only=True, repr=False)
+    cookies: Optional[List[str]] = field(default=None, kw_only=True, repr=False)
+    body_parser: Optional[Callable] = field(default=None, kw_only=True, repr=False, compare=False)
+
+    def decode_headers(self, raw_headers: Dict) -> Headers:
+        return Headers(raw_headers,
+                       extra={'cookie': "; ".join(self.cookies)} if self.cookies else None,
+                       multi_value=self.api_source == 'alb' and 'headers' not in self.event)
+
+    def decode_body(self, event) -> Any:
+        """
+        A base64 encoded body is decoded to bytes, and then to a str only when the content type is text.  Without a
+        content type, it is a str when it is valid utf-8, otherwise bytes.  A text body which is not valid for its
+        charset, or has an unknown charset, raises a RequestBodyError with code 400.
+        """
+        body = event.get('body', None)
+        if self.body_parser:
+            # A parser with parse_event (e.g. app_multipart.MultipartParser) is given the event, for its headers.
+            if hasattr(self.body_parser, 'parse_event'):
+                return self.body_parser.parse_event(self)
+            return self.body_parser(body)
+        if not body or not event.get('isBase64Encoded', False):
+            return body
+        content_type = self.headers.get('content-type', None)
+        if content_type and not app_serialisers.is_text_content_type(content_type):
+            return self.body_bytes
+        charset = app_serialisers.content_type_charset(content_type)
+        try:
+            return str(self.body_bytes, charset)
+        except UnicodeDecodeError:
+            if content_type:
+                raise RequestBodyError(message="request body is not valid {}".format(charset), code=400)
+            return self.body_bytes
+        except LookupError:
+            raise RequestBodyError(message="request body charset {} is not supported".format(charset), code=400)
+
+    @property
+    def body_bytes(self) -> Optional[bytes]:
+        """
+        The body as bytes; base64 decoded (once) when encoded.
+        """
+        if (payload := self.__dict__.get('_body_bytes', None)) is None:
+            body = self.event.get('body', None)
+            if body is None:
+                return None
+            if self.event.get('isBase64Encoded', False):
+                payload = base64.b64decode(body)
+            else:
+                payload = body.encode('utf-8') if isinstance(body, str) else body
+            self.__dict__['_body_bytes'] = payload
+        return payload
+
+    def decode_session(self, headers: Headers):
+        return app_web_session.WebSession().session_from_headers(headers)
+
+    @property
+    def multi_value_headers(self) -> bool:
+        """
+        Whether the source event has multi-value headers (which, for an ALB, determines the response headers shape).
+        """
+        return 'multiValueHeaders' in self.event
 
     def clear_session(self):
         self.web_session = None
@@ -109,6 +402,9 @@ class Request(DataClassAbstract):
     error: Optional[Any] = None
     response: Optional[dict] = None
     response_headers: Optional[dict] = None
+    batch_item_failures: Optional[list] = None
+    idempotency: Optional[Any] = None
+    response_cache: Optional[Any] = None
 
 
 class AppError(error.BaseError):
@@ -124,3 +420,37 @@ class AppError(error.BaseError):
 
     def serialise(self):
         return self.error().serialise()
+
+
+class RequestBodyError(AppError):
+    """
+    Raised when the request body, which is decoded when first read, is malformed (e.g. not valid for its charset).  The
+    pipeline responds with the error's status code.
+    """
+    pass
+
+
+def http_status_code(code: int) -> HttpStatusCode | HTTPStatus:
+    """
+    The HttpStatusCode for an error code, or otherwise the standard HTTPStatus.  A code which is not an HTTP status is
+    a 400.
+    """
+    for status_codes in (HttpStatusCode, HTTPStatus):
+        try:
+            return status_codes(code)
+        except ValueError:
+            pass
+    return HttpStatusCode.BadRequest
+
+
+def failed_request(request: Request, result: monad.MEither) -> monad.MEither:
+    """
+    A Left of a bare AppError (e.g. monad.Left(AppError(...)), returned by a route fn) as a Left of the request, with the
+    error and its status code.  The failure is then settled (e.g. the idempotency claim released) and responded to with
+    the API response rules (e.g. CORS), as for any failed request.
+    """
+    if not isinstance(result, monad.MEither) or result.is_right() or not isinstance(result.error(), AppError):
+        return result
+    if request.status_code is None:
+        request.status_code = http_status_code(result.error().code)
+    return monad.Left(request.replace('error', result.error()))
@@ -0,0 +1,120 @@
+import threading
+from typing import Callable, Dict, List, Optional
+
+from metis_fn import monad, singleton
+
+from . import app_value, app_serialisers, logger
+
+"""
+Short-circuits warmer (keep-alive) events, such as a scheduled EventBridge ping which keeps containers hot.
+
+Configure the warmer signature once, outside the handler:
+> app_warmer.WarmerConfig().configure(sources=['warmer'])
+> app_warmer.WarmerConfig().configure(detail_types=['keep-alive'])
+> app_warmer.WarmerConfig().configure(predicate=lambda event: event.get('warmer', False))
+
+A matching event is answered directly, with a static response, before the event is parsed or the tracer, PIP or guard
+are set up, and without the Start/End Handler logs.  Instead, the warmer invocations are counted (WarmerConfig().stats()).
+Warm-up hooks (e.g. refreshing the JWKS, or pinging connection pools) can be registered to run on each warmer event:
+> @app_warmer.warm_up_hook
+> def refresh_jwks():
+>     ...
+
+A hook which raises is logged, and does not fail the warmer event.
+"""
+
+DEFAULT_WARMER_RESPONSE = {'warmed': True}
+WARMER_KIND = 'warmer'
+
+
+class WarmerConfig(singleton.Singleton):
+    sources: Optional[List[str]] = None
+    detail_types: Optional[List[str]] = None
+    predicate: Optional[Callable[[Dict], bool]] = None
+    response: Dict = DEFAULT_WARMER_RESPONSE
+    hooks: List[Callable] = []
+    invocations: int = 0
+    lock = threading.Lock()
+
+    def configure(self,
+                  sources: List[str] = None,
+                  detail_types: List[str] = None,
+                  predicate: Callable[[Dict], bool] = None,
+                  response: Dict = None):
+        """
+        Args:
+            sources: Event sources (the EventBridge source) which are warmer events.
+            detail_types: EventBridge detail-types which are warmer events.
+            predicate: A fn which takes the raw event and returns True for a warmer event.
+            response: The static response to a warmer event.  Defaults to DEFAULT_WARMER_RESPONSE.
+        Returns:
+            self
+        """
+        self.sources = sources
+        self.detail_types = detail_types
+        self.predicate = predicate
+        self.response = response if response else DEFAULT_WARMER_RESPONSE
+        return self
+
+    def clear(self):
+        self.sources = None
+        self.detail_types = None
+        self.predicate = None
+        self.hooks = []
+        self.invocations = 0
+        return self
+
+    def add_hook(self, hook: Callable):
+        self.hooks = self.hooks + [hook]
+        return self
+
+    @property
+    def is_configured(self):
+        return bool(self.sources or self.detail_types or self.predicate)
+
+    def count(self):
+        with self.lock:
+            self.invocations += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {'invocations': self.invocations}
+
+
+def warm_up_hook(fn: Callable) -> Callable:
+    """
+    Decorator which registers a warm-up hook.
+    """
+    WarmerConfig().add_hook(fn)
+    return fn
+
+
+def is_warmer(event) -> bool:
+    config = WarmerConfig()
+    if not config.is_configured or not isinstance(event, dict):
+        return False
+    if config.sources and event.get('source', None) in config.sources:
+        return True
+    if config.detail_types and event.get('detail-type', None) in config.detail_types:
+        return True
+    return bool(config.predicate and config.predicate(event))
+
+
+def warm() -> Dict:
+    """
+    Counts the warmer invocation, runs the warm-up hooks, and returns the static response.
+    """
+    config = WarmerConfig()
+    config.count()
+    for hook in config.hooks:
+        try:
+            hook()
+        except Exception as e:
+            logger.error(msg="Warm-up Hook Failure", hook=getattr(hook, '__name__', str(hook)), error=str(e))
+    return dict(config.response)
+
+
+def warmer_route(request: app_value.Request) -> monad.EitherMonad[app_value.Request]:
+    """
+    The request function of a WarmerEvent built by the event factory.
+    """
+    return monad.Right(request.replace('response', monad.Right(app_serialisers.DictToJsonSerialiser(warm()))))
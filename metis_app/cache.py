@@ -1,4 +1,7 @@
-from typing import Protocol
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Protocol
 
 
 class KeyValueCachePersistenceProviderProtocol(Protocol):
@@ -8,3 +11,79 @@ class KeyValueCachePersistenceProviderProtocol(Protocol):
 
     def read(self, key):
         ...
+
+
+class TtlLru:
+    """
+    A bounded, thread-safe, in-memory LRU whose entries expire at an epoch time (in seconds), or never when put without
+    an expires_at.  A max_size of 0 disables the cache.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self.lock:
+            entry = self.entries.get(key, None)
+            if entry is None or (entry[1] is not None and entry[1] <= time.time()):
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, expires_at: Optional[float] = None) -> Any:
+        if self.max_size <= 0:
+            return value
+        with self.lock:
+            self.entries[key] = (value, expires_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return value
+
+    def remove_if(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """
+        Removes the entries for which predicate(key, value) is True; returns the number removed.
+        """
+        with self.lock:
+            keys = [key for key, (value, _expires_at) in self.entries.items() if predicate(key, value)]
+            for key in keys:
+                del self.entries[key]
+        return len(keys)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+        pass
+
+    def resize(self, max_size: int):
+        with self.lock:
+            self.max_size = max_size
+            while len(self.entries) > max(self.max_size, 0):
+                self.entries.popitem(last=False)
+        pass
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        pass
+
+    def hit_ratio(self) -> Optional[float]:
+        lookups = self.hits + self.misses
+        return round(self.hits / lookups, 3) if lookups else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hit_ratio(),
+                'size': len(self.entries),
+                'max_size': self.max_size}
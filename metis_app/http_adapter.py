@@ -3,7 +3,7 @@ import backoff
 from typing import Dict, Tuple, Any
 from metis_fn import monad
 
-from . import http, logger, circuit
+from . import http, logger, circuit, single_flight
 
 DEFAULT_MAX_RETRIES = 2
 
@@ -37,6 +37,7 @@ def post_invoke(endpoint: str, headers: Dict, auth: Tuple, body: Any, encoding:
     else:
         return requests.post(endpoint, auth=auth, headers={**headers, **encoding_to_content_type(encoding)}, data=body, timeout=http_timeout)
 
+@single_flight.coalesce_by_key('http_adapter.get')
 @circuit.circuit_breaker()
 @backoff.on_predicate(backoff.expo, circuit.monad_failure_predicate, max_tries=determine_retries(), jitter=None)
 def get(endpoint,
@@ -2,7 +2,7 @@ from typing import Tuple, Callable, Any, Protocol
 from simple_memory_cache import GLOBAL_CACHE
 
 from metis_fn import chronos, monad, singleton
-from . import http_adapter, crypto, random_retry_window, logger, circuit, cache
+from . import http_adapter, crypto, random_retry_window, logger, circuit, cache, single_flight
 from .tracer import Tracer
 
 expected_envs = ['client_id',
@@ -92,11 +92,16 @@ def token(tracer: Tracer = None):
         logger.info(msg='Self Token Cache Miss',
                     ctx={'expired': result.value.expired(), 'in_window': in_token_retry_window(result.value)},
                     tracer=tracer_from_ctx())
-        invalidate_cache()
-        return get()
+        # Concurrent requests which find the token expired share 1 refresh.
+        return single_flight.group(__name__).do('refresh', refresh)
     return result
 
 
+def refresh():
+    invalidate_cache()
+    return get()
+
+
 def get():
     result = cacheable_token()
     if result.is_right():
@@ -106,7 +111,7 @@ def get():
 
 
 def cacheable_token():
-    return token_cache.get()
+    return single_flight.cached(token_cache, __name__)
 
 
 def invalidate_cache():
@@ -0,0 +1,266 @@
+import asyncio
+import functools
+import inspect
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from aws_lambda_powertools.metrics import MetricUnit
+from metis_fn import monad, singleton
+from simple_memory_cache import NoStoredValue
+
+from . import app_async, app_value, observable
+
+"""
+Single-flight request coalescing.  When the pipeline runs concurrently (threads, e.g. a local server or per_record batch
+replays, or coroutines on the async pipeline), concurrent calls with the same key share 1 in-flight computation; the
+first caller (the leader) computes the result, and the callers which arrive while it is in flight (the waiters) get the
+same result (the same monad.MEither, or the same exception raised).  The key is dropped when the computation completes,
+so a later call computes again; single-flight coalesces, it does not cache.
+
+> result = single_flight.group('orders').do(order_id, get_order, order_id, timeout=2.0)
+> result = await single_flight.group('orders').do_async(order_id, get_order_async, order_id)
+
+A waiter with a timeout (in seconds) which expires gets a monad.Left(SingleFlightTimeout) (code 504); the leader is not
+cancelled.  Each coalesced call is counted (group(name).stats(), SingleFlightGroups().stats()), and, when the
+observable.Observer is configured, added to the SingleFlightCoalesced metric.
+
+Routes are coalesced with the route decorator; the waiters' requests are given the leader's response:
+> @app.route(('API', 'GET', '/reference/{kind}'))
+> @single_flight.route(key_fn=lambda request: request.event.path, timeout=5.0)
+> def get_reference(request):
+>     ...
+
+http_adapter.get takes a coalesce_key, and the self_token and subject_token (JWKS) refreshes are coalesced.
+"""
+
+METRIC_NAME = 'SingleFlightCoalesced'
+
+
+class SingleFlightTimeout(app_value.AppError):
+    pass
+
+
+@dataclass
+class Call:
+    done: threading.Event = field(default_factory=threading.Event)
+    result: Any = None
+    exception: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    A group of in-flight calls, keyed by the caller's key.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls: Dict[Hashable, Call] = {}
+        self.futures: Dict[Hashable, asyncio.Future] = {}
+        self.lock = threading.Lock()
+        self.calls_made = 0
+        self.coalesced = 0
+        self.timeouts = 0
+
+    def do(self, key: Hashable, f: Callable, *args, timeout: Optional[float] = None, **kwargs) -> monad.MEither:
+        with self.lock:
+            self.calls_made += 1
+            call = self.calls.get(key, None)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = Call()
+            else:
+                self.coalesced += 1
+        if leader:
+            return self._lead(key, call, f, *args, **kwargs)
+        _coalesced_metric()
+        if not call.done.wait(timeout):
+            return self._timeout(key, timeout)
+        if call.exception:
+            raise call.exception
+        return call.result
+
+    async def do_async(self,
+                       key: Hashable,
+                       f: Callable,
+                       *args,
+                       timeout: Optional[float] = None,
+                       **kwargs) -> monad.MEither:
+        """
+        As do, where f may be a coroutine fn.  The calls must be made on the same event loop (app_async.EventLoop).
+        """
+        with self.lock:
+            self.calls_made += 1
+            future = self.futures.get(key, None)
+            leader = future is None
+            if leader:
+                future = self.futures[key] = asyncio.get_running_loop().create_future()
+            else:
+                self.coalesced += 1
+        if leader:
+            return await self._lead_async(key, future, f, *args, **kwargs)
+        _coalesced_metric()
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            return self._timeout(key, timeout)
+
+    def stats(self) -> Dict[str, int]:
+        return {'calls': self.calls_made,
+                'coalesced': self.coalesced,
+                'timeouts': self.timeouts,
+                'in_flight': len(self.calls) + len(self.futures)}
+
+    def clear(self):
+        with self.lock:
+            self.calls_made = 0
+            self.coalesced = 0
+            self.timeouts = 0
+        return self
+
+    def _lead(self, key: Hashable, call: Call, f: Callable, *args, **kwargs) -> monad.MEither:
+        try:
+            call.result = f(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.exception = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+    async def _lead_async(self, key: Hashable, future: asyncio.Future, f: Callable, *args, **kwargs) -> monad.MEither:
+        try:
+            result = await app_async.resolve(f(*args, **kwargs))
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            # Retrieved here, so an exception without waiters is not reported as never retrieved.
+            future.exception()
+            raise
+        finally:
+            with self.lock:
+                del self.futures[key]
+
+    def _timeout(self, key: Hashable, timeout: Optional[float]) -> monad.MEither:
+        with self.lock:
+            self.timeouts += 1
+        return monad.Left(SingleFlightTimeout(message="Timed out waiting for an in-flight call",
+                                              name=self.name,
+                                              code=504,
+                                              ctx={'key': str(key), 'timeout': timeout}))
+
+
+class SingleFlightGroups(singleton.Singleton):
+    groups: Dict[str, SingleFlight] = {}
+    lock = threading.Lock()
+
+    def group(self, name: str) -> SingleFlight:
+        if (flight := self.groups.get(name, None)) is None:
+            with self.lock:
+                flight = self.groups.setdefault(name, SingleFlight(name))
+        return flight
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {name: flight.stats() for name, flight in self.groups.items()}
+
+    def clear(self):
+        for flight in self.groups.values():
+            flight.clear()
+        return self
+
+
+def group(name: str) -> SingleFlight:
+    return SingleFlightGroups().group(name)
+
+
+def route(key_fn: Callable[[app_value.Request], Hashable],
+          timeout: Optional[float] = None,
+          group_name: Optional[str] = None) -> Callable:
+    """
+    Coalesces concurrent invocations of a route fn (sync or coroutine) with the same key_fn(request).  The waiters'
+    requests are returned with the leader's response, status code, response headers and error.  Requests for which the
+    key_fn returns None are not coalesced.
+    """
+
+    def inner(route_fn):
+        flight_name = group_name if group_name else "route:{}".format(route_fn.__qualname__)
+
+        if inspect.iscoroutinefunction(route_fn):
+            @functools.wraps(route_fn)
+            async def coalesced_async(request):
+                if (key := key_fn(request)) is None:
+                    return await route_fn(request=request)
+                return share_response(request,
+                                      await group(flight_name).do_async(key, route_fn, request=request,
+                                                                        timeout=timeout))
+
+            return coalesced_async
+
+        @functools.wraps(route_fn)
+        def coalesced(request):
+            if (key := key_fn(request)) is None:
+                return route_fn(request=request)
+            return share_response(request, group(flight_name).do(key, route_fn, request=request, timeout=timeout))
+
+        return coalesced
+
+    return inner
+
+
+def share_response(request: app_value.Request, result: monad.MEither) -> monad.MEither:
+    """
+    Gives the waiter's request the outcome of the leader's request.
+    """
+    leader = result.lift()
+    if leader is request:
+        return result
+    if not isinstance(leader, app_value.Request):
+        if isinstance(leader, SingleFlightTimeout):
+            request.status_code = app_value.HttpStatusCode.GatewayTimeout
+        return monad.Left(request.replace('error', leader)) if result.is_left() else result
+    shared = (request.replace('response', leader.response)
+              .replace('status_code', leader.status_code)
+              .replace('response_headers', leader.response_headers)
+              .replace('error', leader.error))
+    return monad.Right(shared) if result.is_right() else monad.Left(shared)
+
+
+def coalesce_by_key(group_name: str) -> Callable:
+    """
+    A decorator which coalesces calls to the fn made with a coalesce_key kwarg (and an optional coalesce_timeout).
+    Calls without a coalesce_key are not coalesced.
+    """
+
+    def inner(f):
+        @functools.wraps(f)
+        def coalesced(*args, coalesce_key: Optional[Hashable] = None, coalesce_timeout: Optional[float] = None,
+                      **kwargs):
+            if coalesce_key is None:
+                return f(*args, **kwargs)
+            return group(group_name).do(coalesce_key, f, *args, timeout=coalesce_timeout, **kwargs)
+
+        return coalesced
+
+    return inner
+
+
+def cached(cached_var: Any, group_name: str) -> Any:
+    """
+    Gets the value of a simple_memory_cache cached var.  When it is not stored (the first access, or after an
+    invalidate), concurrent calls share 1 fetch.
+    """
+    try:
+        cached_var.get_stored_value()
+    except NoStoredValue:
+        return group(group_name).do(cached_var.name, cached_var.get)
+    return cached_var.get()
+
+
+def _coalesced_metric():
+    observer = observable.Observer()
+    if observer.is_configured:
+        observer.metrics.add_metric(name=METRIC_NAME, unit=MetricUnit.Count, value=1)
+    pass
@@ -5,7 +5,7 @@ from simple_memory_cache import GLOBAL_CACHE
 import re
 
 from metis_fn import monad, singleton, chronos
-from . import http_adapter, http, circuit, error, crypto, cache
+from . import http_adapter, http, circuit, error, crypto, cache, single_flight
 
 jwks_cache = GLOBAL_CACHE.MemoryCachedVar('jwks_cache')
 
@@ -54,7 +54,8 @@ def claims_to_assert():
 
 
 def cacheable_jwks():
-    return jwks_cache.get()
+    # Concurrent requests which find the JWKS not cached share 1 fetch.
+    return single_flight.cached(jwks_cache, __name__)
 
 
 @jwks_cache.on_first_access
@@ -8,3 +8,4 @@ from .ssm_helpers import *
 from .aws_mock import *
 from . import dynamo_circuit_repo as repo
 
+from .pipeline_helpers import *
@@ -13,6 +13,12 @@ def s3_event_hello():
     }
 
 
+def s3_event_with_objects(bucket_keys: list[tuple[str, str]]):
+    return {
+        'Records': [{'s3': {'bucket': {'name': bucket}, 'object': {'key': key}}} for bucket, key in bucket_keys]
+    }
+
+
 def api_event_get_with_path(path):
     return {
         "body": "eyJ0ZXN0IjoiYm9keSJ9",
@@ -235,6 +241,49 @@ def api_gateway_event_with_base64_encoded_body():
     }
 
 
+def http_api_event(method, path, headers=None, cookies=None, query_params=None, body=None):
+    """
+    An API Gateway HTTP API (payload v2) event
+    """
+    return {"version": "2.0",
+            "routeKey": "$default",
+            "rawPath": path,
+            "rawQueryString": "",
+            **({"cookies": cookies} if cookies else {}),
+            "headers": headers if headers else {"accept": "application/json"},
+            **({"queryStringParameters": query_params} if query_params else {}),
+            "requestContext": {"accountId": "123456789012",
+                               "apiId": "api-id",
+                               "domainName": "id.execute-api.ap-southeast-2.amazonaws.com",
+                               "http": {"method": method,
+                                        "path": path,
+                                        "protocol": "HTTP/1.1",
+                                        "sourceIp": "127.0.0.1",
+                                        "userAgent": "agent"},
+                               "requestId": "id",
+                               "routeKey": "$default",
+                               "stage": "$default",
+                               "timeEpoch": 1583348638390},
+            **({"body": body} if body else {}),
+            "isBase64Encoded": False}
+
+
+def alb_event(method, path, headers=None, query_params=None, multi_value=False, body=""):
+    """
+    An ALB target event; with multiValueHeaders when the target group has multi-value headers enabled.
+    """
+    hdrs = headers if headers else {"accept": "application/json"}
+    return {"requestContext": {"elb": {"targetGroupArn": "arn:aws:elasticloadbalancing:ap-southeast-2:123456789012:targetgroup/lambda/1"}},
+            "httpMethod": method,
+            "path": path,
+            **({"multiValueHeaders": {name: [value] for name, value in hdrs.items()},
+                "multiValueQueryStringParameters": {name: [value] for name, value in (query_params or {}).items()}}
+               if multi_value else
+               {"headers": hdrs, "queryStringParameters": query_params or {}}),
+            "body": body,
+            "isBase64Encoded": False}
+
+
 @pytest.fixture
 def event_bridge_event():
     event = {"hello": "from-event-bridge"}
@@ -262,6 +311,92 @@ def kafka_event_without_key():
     return _kafka_event(no_key=True)
 
 
+def kafka_event_with_topics(topics: list[str]):
+    value = base64.b64encode(json.dumps({"event": "someevent"}).encode('utf-8')).decode('utf-8')
+    return {
+        "eventSource": "aws:kafka",
+        "records": {
+            "{}-0".format(topic): [{"topic": topic,
+                                    "partition": 0,
+                                    "offset": 15,
+                                    "timestamp": 1545084650987,
+                                    "timestampType": "CREATE_TIME",
+                                    "value": value,
+                                    "headers": []}]
+            for topic in topics
+        }
+    }
+
+
+def kafka_event_with_records(records: list[tuple[str, int, int, dict]]):
+    """
+    records: (topic, partition, offset, value)
+    """
+    partitions = {}
+    for topic, partition, offset, value in records:
+        partitions.setdefault("{}-{}".format(topic, partition), []).append(
+            {"topic": topic,
+             "partition": partition,
+             "offset": offset,
+             "timestamp": 1545084650987,
+             "timestampType": "CREATE_TIME",
+             "value": base64.b64encode(json.dumps(value).encode('utf-8')).decode('utf-8'),
+             "headers": []})
+    return {"eventSource": "aws:kafka", "records": partitions}
+
+
+def kafka_event_with_raw_values(records: list[tuple[str, bytes]]):
+    """
+    records: (topic, raw value bytes)
+    """
+    return {"eventSource": "aws:kafka",
+            "records": {"{}-0".format(topic): [{"topic": topic,
+                                                "partition": 0,
+                                                "offset": offset,
+                                                "timestamp": 1545084650987,
+                                                "timestampType": "CREATE_TIME",
+                                                "value": base64.b64encode(value).decode('utf-8'),
+                                                "headers": []}]
+                        for offset, (topic, value) in enumerate(records)}}
+
+
+def sqs_event_with_messages(messages: list[tuple[str, str, str]], group_ids: list[str] = None):
+    """
+    messages: (queue name, message id, body)
+    """
+    return {"Records": [{"messageId": message_id,
+                         "receiptHandle": "receipt-{}".format(message_id),
+                         "body": body,
+                         "attributes": {"ApproximateReceiveCount": "1",
+                                        "SentTimestamp": "1545082649183",
+                                        **({"MessageGroupId": group_ids[i]} if group_ids else {})},
+                         "messageAttributes": {},
+                         "md5OfBody": "e4e68fb7bd0e697a0ae8f1bb342846b3",
+                         "eventSource": "aws:sqs",
+                         "eventSourceARN": "arn:aws:sqs:ap-southeast-2:123456789012:{}".format(queue),
+                         "awsRegion": "ap-southeast-2"}
+                        for i, (queue, message_id, body) in enumerate(messages)]}
+
+
+def dynamo_stream_event_with_records(records: list[tuple[str, str, str, dict, dict]]):
+    """
+    records: (table name, event name, sequence number, keys, new image) with the keys and image as attribute value maps
+    """
+    return {"Records": [{"eventID": "event-{}".format(sequence_number),
+                         "eventName": event_name,
+                         "eventVersion": "1.1",
+                         "eventSource": "aws:dynamodb",
+                         "awsRegion": "ap-southeast-2",
+                         "dynamodb": {"ApproximateCreationDateTime": 1479499740,
+                                      "Keys": keys,
+                                      **({"NewImage": new_image} if new_image else {}),
+                                      "SequenceNumber": sequence_number,
+                                      "SizeBytes": 26,
+                                      "StreamViewType": "NEW_AND_OLD_IMAGES"},
+                         "eventSourceARN": "arn:aws:dynamodb:ap-southeast-2:123456789012:table/{}/stream/2026-01-01T00:00:00.000".format(table)}
+                        for table, event_name, sequence_number, keys, new_image in records]}
+
+
 def _kafka_event(no_key=False):
     key = [
         104,
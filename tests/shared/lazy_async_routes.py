@@ -0,0 +1,14 @@
+from metis_fn import monad
+
+from metis_app import app
+
+"""
+Coroutine route functions registered by reference (app.route_ref).  Kept apart from lazy_routes, whose import is
+asserted on by the route_ref tests.
+"""
+
+
+async def process_message(request):
+    if request.event.messages[0].body['id'] == 'fail':
+        return monad.Left(request.replace('error', app.AppError(message='message failure', code=500)))
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser({}))))
@@ -0,0 +1,16 @@
+from metis_fn import monad
+
+from metis_app import app
+
+"""
+Route functions registered by reference (app.route_ref).  This module must not be imported by the shared test package.
+"""
+
+
+def get_order(request):
+    return monad.Right(request.replace('response',
+                                       monad.Right(app.DictToJsonSerialiser({'order': request.event.path_params['id']}))))
+
+
+def get_invoice(request):
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser({'invoice': 'inv1'}))))
@@ -0,0 +1,43 @@
+from typing import Callable, Optional
+
+from metis_fn import monad
+
+from metis_app import app
+
+from .env_helpers import Env
+
+
+def noop_callable(value):
+    return monad.Right(value)
+
+
+def run(event: dict,
+        context=None,
+        params_parser: Callable = noop_callable,
+        pip_initiator: Callable = noop_callable,
+        handler_guard_fn: Optional[Callable] = None) -> dict:
+    """
+    Runs the event through app.pipeline, with noop params_parser, pip_initiator and guard fns unless given.
+    """
+    return app.pipeline(event=event,
+                        context=context if context else {},
+                        env=Env(),
+                        params_parser=params_parser,
+                        pip_initiator=pip_initiator,
+                        handler_guard_fn=handler_guard_fn if handler_guard_fn else noop_callable)
+
+
+def run_async(event: dict,
+              context=None,
+              params_parser: Callable = noop_callable,
+              pip_initiator: Callable = noop_callable,
+              handler_guard_fn: Optional[Callable] = None) -> dict:
+    """
+    As run, through app.pipeline_async.
+    """
+    return app.pipeline_async(event=event,
+                              context=context if context else {},
+                              env=Env(),
+                              params_parser=params_parser,
+                              pip_initiator=pip_initiator,
+                              handler_guard_fn=handler_guard_fn if handler_guard_fn else noop_callable)
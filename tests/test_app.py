@@ -1,9 +1,11 @@
+import sys
+
 import pytest
 from metis_fn import monad
 
 from .shared import *
 
-from metis_app import app, app_serialisers, app_value, pip, subject_token, pdp
+from metis_app import app, app_events, app_serialisers, app_value, pip, subject_token, pdp
 
 
 class UnAuthorised(app.AppError):
@@ -73,6 +75,89 @@ def it_returns_a_201_created(set_up_env,
     assert result['statusCode'] == 201
 
 
+def it_rejects_an_invalid_typed_path_param_before_the_pip(set_up_env,
+                                                           api_gateway_event_get):
+    api_gateway_event_get['path'] = '/resourceBase/typed/not-an-int'
+
+    result = app.pipeline(event=api_gateway_event_get,
+                          context={},
+                          env=Env(),
+                          params_parser=noop_callable,
+                          pip_initiator=pip_not_expected,
+                          handler_guard_fn=noop_callable)
+
+    assert result['statusCode'] == 400
+    assert json.loads(result['body'])['ctx'] == {'invalid_params': {'id': 'not-an-int'}}
+
+
+def it_provides_typed_path_params_to_the_handler(set_up_env,
+                                                 api_gateway_event_get):
+    api_gateway_event_get['path'] = '/resourceBase/typed/42'
+
+    result = app.pipeline(event=api_gateway_event_get,
+                          context={},
+                          env=Env(),
+                          params_parser=noop_callable,
+                          pip_initiator=noop_callable,
+                          handler_guard_fn=noop_callable)
+
+    assert result['statusCode'] == 200
+    assert json.loads(result['body']) == {'id': 42}
+
+
+def it_imports_a_referenced_route_on_first_dispatch(set_up_env,
+                                                      api_gateway_event_get):
+    app.route_ref(('API', 'GET', '/resourceBase/lazy/orders/{id}'), 'tests.shared.lazy_routes:get_order')
+    assert 'tests.shared.lazy_routes' not in sys.modules
+    api_gateway_event_get['path'] = '/resourceBase/lazy/orders/order1'
+
+    result = app.pipeline(event=api_gateway_event_get,
+                          context={},
+                          env=Env(),
+                          params_parser=noop_callable,
+                          pip_initiator=noop_callable,
+                          handler_guard_fn=noop_callable)
+
+    assert json.loads(result['body']) == {'order': 'order1'}
+    assert 'tests.shared.lazy_routes' in sys.modules
+    assert app.template_from_route_fn(sys.modules['tests.shared.lazy_routes'].get_order) == (
+        'API', 'GET', '/resourceBase/lazy/orders/{id}')
+
+
+def it_preloads_referenced_routes():
+    app.route_ref(('API', 'GET', '/resourceBase/lazy/invoices/{id}'), 'tests.shared.lazy_routes:get_invoice')
+
+    loaded = app.preload_routes()
+
+    assert sys.modules['tests.shared.lazy_routes'].get_invoice in loaded
+
+
+def it_compiles_the_pipeline_into_a_handler(set_up_env,
+                                             s3_event_hello):
+    handler = app.compile_pipeline(env=Env(),
+                                   params_parser=noop_callable,
+                                   pip_initiator=noop_callable,
+                                   handler_guard_fn=noop_callable)
+
+    result = handler(s3_event_hello, {})
+
+    assert result['statusCode'] == 200
+    assert result['body'] == '{"hello": "there"}'
+
+
+def it_builds_the_request_once_when_the_guard_fails(mocker):
+    spy = mocker.spy(app_events, 'event_factory')
+    handler = app.compile_pipeline(env=Env(),
+                                   params_parser=noop_callable,
+                                   pip_initiator=noop_callable,
+                                   handler_guard_fn=failed_env_expectations)
+
+    result = handler({}, {})
+
+    assert result['statusCode'] == 500
+    assert spy.call_count == 1
+
+
 #
 # Authorisation
 #
@@ -199,6 +284,12 @@ def get_resource(request):
     return command(request)
 
 
+@app.route(pattern=('API', 'GET', '/resourceBase/typed/{id:int}'))
+def get_typed_resource(request):
+    return monad.Right(request.replace('response',
+                                       monad.Right(app.DictToJsonSerialiser({'id': request.event.path_params['id']}))))
+
+
 @app.route(pattern=('API', 'GET', '/resourceBase/authz_resource/{id1}'))
 def get_resource_protected_by_authz(request):
     result = get_authz_resource(request)
@@ -228,6 +319,10 @@ def noop_callable(value):
     return monad.Right(value)
 
 
+def pip_not_expected(value):
+    raise AssertionError("the PIP should not be called")
+
+
 def failed_env_expectations(value):
     return monad.Left(app.AppError(message="Env expectations failure", code=500))
 
@@ -0,0 +1,86 @@
+from metis_fn import monad
+
+from .shared import *
+
+from metis_app import app, app_events, app_api_source
+
+
+def it_builds_an_api_request_event_from_an_http_api_event():
+    event = app_events.event_factory(aws_events.http_api_event('GET', '/apiSourceTest/orders/1',
+                                                               cookies=['session=s1', 'theme=dark'],
+                                                               query_params={'page': '2'}))
+
+    assert isinstance(event, app.ApiGatewayRequestEvent)
+    assert event.api_source == app_api_source.HTTP_API
+    assert event.kind == ('API', 'GET', '/apiSourceTest/orders/1')
+    assert event.path_params == {'id': 1}
+    assert event.query_params == {'page': '2'}
+    assert event.web_session.get('session').value() == 's1'
+
+
+def it_builds_an_api_request_event_from_an_alb_event():
+    event = app_events.event_factory(aws_events.alb_event('GET', '/apiSourceTest/orders/1',
+                                                          headers={'Accept': 'application/json'},
+                                                          query_params={'q': 'a%20b'}))
+
+    assert event.api_source == app_api_source.ALB
+    assert event.path_params == {'id': 1}
+    assert event.headers == {'accept': 'application/json'}
+    assert event.query_params == {'q': 'a b'}
+
+
+def it_responds_to_an_http_api_event_with_cookies(set_up_env):
+    result = run(aws_events.http_api_event('GET', '/apiSourceTest/orders/1', cookies=['session=s1']))
+
+    assert result['statusCode'] == 200
+    assert result['cookies'] == ['session=s2']
+    assert 'multiValueHeaders' not in result
+    assert json.loads(result['body']) == {'id': 1}
+
+
+def it_responds_to_an_alb_event_with_a_status_description(set_up_env):
+    result = run(aws_events.alb_event('GET', '/apiSourceTest/orders/1'))
+
+    assert result['statusCode'] == 200
+    assert result['statusDescription'] == '200 OK'
+    assert result['isBase64Encoded'] is False
+    assert result['headers'] == {'Content-Type': 'application/json', 'Set-Cookie': 'session=s2'}
+    assert 'multiValueHeaders' not in result
+
+
+def it_shapes_the_response_to_a_left_of_an_app_error_for_the_alb(set_up_env):
+    result = run(aws_events.alb_event('GET', '/apiSourceTest/failing'))
+
+    assert result['statusCode'] == 404
+    assert result['statusDescription'] == '404 Not Found'
+    assert json.loads(result['body'])['error'] == 'order not found'
+
+
+def it_responds_to_an_alb_event_with_multi_value_headers(set_up_env):
+    result = run(aws_events.alb_event('GET', '/apiSourceTest/orders/1', multi_value=True))
+
+    assert result['multiValueHeaders'] == {'Content-Type': ['application/json'], 'Set-Cookie': ['session=s2']}
+    assert 'headers' not in result
+
+
+def it_responds_to_an_api_gateway_rest_event_unchanged(set_up_env):
+    result = run(aws_events.api_event_get_with_path('/apiSourceTest/orders/1'))
+
+    assert result['multiValueHeaders'] == {'Set-Cookie': ['session=s2']}
+    assert 'statusDescription' not in result
+
+
+#
+# Helpers
+#
+
+@app.route(pattern=('API', 'GET', '/apiSourceTest/orders/{id:int}'))
+def get_order(request):
+    request.event.web_session.set('session', 's2')
+    return monad.Right(request.replace('response',
+                                       monad.Right(app.DictToJsonSerialiser({'id': request.event.path_params['id']}))))
+
+
+@app.route(pattern=('API', 'GET', '/apiSourceTest/failing'))
+def get_missing_order(request):
+    return monad.Left(app.AppError(message='order not found', code=404))
@@ -0,0 +1,95 @@
+import asyncio
+
+from metis_fn import monad
+
+from .shared import *
+
+from metis_app import app, app_async
+
+
+def it_executes_an_async_route_function(set_up_env,
+                                        api_gateway_event_get):
+    api_gateway_event_get['path'] = '/asyncTest/resource/uuid1'
+
+    result = app.pipeline_async(event=api_gateway_event_get,
+                                context={},
+                                env=Env(),
+                                params_parser=async_noop,
+                                pip_initiator=async_noop,
+                                handler_guard_fn=noop_callable)
+
+    assert result['statusCode'] == 200
+    assert json.loads(result['body']) == {'resource': 'uuid1', 'downstream': ['a', 'b']}
+
+
+def it_reuses_the_event_loop_across_invocations(set_up_env,
+                                                api_gateway_event_get):
+    handler = app.compile_pipeline_async(env=Env(),
+                                         params_parser=noop_callable,
+                                         pip_initiator=noop_callable,
+                                         handler_guard_fn=noop_callable)
+    api_gateway_event_get['path'] = '/asyncTest/loop'
+
+    first = json.loads(handler(api_gateway_event_get, {})['body'])
+    second = json.loads(handler(api_gateway_event_get, {})['body'])
+
+    assert first['loop'] == second['loop'] == id(app_async.EventLoop().get())
+
+
+def it_responds_with_the_error_when_the_async_guard_fails(set_up_env,
+                                                          api_gateway_event_get):
+    api_gateway_event_get['path'] = '/asyncTest/resource/uuid1'
+
+    result = app.pipeline_async(event=api_gateway_event_get,
+                                context={},
+                                env=Env(),
+                                params_parser=async_noop,
+                                pip_initiator=async_noop,
+                                handler_guard_fn=async_failed_guard)
+
+    assert result['statusCode'] == 401
+    assert json.loads(result['body'])['error'] == 'Unauthorised'
+
+
+def it_runs_the_coroutine_within_a_running_loop(set_up_env,
+                                                api_gateway_event_get):
+    handler = app.compile_pipeline_async(env=Env(),
+                                         params_parser=noop_callable,
+                                         pip_initiator=noop_callable,
+                                         handler_guard_fn=noop_callable)
+    api_gateway_event_get['path'] = '/asyncTest/resource/uuid1'
+
+    result = asyncio.run(handler.coroutine(api_gateway_event_get, {}))
+
+    assert result['statusCode'] == 200
+
+
+#
+# Helpers
+#
+
+@app.route(pattern=('API', 'GET', '/asyncTest/resource/{id1}'))
+async def get_resource(request):
+    downstream = await asyncio.gather(downstream_call('a'), downstream_call('b'))
+    return monad.Right(request.replace('response',
+                                       monad.Right(app.DictToJsonSerialiser({'resource': request.event.path_params['id1'],
+                                                                             'downstream': list(downstream)}))))
+
+
+@app.route(pattern=('API', 'GET', '/asyncTest/loop'))
+async def get_loop(request):
+    return monad.Right(request.replace('response',
+                                       monad.Right(app.DictToJsonSerialiser({'loop': id(asyncio.get_running_loop())}))))
+
+
+async def downstream_call(name):
+    await asyncio.sleep(0)
+    return name
+
+
+async def async_noop(value):
+    return monad.Right(value)
+
+
+async def async_failed_guard(value):
+    return monad.Left(app.AppError(message="Unauthorised", code=401))
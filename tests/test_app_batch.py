@@ -0,0 +1,161 @@
+import asyncio
+import threading
+
+from metis_fn import monad
+
+from .shared import *
+
+from metis_app import app
+
+
+def it_processes_kafka_records_per_record_in_partition_order(set_up_env):
+    processed.clear()
+    event = aws_events.kafka_event_with_records([('perRecord.orders', 0, 1, {'id': 'a1'}),
+                                                 ('perRecord.orders', 1, 1, {'id': 'b1'}),
+                                                 ('perRecord.orders', 0, 2, {'id': 'a2'}),
+                                                 ('perRecord.orders', 1, 2, {'id': 'b2'})])
+
+    result = run(event)
+
+    assert result['batchItemFailures'] == []
+    assert [ident for ident in processed if ident.startswith('a')] == ['a1', 'a2']
+    assert [ident for ident in processed if ident.startswith('b')] == ['b1', 'b2']
+
+
+def it_reports_the_failed_and_subsequent_offsets_of_a_partition(set_up_env):
+    processed.clear()
+    event = aws_events.kafka_event_with_records([('perRecord.orders', 0, 1, {'id': 'a1'}),
+                                                 ('perRecord.orders', 0, 2, {'id': 'fail'}),
+                                                 ('perRecord.orders', 0, 3, {'id': 'a3'}),
+                                                 ('perRecord.orders', 1, 1, {'id': 'b1'}),
+                                                 ('perRecord.orders', 1, 2, {'id': 'raise'})])
+
+    result = run(event)
+
+    assert result['batchItemFailures'] == [{'itemIdentifier': 'perRecord.orders-0:2'},
+                                           {'itemIdentifier': 'perRecord.orders-0:3'},
+                                           {'itemIdentifier': 'perRecord.orders-1:2'}]
+    assert 'a3' not in processed
+    assert json.loads(result['body']) == {'processed': 5, 'failed': 3}
+
+
+def it_reports_failures_from_per_record_routes_in_a_mixed_batch(set_up_env):
+    event = aws_events.kafka_event_with_records([('perRecord.orders', 0, 1, {'id': 'fail'}),
+                                                 ('hello-kafka', 0, 1, {'id': 'c1'})])
+
+    result = run(event)
+
+    assert result['batchItemFailures'] == [{'itemIdentifier': 'perRecord.orders-0:1'}]
+
+
+def it_processes_s3_objects_per_object_and_collects_the_errors(set_up_env):
+    processed.clear()
+    event = aws_events.s3_event_with_objects([('fanOut.uat.example.io', 'incoming/{}.csv'.format(i)) for i in range(8)]
+                                             + [('fanOut.uat.example.io', 'incoming/fail.csv')])
+
+    result = run(event, context=LambdaContext(remaining_ms=[60000] * 20))
+
+    assert 'batchItemFailures' not in result
+    assert json.loads(result['body']) == {'processed': 9,
+                                          'failed': 1,
+                                          'failed_items': ['fanOut.uat.example.io/incoming/fail.csv']}
+    assert len(processed) == 8
+
+
+def it_stops_starting_s3_objects_when_the_remaining_time_is_below_the_margin(set_up_env):
+    processed.clear()
+    event = aws_events.s3_event_with_objects([('fanOut', 'incoming/{}.csv'.format(i)) for i in range(4)])
+
+    result = run(event, context=LambdaContext(remaining_ms=[60000, 60000, 4000, 3000]))
+
+    assert json.loads(result['body'])['timed_out'] == 2
+    assert len(processed) == 2
+
+
+def it_processes_records_of_a_coroutine_route_per_record_on_the_event_loop(set_up_env):
+    processed.clear()
+    in_flight.clear()
+    event = aws_events.kafka_event_with_records([('asyncPerRecord.orders', 0, 1, {'id': 'a1'}),
+                                                 ('asyncPerRecord.orders', 1, 1, {'id': 'b1'}),
+                                                 ('asyncPerRecord.orders', 0, 2, {'id': 'fail'}),
+                                                 ('asyncPerRecord.orders', 0, 3, {'id': 'a3'}),
+                                                 ('asyncPerRecord.orders', 1, 2, {'id': 'b2'}),
+                                                 ('asyncPerRecord.orders', 2, 1, {'id': 'c1'})])
+
+    result = run_async(event)
+
+    assert result['batchItemFailures'] == [{'itemIdentifier': 'asyncPerRecord.orders-0:2'},
+                                           {'itemIdentifier': 'asyncPerRecord.orders-0:3'}]
+    assert [ident for ident in processed if ident.startswith('b')] == ['b1', 'b2']
+    assert 'a3' not in processed
+    assert max(in_flight) == 2
+
+
+def it_dispatches_a_referenced_coroutine_route_per_record_on_the_event_loop(set_up_env):
+    app.route_ref(('SQS', 'lazyAsyncPerRecord'), 'tests.shared.lazy_async_routes:process_message')
+    event = aws_events.sqs_event_with_messages([('lazyAsyncPerRecord', 'm1', '{"id": "a"}'),
+                                                ('lazyAsyncPerRecord', 'm2', '{"id": "fail"}')])
+
+    result = run_async(event)
+
+    assert result['batchItemFailures'] == [{'itemIdentifier': 'm2'}]
+
+
+#
+# Helpers
+#
+
+processed = []
+lock = threading.Lock()
+
+
+@app.route(pattern=('KAFKA', 'perRecord.*'), opts={'mode': 'per_record', 'max_workers': 2})
+def per_record_handler(request):
+    record = request.event.events[0]
+    if record.value['id'] == 'raise':
+        raise ValueError("record processing exception")
+    if record.value['id'] == 'fail':
+        return monad.Left(request.replace('error', app.AppError(message='record failure', code=500)))
+    with lock:
+        processed.append(record.value['id'])
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser({}))))
+
+
+@app.route(pattern=('S3', 'fanOut', 'incoming/*'), opts={'mode': 'per_record', 'max_workers': 1})
+def per_object_handler(request):
+    obj = request.event.objects[0]
+    if obj.key == 'incoming/fail.csv':
+        raise ValueError("object processing exception")
+    with lock:
+        processed.append(obj.key)
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser({}))))
+
+
+in_flight = []
+
+
+@app.route(pattern=('KAFKA', 'asyncPerRecord.*'), opts={'mode': 'per_record', 'max_workers': 2})
+async def async_per_record_handler(request):
+    record = request.event.events[0]
+    in_flight.append((in_flight[-1] if in_flight else 0) + 1)
+    await asyncio.sleep(0.001)
+    in_flight.append(in_flight[-1] - 1)
+    if record.value['id'] == 'fail':
+        return monad.Left(request.replace('error', app.AppError(message='record failure', code=500)))
+    processed.append(record.value['id'])
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser({}))))
+
+
+class LambdaContext:
+    aws_request_id = 'fan-out'
+
+    def __init__(self, remaining_ms):
+        self.remaining_ms = iter(remaining_ms)
+
+    def get_remaining_time_in_millis(self):
+        return next(self.remaining_ms)
+
+
+@app.route(pattern="hello-kafka")
+def kafka_batch_handler(request):
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser({}))))
@@ -0,0 +1,82 @@
+import base64
+
+from metis_fn import monad
+
+from .shared import *
+
+from metis_app import app, app_events
+
+PNG = b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\xff\xfe'
+
+
+def it_keeps_a_binary_request_body_as_bytes():
+    event = app_events.event_factory(binary_event(PNG, 'image/png'))
+
+    assert event.body == PNG
+    assert event.body_bytes is event.body
+
+
+def it_decodes_a_text_request_body_with_its_charset():
+    event = app_events.event_factory(binary_event('café'.encode('latin-1'), 'text/plain; charset=ISO-8859-1'))
+
+    assert event.body == 'café'
+
+
+def it_keeps_a_body_without_a_content_type_as_bytes_when_not_utf8():
+    event = app_events.event_factory(binary_event(PNG, None))
+
+    assert event.body == PNG
+
+
+def it_decodes_a_body_without_a_content_type_as_text_when_utf8():
+    event = app_events.event_factory(binary_event(b'{"a": 1}', None))
+
+    assert event.body == '{"a": 1}'
+
+
+def it_responds_with_a_400_when_a_text_body_is_not_valid_for_its_charset(set_up_env):
+    result = run(binary_event(b'{"name": "caf\xe9"}', 'application/json'))
+
+    assert result['statusCode'] == 400
+    assert json.loads(result['body'])['error'] == 'request body is not valid utf-8'
+
+
+def it_responds_with_a_400_when_the_body_charset_is_unknown(set_up_env):
+    result = run(binary_event(b'hello', 'text/plain; charset=not-a-charset'))
+
+    assert result['statusCode'] == 400
+    assert json.loads(result['body'])['error'] == 'request body charset not-a-charset is not supported'
+
+
+def it_base64_encodes_a_binary_response_body(set_up_env):
+    result = app.pipeline(event=binary_event(PNG, 'image/png'),
+                          context={},
+                          env=Env(),
+                          params_parser=noop_callable,
+                          pip_initiator=noop_callable,
+                          handler_guard_fn=noop_callable)
+
+    assert result['statusCode'] == 200
+    assert result['isBase64Encoded'] is True
+    assert result['headers'] == {'Content-Type': 'image/png'}
+    assert base64.b64decode(result['body']) == PNG
+
+
+#
+# Helpers
+#
+
+@app.route(pattern=('API', 'POST', '/binaryTest/images'))
+def post_image(request):
+    return monad.Right(request.replace('response',
+                                       monad.Right(app.BinarySerialiser(memoryview(request.event.body),
+                                                                        content_type='image/png'))))
+
+
+def binary_event(payload: bytes, content_type):
+    return {"httpMethod": "POST",
+            "path": "/binaryTest/images",
+            "headers": {"Content-Type": content_type} if content_type else {},
+            "queryStringParameters": None,
+            "isBase64Encoded": True,
+            "body": base64.b64encode(payload).decode('ascii')}
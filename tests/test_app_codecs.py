@@ -0,0 +1,88 @@
+import json
+from decimal import Decimal
+
+import pytest
+
+from .shared import aws_events
+
+from metis_app import app_events, app_codecs, app_value
+
+
+def it_does_not_decode_the_value_until_it_is_accessed(kafka_event):
+    ev = app_events.event_factory(event=kafka_event).events[0]
+
+    assert not ev.is_decoded()
+    assert ev.value == {"event": "someevent"}
+    assert ev.is_decoded()
+
+
+def it_decodes_the_value_once():
+    calls = []
+    app_codecs.KafkaCodecs().register('codecTest.counted', lambda view: calls.append(1) or bytes(view))
+
+    ev = app_events.event_factory(aws_events.kafka_event_with_raw_values([('codecTest.counted', b'abc')])).events[0]
+
+    assert ev.value == b'abc'
+    assert ev.value == b'abc'
+    assert calls == [1]
+
+
+def it_uses_the_text_codec_for_non_json_topics():
+    app_codecs.KafkaCodecs().register('codecTest.text.*', 'text')
+
+    ev = app_events.event_factory(aws_events.kafka_event_with_raw_values([('codecTest.text.logs', b'a log line')]))
+
+    assert ev.events[0].value == 'a log line'
+
+
+def it_provides_a_memoryview_with_the_bytes_codec():
+    app_codecs.KafkaCodecs().register('codecTest.bytes', 'bytes')
+
+    ev = app_events.event_factory(aws_events.kafka_event_with_raw_values([('codecTest.bytes', b'\x00\x01')])).events[0]
+
+    assert isinstance(ev.value, memoryview)
+    assert ev.value.tobytes() == b'\x00\x01'
+
+
+def it_selects_the_codec_per_topic_in_a_mixed_batch():
+    app_codecs.KafkaCodecs().register('codecTest.mixed.text', 'text')
+
+    event = app_events.event_factory(
+        aws_events.kafka_event_with_raw_values([('codecTest.mixed.text', b'text'),
+                                                ('codecTest.mixed.json', json.dumps({'a': 1}).encode('utf-8'))]))
+
+    assert [ev.value for ev in event.events] == ['text', {'a': 1}]
+
+
+def it_constructs_a_decoded_event_directly():
+    ev = app_value.KafkaTopicEvent(topic='t', key=None, value={'a': 1})
+
+    assert ev.value == {'a': 1}
+    assert ev.is_decoded()
+
+
+def it_rejects_an_unknown_codec():
+    with pytest.raises(ValueError):
+        app_codecs.KafkaCodecs().register('codecTest.unknown', 'avro')
+
+
+def it_decodes_a_dynamodb_image():
+    image = {'id': {'S': 'a'},
+             'qty': {'N': '2'},
+             'price': {'N': '10.5'},
+             'active': {'BOOL': True},
+             'deleted': {'NULL': True},
+             'blob': {'B': 'AAE='},
+             'tags': {'SS': ['x', 'y']},
+             'sizes': {'NS': ['1', '2']},
+             'lines': {'L': [{'M': {'sku': {'S': 's1'}, 'qty': {'N': '-1'}}}]}}
+
+    assert app_codecs.dynamodb_image(image) == {'id': 'a',
+                                                'qty': 2,
+                                                'price': Decimal('10.5'),
+                                                'active': True,
+                                                'deleted': None,
+                                                'blob': b'\x00\x01',
+                                                'tags': {'x', 'y'},
+                                                'sizes': {1, 2},
+                                                'lines': [{'sku': 's1', 'qty': -1}]}
@@ -0,0 +1,134 @@
+import base64
+import gzip
+import zlib
+
+import pytest
+from metis_fn import monad
+
+from .shared import *
+
+from metis_app import app, app_compression, app_cors, app_etag
+
+
+def it_gzips_a_large_body_when_accepted(compression_config, api_gateway_event_get):
+    api_gateway_event_get['path'] = '/compressionTest/large'
+
+    result = run(api_gateway_event_get)
+
+    assert result['isBase64Encoded']
+    assert result['headers']['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(base64.b64decode(result['body']))) == large_body()
+
+
+def it_does_not_compress_a_body_below_the_threshold(compression_config, api_gateway_event_get):
+    api_gateway_event_get['path'] = '/compressionTest/small'
+
+    result = run(api_gateway_event_get)
+
+    assert 'Content-Encoding' not in result['headers']
+    assert result['body'] == '{"small": true}'
+
+
+def it_does_not_compress_when_the_route_opts_out(compression_config, api_gateway_event_get):
+    api_gateway_event_get['path'] = '/compressionTest/uncompressed'
+
+    result = run(api_gateway_event_get)
+
+    assert 'Content-Encoding' not in result['headers']
+    assert json.loads(result['body']) == large_body()
+
+
+def it_negotiates_the_encoding_from_accept_encoding(compression_config, api_gateway_event_get):
+    api_gateway_event_get['path'] = '/compressionTest/large'
+    api_gateway_event_get['headers']['Accept-Encoding'] = 'gzip;q=0, deflate'
+
+    result = run(api_gateway_event_get)
+
+    assert result['headers']['Content-Encoding'] == 'deflate'
+    assert json.loads(zlib.decompress(base64.b64decode(result['body']))) == large_body()
+
+
+def it_adds_accept_encoding_to_the_cors_vary_header(compression_config, api_gateway_event_get):
+    app_cors.CorsConfig().configure(allow_origins=['https://app.example.com'])
+    api_gateway_event_get['path'] = '/compressionTest/large'
+    api_gateway_event_get['headers']['Origin'] = 'https://app.example.com'
+
+    try:
+        result = run(api_gateway_event_get)
+    finally:
+        app_cors.CorsConfig().clear()
+
+    assert result['headers']['Content-Encoding'] == 'gzip'
+    assert result['headers']['Vary'] == 'Origin, Accept-Encoding'
+
+
+def it_gives_a_compressed_response_an_etag_with_its_content_coding(compression_config, api_gateway_event_get):
+    api_gateway_event_get['path'] = '/compressionTest/tagged'
+
+    result = run(api_gateway_event_get)
+
+    identity_etag = app_etag.body_etag(json.dumps(large_body()))
+    assert result['headers']['ETag'] == app_etag.coded_etag(identity_etag, 'gzip')
+    assert result['headers']['ETag'] != identity_etag
+
+
+def it_returns_a_304_when_the_etag_of_the_compressed_response_matches(compression_config, api_gateway_event_get):
+    api_gateway_event_get['path'] = '/compressionTest/tagged'
+    etag = run(api_gateway_event_get)['headers']['ETag']
+    api_gateway_event_get['headers']['If-None-Match'] = etag
+
+    result = run(api_gateway_event_get)
+
+    assert result['statusCode'] == 304
+    assert result['body'] == ''
+
+
+def it_does_not_compress_when_not_configured(api_gateway_event_get):
+    api_gateway_event_get['path'] = '/compressionTest/large'
+
+    result = run(api_gateway_event_get)
+
+    assert 'Content-Encoding' not in result['headers']
+
+
+def it_ignores_encodings_which_are_not_accepted(compression_config):
+    assert app_compression.negotiate('identity') is None
+    assert app_compression.negotiate('*') == 'gzip'
+
+
+#
+# Local Fixtures
+#
+@pytest.fixture
+def compression_config():
+    app_compression.CompressionConfig().configure(threshold=256, encodings=['gzip', 'deflate'])
+    yield app_compression.CompressionConfig()
+    app_compression.CompressionConfig().clear()
+
+
+#
+# Helpers
+#
+
+def large_body():
+    return {'items': [{'id': i, 'name': "item-{}".format(i)} for i in range(100)]}
+
+
+@app.route(pattern=('API', 'GET', '/compressionTest/large'))
+def get_large(request):
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser(large_body()))))
+
+
+@app.route(pattern=('API', 'GET', '/compressionTest/uncompressed'), opts={'compress': False})
+def get_uncompressed(request):
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser(large_body()))))
+
+
+@app.route(pattern=('API', 'GET', '/compressionTest/small'))
+def get_small(request):
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser({'small': True}))))
+
+
+@app.route(pattern=('API', 'GET', '/compressionTest/tagged'), opts={'etag': True})
+def get_tagged(request):
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser(large_body()))))
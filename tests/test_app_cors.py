@@ -0,0 +1,129 @@
+import pytest
+from metis_fn import monad
+
+from .shared import *
+
+from metis_app import app, app_cors
+
+
+def it_answers_a_preflight_from_the_route_table(cors_config, api_gateway_event_get):
+    result = app.pipeline(event=preflight(api_gateway_event_get, '/corsTest/resource/uuid1'),
+                          context={},
+                          env=Env(),
+                          params_parser=not_expected,
+                          pip_initiator=not_expected,
+                          handler_guard_fn=not_expected)
+
+    assert result['statusCode'] == 204
+    assert result['headers']['Access-Control-Allow-Origin'] == 'https://app.example.com'
+    assert result['headers']['Access-Control-Allow-Methods'] == 'GET, DELETE, HEAD, OPTIONS'
+    assert result['body'] == ''
+
+
+def it_rejects_a_preflight_from_a_disallowed_origin(cors_config, api_gateway_event_get):
+    event = preflight(api_gateway_event_get, '/corsTest/resource/uuid1')
+    event['headers']['Origin'] = 'https://evil.example.com'
+
+    result = app.pipeline(event=event,
+                          context={},
+                          env=Env(),
+                          params_parser=not_expected,
+                          pip_initiator=not_expected,
+                          handler_guard_fn=not_expected)
+
+    assert result['statusCode'] == 403
+
+
+def it_returns_404_for_a_preflight_with_no_route(cors_config, api_gateway_event_get):
+    result = app.pipeline(event=preflight(api_gateway_event_get, '/corsTest/unknown'),
+                          context={},
+                          env=Env(),
+                          params_parser=not_expected,
+                          pip_initiator=not_expected,
+                          handler_guard_fn=not_expected)
+
+    assert result['statusCode'] == 404
+
+
+def it_adds_the_allow_origin_header_to_api_responses(cors_config, api_gateway_event_get):
+    api_gateway_event_get['path'] = '/corsTest/resource/uuid1'
+    api_gateway_event_get['headers']['Origin'] = 'https://app.example.com'
+
+    result = app.pipeline(event=api_gateway_event_get,
+                          context={},
+                          env=Env(),
+                          params_parser=noop_callable,
+                          pip_initiator=noop_callable,
+                          handler_guard_fn=noop_callable)
+
+    assert result['statusCode'] == 200
+    assert result['headers']['Access-Control-Allow-Origin'] == 'https://app.example.com'
+    assert result['headers']['Access-Control-Allow-Credentials'] == 'true'
+
+
+def it_adds_the_allow_origin_header_when_the_route_returns_a_left_of_an_app_error(cors_config,
+                                                                                  api_gateway_event_get):
+    api_gateway_event_get['path'] = '/corsTest/failing/uuid1'
+    api_gateway_event_get['headers']['Origin'] = 'https://app.example.com'
+
+    result = run(api_gateway_event_get)
+
+    assert result['statusCode'] == 500
+    assert result['headers']['Access-Control-Allow-Origin'] == 'https://app.example.com'
+    assert json.loads(result['body'])['error'] == 'resource failure'
+
+
+def it_derives_head_from_the_get_route_and_drops_the_body(api_gateway_event_get):
+    api_gateway_event_get['path'] = '/corsTest/resource/uuid1'
+    api_gateway_event_get['httpMethod'] = 'HEAD'
+
+    result = app.pipeline(event=api_gateway_event_get,
+                          context={},
+                          env=Env(),
+                          params_parser=noop_callable,
+                          pip_initiator=noop_callable,
+                          handler_guard_fn=noop_callable)
+
+    assert result['statusCode'] == 200
+    assert result['headers']['Content-Type'] == 'application/json'
+    assert result['body'] == ''
+
+
+#
+# Local Fixtures
+#
+@pytest.fixture
+def cors_config():
+    app_cors.CorsConfig().configure(allow_origins=['https://app.example.com'], allow_credentials=True)
+    yield app_cors.CorsConfig()
+    app_cors.CorsConfig().clear()
+
+
+#
+# Helpers
+#
+
+@app.route(pattern=('API', 'GET', '/corsTest/resource/{id1}'))
+def get_resource(request):
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser({'resource': 'uuid1'}))))
+
+
+@app.route(pattern=('API', 'GET', '/corsTest/failing/{id1}'))
+def get_failing_resource(request):
+    return monad.Left(app.AppError(message='resource failure', code=500))
+
+
+@app.route(pattern=('API', 'DELETE', '/corsTest/resource/{id1}'))
+def delete_resource(request):
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser({}))))
+
+
+def preflight(event, path):
+    event['httpMethod'] = 'OPTIONS'
+    event['path'] = path
+    event['headers']['Origin'] = 'https://app.example.com'
+    return event
+
+
+def not_expected(value):
+    raise AssertionError("not expected to be called on a preflight")
@@ -0,0 +1,105 @@
+import threading
+
+from metis_fn import monad
+
+from .shared import *
+
+from metis_app import app, app_events
+
+
+def it_identifies_a_dynamodb_stream_event():
+    event = app_events.event_factory(
+        aws_events.dynamo_stream_event_with_records([('dynamoTest-hello', 'INSERT', '1', key('a'), image('a', 1))]))
+
+    assert isinstance(event, app.DynamoStreamEvent)
+    assert event.kind == 'dynamoTest-hello'
+
+    record = event.records[0]
+    assert record.table_name == 'dynamoTest-hello'
+    assert record.table_arn == 'arn:aws:dynamodb:ap-southeast-2:123456789012:table/dynamoTest-hello'
+    assert record.keys == {'id': 'a'}
+    assert record.new_image == {'id': 'a', 'seq': 1}
+    assert record.old_image is None
+
+
+def it_routes_by_table_and_event_name():
+    event = app_events.event_factory(
+        aws_events.dynamo_stream_event_with_records([('dynamoTest-orders', 'REMOVE', '1', key('a'), None),
+                                                     ('dynamoTest-orders', 'INSERT', '2', key('b'), image('b', 1))]))
+
+    assert event.kind == app_events.MULTIPLE_ROUTES
+    assert [group.kind for group in event.request_function.groups] == [('DYNAMODB', 'dynamoTest-orders', 'REMOVE'),
+                                                                       ('DYNAMODB', 'dynamoTest-orders', '*')]
+
+
+def it_finds_no_route_for_a_record_without_a_stream_arn():
+    event = aws_events.dynamo_stream_event_with_records([('dynamoTest-hello', 'INSERT', '1', key('a'), image('a', 1))])
+    event['Records'][0]['eventSourceARN'] = ''
+
+    event = app_events.event_factory(event)
+
+    assert event.records[0].table_name is None
+    assert event.kind == app_events.NO_MATCHING_ROUTE
+
+
+def it_processes_records_in_order_per_key_and_reports_failed_sequence_numbers(set_up_env):
+    processed.clear()
+    event = aws_events.dynamo_stream_event_with_records([('dynamoTest-orders', 'MODIFY', '1', key('a'), image('a', 1)),
+                                                         ('dynamoTest-orders', 'MODIFY', '2', key('b'), image('b', 1)),
+                                                         ('dynamoTest-orders', 'MODIFY', '3', key('a'), image('a', -1)),
+                                                         ('dynamoTest-orders', 'MODIFY', '4', key('a'), image('a', 3)),
+                                                         ('dynamoTest-orders', 'MODIFY', '5', key('b'), image('b', 2))])
+
+    result = run(event)
+
+    assert result['batchItemFailures'] == [{'itemIdentifier': '3'}, {'itemIdentifier': '4'}]
+    assert [seq for item, seq in processed if item == 'a'] == [1]
+    assert [seq for item, seq in processed if item == 'b'] == [1, 2]
+
+
+def it_reports_every_record_when_a_batch_mode_route_fails(set_up_env):
+    result = run(aws_events.dynamo_stream_event_with_records([('dynamoTest-batch', 'INSERT', '1', key('a'), image('a', 1)),
+                                                              ('dynamoTest-batch', 'INSERT', '2', key('b'), image('b', 1))]))
+
+    assert result['batchItemFailures'] == [{'itemIdentifier': '1'}, {'itemIdentifier': '2'}]
+
+
+#
+# Helpers
+#
+
+processed = []
+lock = threading.Lock()
+
+
+def key(item_id):
+    return {'id': {'S': item_id}}
+
+
+def image(item_id, seq):
+    return {'id': {'S': item_id}, 'seq': {'N': str(seq)}}
+
+
+@app.route(pattern=('DYNAMODB', 'dynamoTest-orders', '*'), opts={'max_workers': 2})
+def dynamo_record_handler(request):
+    record = request.event.records[0]
+    if record.new_image['seq'] < 0:
+        return monad.Left(request.replace('error', app.AppError(message='record failure', code=500)))
+    with lock:
+        processed.append((record.keys['id'], record.new_image['seq']))
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser({}))))
+
+
+@app.route(pattern=('DYNAMODB', 'dynamoTest-orders', 'REMOVE'))
+def dynamo_remove_handler(request):
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser({}))))
+
+
+@app.route(pattern='dynamoTest-hello')
+def dynamo_hello_handler(request):
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser({}))))
+
+
+@app.route(pattern='dynamoTest-batch', opts={'mode': 'batch'})
+def dynamo_batch_handler(request):
+    return monad.Left(request.replace('error', app.AppError(message='batch failure', code=500)))
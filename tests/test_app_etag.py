@@ -0,0 +1,66 @@
+from metis_fn import monad
+
+from .shared import *
+
+from metis_app import app, app_etag
+
+
+def it_adds_a_strong_etag_from_the_body(api_gateway_event_get):
+    api_gateway_event_get['path'] = '/etagTest/hashed'
+
+    result = run(api_gateway_event_get)
+
+    assert result['statusCode'] == 200
+    assert result['headers']['ETag'] == app_etag.body_etag('{"reference": "data"}')
+
+
+def it_returns_a_304_when_the_body_etag_matches(api_gateway_event_get):
+    api_gateway_event_get['path'] = '/etagTest/hashed'
+    api_gateway_event_get['headers']['If-None-Match'] = app_etag.body_etag('{"reference": "data"}')
+
+    result = run(api_gateway_event_get)
+
+    assert result['statusCode'] == 304
+    assert result['body'] == ''
+
+
+def it_skips_the_route_function_when_the_version_matches(api_gateway_event_get):
+    api_gateway_event_get['path'] = '/etagTest/versioned'
+    api_gateway_event_get['headers']['If-None-Match'] = 'W/"v1", "v2"'
+
+    result = run(api_gateway_event_get)
+
+    assert result['statusCode'] == 304
+    assert result['body'] == ''
+    assert result['headers'] == {'ETag': '"v2"'}
+
+
+def it_uses_the_version_as_the_etag_of_a_full_response(api_gateway_event_get):
+    api_gateway_event_get['path'] = '/etagTest/versioned'
+    api_gateway_event_get['headers']['If-None-Match'] = '"v1"'
+
+    result = run(api_gateway_event_get)
+
+    assert result['statusCode'] == 200
+    assert result['headers']['ETag'] == '"v2"'
+    assert json.loads(result['body']) == {'versioned': 'data'}
+
+
+#
+# Helpers
+#
+
+def version(request):
+    return 'v2'
+
+
+@app.route(pattern=('API', 'GET', '/etagTest/hashed'), opts={'etag': True})
+def get_hashed(request):
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser({'reference': 'data'}))))
+
+
+@app.route(pattern=('API', 'GET', '/etagTest/versioned'), opts={'etag_version': version})
+def get_versioned(request):
+    if request.event.headers.get('if-none-match') == 'W/"v1", "v2"':
+        raise AssertionError("the route function should not be invoked when the version matches")
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser({'versioned': 'data'}))))
@@ -1,3 +1,6 @@
+import base64
+import uuid
+
 import pytest
 from aws_lambda_powertools.utilities.data_classes import S3Event
 from metis_fn import monad
@@ -5,7 +8,7 @@ from metis_fn import monad
 from .shared import aws_events
 from .shared import *
 
-from metis_app import app, app_serialisers, app_value, pip, pdp, app_events
+from metis_app import app, app_serialisers, app_value, pip, pdp, app_events, app_route
 
 
 class UnAuthorised(app.AppError):
@@ -58,6 +61,91 @@ def it_picks_the_first_route_when_conflict():
     assert app.template_from_route_fn(route_fn) == ('API', 'GET', '/eventTest/resourceBase/resource/ACollection')
 
 
+def it_prefers_the_literal_route_regardless_of_definition_order():
+    template, route_fn, opts, params = app_route.RouteMap().match_route(
+        ('API', 'GET', '/eventTest/trie/resource/ACollection'))
+
+    assert template == ('API', 'GET', '/eventTest/trie/resource/ACollection')
+    assert params == {}
+
+
+def it_backtracks_to_the_templated_route_when_the_literal_route_does_not_match():
+    template, route_fn, opts, params = app_route.RouteMap().match_route(
+        ('API', 'GET', '/eventTest/trie/resource/ACollection/items'))
+
+    assert template == ('API', 'GET', '/eventTest/trie/resource/{id1}/items')
+    assert params == {'id1': 'ACollection'}
+
+
+def it_rejects_an_ambiguous_templated_route_when_it_is_added():
+    with pytest.raises(ValueError):
+        app.route(pattern=('API', 'GET', '/eventTest/ambiguous/{id2}'))(app_route.std_noop_response)
+
+    template, route_fn, opts, params = app_route.RouteMap().match_route(('API', 'GET', '/eventTest/ambiguous/uuid1'))
+
+    assert template == ('API', 'GET', '/eventTest/ambiguous/{id1}')
+    assert params == {'id1': 'uuid1'}
+
+
+def it_serves_repeated_kinds_from_the_route_cache():
+    kind = ('API', 'GET', '/eventTest/resourceBase/resource/cached-uuid')
+    app_route.RouteMap().route_cache.reset_stats()
+
+    first = app_route.RouteMap().match_route(kind)
+    second = app_route.RouteMap().match_route(kind)
+
+    assert first == second
+    assert second[3] == {'id1': 'cached-uuid'}
+    assert app_route.RouteMap().cache_stats()['misses'] == 1
+    assert app_route.RouteMap().cache_stats()['hits'] == 1
+
+
+def it_does_not_cache_the_kinds_of_pattern_routes():
+    app_route.RouteMap().route_cache.invalidate()
+
+    app_events.event_factory(aws_events.s3_event_with_objects([('patterns', 'incoming/{}.csv'.format(i))
+                                                               for i in range(10)]))
+
+    assert app_route.RouteMap().cache_stats()['size'] == 0
+
+
+def it_invalidates_the_route_cache_when_a_route_is_added():
+    app_events.route_fn_from_kind('hello')
+    assert app_route.RouteMap().cache_stats()['size'] > 0
+
+    app.route(pattern="cache-invalidation")(app_route.std_noop_response)
+
+    assert app_route.RouteMap().cache_stats()['size'] == 0
+
+
+def it_converts_typed_path_params():
+    *_, params = app_route.RouteMap().match_route(
+        ('API', 'GET', '/eventTest/typed/7/c56a4180-65aa-42ec-a945-5fd21dec0538/a-slug'))
+
+    assert params == {'id': 7,
+                      'uuid': uuid.UUID('c56a4180-65aa-42ec-a945-5fd21dec0538'),
+                      'slug': 'a-slug'}
+
+
+def it_rejects_a_path_when_a_typed_param_is_invalid():
+    template, route_fn, opts, params = app_route.RouteMap().match_route(
+        ('API', 'GET', '/eventTest/typed/7/not-a-uuid/A_SLUG'))
+
+    assert template == ('API', 'GET', '/eventTest/typed/{id:int}/{uuid:uuid}/{slug:re:[a-z-]+}')
+    assert app_route.is_router_rejection(route_fn)
+    assert route_fn.invalid_params == {'uuid': 'not-a-uuid', 'slug': 'A_SLUG'}
+
+
+def it_tells_routes_apart_by_the_type_of_their_params():
+    int_template, *_, int_params = app_route.RouteMap().match_route(('API', 'GET', '/eventTest/t/12'))
+    slug_template, *_, slug_params = app_route.RouteMap().match_route(('API', 'GET', '/eventTest/t/abc'))
+    str_template, *_ = app_route.RouteMap().match_route(('API', 'GET', '/eventTest/t/ABC'))
+
+    assert (int_template, int_params) == (('API', 'GET', '/eventTest/t/{id:int}'), {'id': 12})
+    assert (slug_template, slug_params) == (('API', 'GET', '/eventTest/t/{slug:re:[a-z]+}'), {'slug': 'abc'})
+    assert str_template == ('API', 'GET', '/eventTest/t/{name}')
+
+
 def it_parses_the_json_body(api_gateway_event_post_with_json_body):
     event = app_events.event_factory(api_gateway_event_post_with_json_body)
 
@@ -98,6 +186,41 @@ def it_downcases_all_headers():
     assert set(event.headers.keys()) == {'content-type', 'authorization'}
 
 
+def it_looks_up_headers_case_insensitively_without_copying_them():
+    raw_event = api_gateway_event_with_base64_encoded_body()
+    event = app_events.event_factory(event=raw_event)
+
+    assert event.headers['CONTENT-TYPE'] == 'application/x-www-form-urlencoded'
+    assert event.headers.get('authorization') == 'Basic SOME-AUTH-HEADER'
+    assert event.headers.raw is raw_event['headers']
+
+
+def it_parses_the_body_and_cookies_only_when_read(api_gateway_event_get):
+    api_gateway_event_get['path'] = '/eventTest/lazyBody'
+    parsed.clear()
+
+    event = app_events.event_factory(api_gateway_event_get)
+
+    assert not app_value.ApiGatewayRequestEvent.__dict__['body'].is_decoded(event)
+    assert not app_value.ApiGatewayRequestEvent.__dict__['web_session'].is_decoded(event)
+    assert parsed == []
+
+    assert event.body == {'test': 'body'}
+    assert event.body == {'test': 'body'}
+    assert parsed == ['eyJ0ZXN0IjoiYm9keSJ9']
+    assert event.web_session.get('session').value() == 'session_uuid'
+
+
+def it_does_not_run_the_body_parser_in_the_pipeline_when_the_route_does_not_read_the_body(set_up_env,
+                                                                                          api_gateway_event_get):
+    api_gateway_event_get['path'] = '/eventTest/lazyBody'
+    parsed.clear()
+
+    run(api_gateway_event_get)
+
+    assert parsed == []
+
+
 def it_identifies_an_s3_event_using_custom_factory(s3_event_hello):
     event = app_events.event_factory(event=s3_event_hello, factory_overrides={'s3': overrided_s3_factory})
 
@@ -157,6 +280,67 @@ def it_identifies_an_eventbridge_event(event_bridge_event):
     assert event.body == {'hello': 'from-event-bridge'}
 
 
+def it_routes_s3_objects_by_key_pattern():
+    event = app_events.event_factory(aws_events.s3_event_with_objects([('patterns.uat.example.io', 'incoming/a.csv')]))
+
+    assert event.kind == ('S3', 'patterns', 'incoming/*.csv')
+    assert event.request_function(dummy_request()).value.response.value.serialisable == {'s3': 'csv'}
+
+
+def it_routes_s3_objects_by_the_full_bucket_name():
+    event = app_events.event_factory(aws_events.s3_event_with_objects([('imports.example.io', 'incoming/a.csv')]))
+
+    assert event.kind == ('S3', 'imports.example.io', 'incoming/*')
+    assert event.request_function(dummy_request()).value.response.value.serialisable == {'s3': 'imports'}
+
+
+def it_splits_a_mixed_s3_batch_per_route():
+    event = app_events.event_factory(aws_events.s3_event_with_objects([('patterns', 'incoming/a.csv'),
+                                                                       ('patterns', 'incoming/b.json'),
+                                                                       ('hello', 'hello_file.json'),
+                                                                       ('patterns', 'incoming/c.csv')]))
+
+    assert event.kind == app_events.MULTIPLE_ROUTES
+    assert len(event.objects) == 4
+
+    result = event.request_function(app.Request(event=event, context={}, tracer={}))
+
+    assert result.is_right()
+    assert [(r['kind'], r['items']) for r in result.value.response.value.serialisable['routes']] == [
+        (('S3', 'patterns', 'incoming/*.csv'), 2),
+        (('S3', 'patterns', 'incoming/*.json'), 1),
+        ('hello', 1)]
+    assert [len(r.value.event.objects) for r in result.value.results] == [2, 1, 1]
+
+
+def it_falls_back_to_the_no_matching_route_when_no_s3_object_is_routed():
+    event = app_events.event_factory(aws_events.s3_event_with_objects([('unrouted1.example', 'a.csv'),
+                                                                       ('unrouted2.example', 'b.csv')]))
+
+    assert event.kind == app_events.NO_MATCHING_ROUTE
+
+    result = event.request_function(app.Request(event=event, context={}, tracer={}))
+
+    assert result.is_left()
+    assert result.error().error.message == 'no matching route'
+
+
+def it_routes_kafka_records_by_topic_pattern_and_splits_mixed_batches():
+    event = app_events.event_factory(aws_events.kafka_event_with_topics(['orders.created', 'hello-kafka']))
+
+    assert event.kind == app_events.MULTIPLE_ROUTES
+    assert [group.kind for group in event.request_function.groups] == [('KAFKA', 'orders.*'), 'hello-kafka']
+
+
+def it_routes_eventbridge_events_by_source_and_detail_type(event_bridge_event):
+    event_bridge_event['source'] = 'orders.service'
+    event_bridge_event['detail-type'] = 'order.created'
+
+    event = app_events.event_factory(event=event_bridge_event)
+
+    assert event.kind == ('EVENTBRIDGE', 'orders.service', 'order.*')
+
+
 #
 # Local Fixtures
 #
@@ -177,6 +361,31 @@ def hello_handler(request):
     return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser({'hello': 'there'}))))
 
 
+@app.route(pattern=('S3', 'patterns', 'incoming/*.csv'))
+def s3_csv_handler(request):
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser({'s3': 'csv'}))))
+
+
+@app.route(pattern=('S3', 'patterns', 'incoming/*.json'))
+def s3_json_handler(request):
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser({'s3': 'json'}))))
+
+
+@app.route(pattern=('S3', 'imports.example.io', 'incoming/*'))
+def s3_imports_handler(request):
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser({'s3': 'imports'}))))
+
+
+@app.route(pattern=('KAFKA', 'orders.*'))
+def kafka_orders_handler(request):
+    return app_route.std_noop_response(request)
+
+
+@app.route(pattern=('EVENTBRIDGE', 'orders.service', 'order.*'))
+def event_bridge_orders_handler(request):
+    return app_route.std_noop_response(request)
+
+
 @app.route(pattern="my.domain.topic")
 def event_bridge_hello_handler(request):
     return monad.Right(request.replace('response',
@@ -223,6 +432,60 @@ def get_collection_resource(request):
     return command(request)
 
 
+parsed = []
+
+
+def lazy_body_parser(body):
+    parsed.append(body)
+    return json.loads(base64.b64decode(body))
+
+
+@app.route(pattern=('API', 'GET', '/eventTest/lazyBody'), opts={'body_parser': lazy_body_parser})
+def get_lazy_body(request):
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser({}))))
+
+
+@app.route(pattern=('API', 'GET', '/eventTest/trie/resource/{id1}'))
+def get_trie_resource(request):
+    return app_route.std_noop_response(request)
+
+
+@app.route(pattern=('API', 'GET', '/eventTest/trie/resource/ACollection'))
+def get_trie_collection(request):
+    return app_route.std_noop_response(request)
+
+
+@app.route(pattern=('API', 'GET', '/eventTest/trie/resource/{id1}/items'))
+def get_trie_resource_items(request):
+    return app_route.std_noop_response(request)
+
+
+@app.route(pattern=('API', 'GET', '/eventTest/typed/{id:int}/{uuid:uuid}/{slug:re:[a-z-]+}'))
+def get_typed_resource(request):
+    return app_route.std_noop_response(request)
+
+
+@app.route(pattern=('API', 'GET', '/eventTest/t/{name}'))
+def get_named_t(request):
+    return app_route.std_noop_response(request)
+
+
+@app.route(pattern=('API', 'GET', '/eventTest/t/{id:int}'))
+def get_int_t(request):
+    return app_route.std_noop_response(request)
+
+
+@app.route(pattern=('API', 'GET', '/eventTest/t/{slug:re:[a-z]+}'))
+def get_slug_t(request):
+    return app_route.std_noop_response(request)
+
+
+@app.route(pattern=('API', 'GET', '/eventTest/ambiguous/{id1}'))
+def get_ambiguous_resource(request):
+    return app_route.std_noop_response(request)
+
+
+
 @app.route(pattern=('API', 'GET', '/eventTest/resourceBase/resource/{id1}'))
 def get_resource(request):
     def command(request):
@@ -0,0 +1,262 @@
+import pytest
+from metis_fn import monad
+
+from .shared import *
+
+from metis_app import app, app_idempotency
+
+
+def it_replays_the_stored_response_for_a_duplicate_s3_object(idempotency_config, provider):
+    invocations.clear()
+
+    first = run(s3_event([('idempotent.uat.example.io', 'incoming/a.csv', '0A1')]))
+    duplicate = run(s3_event([('idempotent.uat.example.io', 'incoming/a.csv', '0A1')]))
+    overwritten = run(s3_event([('idempotent.uat.example.io', 'incoming/a.csv', '0A2')]))
+
+    assert invocations == ['incoming/a.csv', 'incoming/a.csv']
+    assert duplicate['body'] == first['body'] == json.dumps({'object': 'incoming/a.csv'})
+    assert duplicate['headers'] == {'Content-Type': 'application/json'}
+    assert [record['status'] for record in provider.records.values()] == ['COMPLETED', 'COMPLETED']
+    assert idempotency_config.stats()['replayed'] == 1
+
+
+def it_reads_completed_records_from_the_provider_in_a_new_container(idempotency_config, provider):
+    invocations.clear()
+    run(event_bridge_event_with_id('evt-1'))
+    idempotency_config.completed.clear()
+
+    result = run(event_bridge_event_with_id('evt-1'))
+
+    assert invocations == ['evt-1']
+    assert json.loads(result['body']) == {'id': 'evt-1'}
+    assert provider.reads == 2
+
+
+def it_answers_duplicates_in_a_warm_container_from_the_lru(idempotency_config, provider):
+    run(event_bridge_event_with_id('evt-2'))
+
+    run(event_bridge_event_with_id('evt-2'))
+
+    assert provider.reads == 1
+
+
+def it_rejects_a_duplicate_of_an_in_progress_request(idempotency_config, provider):
+    invocations.clear()
+    key = app_idempotency.idempotency_key(request_for(event_bridge_event_with_id('evt-3')), {})
+    provider.write(key, {'status': 'IN_PROGRESS', 'expires_at': time.time() + 60})
+
+    result = run(event_bridge_event_with_id('evt-3'))
+
+    assert result['statusCode'] == 409
+    assert json.loads(result['body'])['code'] == 409
+    assert invocations == []
+
+
+def it_ignores_an_expired_record(idempotency_config, provider):
+    invocations.clear()
+    key = app_idempotency.idempotency_key(request_for(event_bridge_event_with_id('evt-4')), {})
+    provider.write(key, {'status': 'IN_PROGRESS', 'expires_at': time.time() - 1})
+
+    run(event_bridge_event_with_id('evt-4'))
+
+    assert invocations == ['evt-4']
+
+
+def it_releases_the_key_when_the_route_fails(idempotency_config, provider):
+    invocations.clear()
+
+    failed = run(event_bridge_event_with_id('fail'))
+    retried = run(event_bridge_event_with_id('fail'))
+
+    assert failed['body'] == retried['body']
+    assert invocations == ['fail', 'fail']
+    assert list(provider.records.values()) == [None]
+
+
+def it_releases_the_key_when_the_route_returns_a_left_of_an_app_error(idempotency_config, provider):
+    invocations.clear()
+
+    first = run(event_bridge_event_with_id('bare-fail'))
+    redelivery = run(event_bridge_event_with_id('bare-fail'))
+
+    assert first['statusCode'] == redelivery['statusCode'] == 500
+    assert invocations == ['bare-fail', 'bare-fail']
+    assert idempotency_config.stats()['in_flight'] == 0
+    assert list(provider.records.values()) == [None]
+
+
+def it_releases_the_key_when_the_route_raises(idempotency_config, provider):
+    invocations.clear()
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            run(event_bridge_event_with_id('raise'))
+
+    assert invocations == ['raise', 'raise']
+    assert idempotency_config.stats()['in_flight'] == 0
+    assert list(provider.records.values()) == [None]
+
+
+def it_releases_the_key_when_an_async_route_raises(idempotency_config, provider):
+    invocations.clear()
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            run_async(event_bridge_event_with_id('raise', detail_type='AsyncOrder'))
+
+    assert invocations == ['raise', 'raise']
+    assert idempotency_config.stats()['in_flight'] == 0
+
+
+def it_uses_the_route_key_fn(idempotency_config, provider):
+    invocations.clear()
+
+    run(event_bridge_event_with_id('evt-5', detail={'order': 'o-1'}, detail_type='KeyedOrder'))
+    run(event_bridge_event_with_id('evt-6', detail={'order': 'o-1'}, detail_type='KeyedOrder'))
+
+    assert invocations == ['evt-5']
+
+
+def it_claims_each_kafka_record_in_per_record_mode(idempotency_config, provider):
+    invocations.clear()
+    run(aws_events.kafka_event_with_records([('idempotent.orders', 0, 1, {'id': 'a1'}),
+                                             ('idempotent.orders', 0, 2, {'id': 'fail'})]))
+
+    result = run(aws_events.kafka_event_with_records([('idempotent.orders', 0, 1, {'id': 'a1'}),
+                                                      ('idempotent.orders', 0, 2, {'id': 'fail'}),
+                                                      ('idempotent.orders', 0, 3, {'id': 'a3'})]))
+
+    assert invocations == ['a1', 'fail', 'fail']
+    assert result['batchItemFailures'] == [{'itemIdentifier': 'idempotent.orders-0:2'},
+                                           {'itemIdentifier': 'idempotent.orders-0:3'}]
+
+
+def it_claims_the_group_of_objects_of_an_idempotent_route_in_a_mixed_batch(idempotency_config, provider):
+    invocations.clear()
+    objects = [('idempotent.uat.example.io', 'incoming/b.csv', '0B1'),
+               ('idempotent.uat.example.io', 'archive/b.csv', '0B2')]
+    run(s3_event(objects))
+
+    result = run(s3_event(objects))
+
+    assert invocations == ['incoming/b.csv', 'archive/b.csv', 'archive/b.csv']
+    assert [route['status'] for route in json.loads(result['body'])['routes']] == ['ok', 'ok']
+    assert idempotency_config.stats()['replayed'] == 1
+
+
+def it_releases_the_key_of_a_record_whose_route_returns_a_left_of_an_app_error(idempotency_config, provider):
+    invocations.clear()
+    event = aws_events.kafka_event_with_records([('idempotent.orders', 1, 1, {'id': 'bare-fail'})])
+
+    run(event)
+    result = run(event)
+
+    assert invocations == ['bare-fail', 'bare-fail']
+    assert result['batchItemFailures'] == [{'itemIdentifier': 'idempotent.orders-1:1'}]
+    assert idempotency_config.stats()['in_flight'] == 0
+
+
+#
+# Helpers
+#
+
+invocations = []
+
+
+class IdempotencyPersistenceProvider:
+    def __init__(self):
+        self.records = {}
+        self.reads = 0
+
+    def write(self, key, value):
+        self.records[key] = value
+        return monad.Right(value)
+
+    def read(self, key):
+        self.reads += 1
+        self.value = self.records.get(key, None)
+        return monad.Right(self)
+
+
+@pytest.fixture
+def provider():
+    return IdempotencyPersistenceProvider()
+
+
+@pytest.fixture
+def idempotency_config(provider):
+    config = app_idempotency.IdempotencyConfig().configure(persistence_provider=provider)
+    yield config
+    config.clear()
+
+
+@app.route(pattern=('S3', 'idempotent', 'incoming/*'), opts={'idempotency': True})
+def idempotent_object_handler(request):
+    key = request.event.objects[0].key
+    invocations.append(key)
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser({'object': key}))))
+
+
+@app.route(pattern=('S3', 'idempotent', 'archive/*'))
+def archived_object_handler(request):
+    invocations.append(request.event.objects[0].key)
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser({}))))
+
+
+@app.route(pattern=('EVENTBRIDGE', 'idempotent', 'Order'), opts={'idempotency': {'ttl': 60}})
+def idempotent_event_handler(request):
+    event_id = request.event.event.get_id
+    invocations.append(event_id)
+    if event_id == 'raise':
+        raise ValueError('event failure')
+    if event_id == 'fail':
+        return monad.Left(request.replace('error', app.AppError(message='event failure', code=500)))
+    if event_id == 'bare-fail':
+        return monad.Left(app.AppError(message='event failure', code=500))
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser({'id': event_id}))))
+
+
+@app.route(pattern=('EVENTBRIDGE', 'idempotent', 'AsyncOrder'), opts={'idempotency': True})
+async def idempotent_async_event_handler(request):
+    invocations.append(request.event.event.get_id)
+    raise ValueError('event failure')
+
+
+@app.route(pattern=('EVENTBRIDGE', 'idempotent', 'KeyedOrder'),
+           opts={'idempotency': {'key_fn': lambda request: request.event.body['order']}})
+def keyed_event_handler(request):
+    invocations.append(request.event.event.get_id)
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser({}))))
+
+
+@app.route(pattern=('KAFKA', 'idempotent.*'), opts={'mode': 'per_record', 'idempotency': True})
+def idempotent_record_handler(request):
+    record = request.event.events[0]
+    invocations.append(record.value['id'])
+    if record.value['id'] == 'fail':
+        return monad.Left(request.replace('error', app.AppError(message='record failure', code=500)))
+    if record.value['id'] == 'bare-fail':
+        return monad.Left(app.AppError(message='record failure', code=500))
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser({}))))
+
+
+def s3_event(bucket_key_sequencers):
+    event = aws_events.s3_event_with_objects([(bucket, key) for bucket, key, _ in bucket_key_sequencers])
+    for record, (_, _, sequencer) in zip(event['Records'], bucket_key_sequencers):
+        record['s3']['object']['sequencer'] = sequencer
+    return event
+
+
+def event_bridge_event_with_id(event_id, detail=None, detail_type='Order'):
+    return {"id": event_id,
+            "detail-type": detail_type,
+            "source": "idempotent",
+            "account": "123456789012",
+            "time": "1970-01-01T00:00:00Z",
+            "region": "us-east-1",
+            "resources": [],
+            "detail": detail if detail else {}}
+
+
+def request_for(event):
+    return app.build_value(event=event, context={}, env=Env()).value
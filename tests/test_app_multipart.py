@@ -0,0 +1,132 @@
+import base64
+
+import pytest
+
+from metis_fn import monad
+
+from .shared import *
+
+from metis_app import app, app_events, app_multipart
+
+BOUNDARY = 'boundary123'
+
+
+def it_parses_fields_and_files():
+    form = app_events.event_factory(multipart_event([('title', None, None, b'a report'),
+                                                     ('document', 'report.pdf', 'application/pdf', b'%PDF-1.4\r\n\x00\xff')])).body
+
+    assert form.fields == {'title': 'a report'}
+    document = form.files['document']
+    assert (document.filename, document.content_type, document.size) == ('report.pdf', 'application/pdf', 12)
+    assert document.read() == b'%PDF-1.4\r\n\x00\xff'
+    assert document.headers['content-disposition'] == 'form-data; name="document"; filename="report.pdf"'
+    form.close()
+
+
+def it_spills_large_parts_to_a_temporary_file():
+    payload = b'x' * 2048
+    form = app_multipart.MultipartParser(spool_threshold=1024).parse(multipart_body([('big', 'big.bin', None, payload),
+                                                                                     ('small', 'small.bin', None, b'y')]),
+                                                                     BOUNDARY.encode())
+
+    assert form.files['big'].file._rolled
+    assert not form.files['small'].file._rolled
+    assert form.files['big'].read() == payload
+
+
+def it_rejects_a_part_over_the_size_limit():
+    with pytest.raises(app_multipart.MultipartError) as error:
+        app_multipart.MultipartParser(max_part_size=10).parse(multipart_body([('big', 'big.bin', None, b'x' * 11)]),
+                                                              BOUNDARY.encode())
+
+    assert error.value.code == 413
+
+
+def it_rejects_a_body_over_the_size_limit_before_decoding_it():
+    event = app_events.event_factory(multipart_event([('big', 'big.bin', None, b'x' * 100)]))
+    event.body_parser = app_multipart.MultipartParser(max_body_size=50)
+
+    with pytest.raises(app_multipart.MultipartError) as error:
+        event.body
+
+    assert error.value.code == 413
+    assert '_body_bytes' not in event.__dict__
+
+
+def it_rejects_a_body_which_is_not_multipart():
+    with pytest.raises(app_multipart.MultipartError) as error:
+        app_multipart.content_type_boundary('application/json')
+
+    assert error.value.code == 400
+
+
+def it_rejects_a_body_without_a_closing_boundary():
+    with pytest.raises(app_multipart.MultipartError):
+        app_multipart.MultipartParser().parse(multipart_body([('a', None, None, b'1')])[:-20], BOUNDARY.encode())
+
+
+def it_responds_with_a_413_when_the_pipeline_body_is_over_the_size_limit():
+    event = multipart_event([('big', 'big.bin', None, b'x' * 100)], path='/multipartTest/limited')
+
+    result = run(event)
+
+    assert result['statusCode'] == 413
+    assert json.loads(result['body'])['code'] == 413
+
+
+def it_responds_with_a_400_when_the_pipeline_body_is_not_multipart():
+    event = {**multipart_event([('a', None, None, b'1')]), 'headers': {'Content-Type': 'application/json'}}
+
+    result = run(event)
+
+    assert result['statusCode'] == 400
+    assert json.loads(result['body'])['code'] == 400
+
+
+def it_responds_with_a_400_when_the_part_headers_are_not_utf8():
+    body = multipart_body([('a', None, None, b'1')]).replace(b'name="a"', b'name="\xff"')
+    event = {**multipart_event([]), 'body': base64.b64encode(body).decode('ascii')}
+
+    result = run(event)
+
+    assert result['statusCode'] == 400
+    assert json.loads(result['body'])['error'] == 'multipart part headers are not valid utf-8'
+
+
+#
+# Helpers
+#
+
+@app.route(pattern=('API', 'POST', '/multipartTest/documents'),
+           opts={'body_parser': app_multipart.MultipartParser(spool_threshold=1024)})
+def post_document(request):
+    return monad.Right(request)
+
+
+@app.route(pattern=('API', 'POST', '/multipartTest/limited'),
+           opts={'body_parser': app_multipart.MultipartParser(max_body_size=50)})
+def post_limited_document(request):
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser({}))))
+
+
+def multipart_body(parts):
+    """
+    parts: (name, filename, content type, data)
+    """
+    body = b''
+    for name, filename, content_type, data in parts:
+        disposition = 'form-data; name="{}"'.format(name) + ('; filename="{}"'.format(filename) if filename else '')
+        body += '--{}\r\nContent-Disposition: {}\r\n'.format(BOUNDARY, disposition).encode()
+        if content_type:
+            body += 'Content-Type: {}\r\n'.format(content_type).encode()
+        body += b'\r\n' + data + b'\r\n'
+    return body + '--{}--\r\n'.format(BOUNDARY).encode()
+
+
+def multipart_event(parts, path="/multipartTest/documents"):
+    return {"httpMethod": "POST",
+            "path": path,
+            "headers": {"Content-Type": "multipart/form-data; boundary={}".format(BOUNDARY)},
+            "queryStringParameters": None,
+            "isBase64Encoded": True,
+            "body": base64.b64encode(multipart_body(parts)).decode('ascii')}
@@ -0,0 +1,143 @@
+import pytest
+from metis_fn import monad
+
+from .shared import *
+
+from metis_app import app, app_response_cache, logger
+
+
+def it_answers_a_repeated_get_from_the_cache(response_cache, mocker):
+    log_info = mocker.spy(logger, 'info')
+    invocations.clear()
+
+    first = run(aws_events.api_event_get_with_path('/cached/reference/1'))
+    second = run(aws_events.api_event_get_with_path('/cached/reference/1'))
+
+    assert invocations == ['1']
+    assert second['body'] == first['body'] == json.dumps({'id': '1'})
+    assert second['headers']['Content-Type'] == 'application/json'
+    assert log_info.call_args.kwargs['response_cache'] == 'hit'
+    assert log_info.call_args.kwargs['response_cache_hit_ratio'] == 0.5
+
+
+def it_varies_the_cached_response_by_path_params(response_cache):
+    invocations.clear()
+
+    run(aws_events.api_event_get_with_path('/cached/reference/1'))
+    result = run(aws_events.api_event_get_with_path('/cached/reference/2'))
+
+    assert invocations == ['1', '2']
+    assert json.loads(result['body']) == {'id': '2'}
+
+
+def it_keys_the_cached_response_by_the_concrete_path_without_a_vary(response_cache):
+    invocations.clear()
+
+    a = run(aws_events.api_event_get_with_path('/rvcache/a'))
+    b = run(aws_events.api_event_get_with_path('/rvcache/b'))
+    a_again = run(aws_events.api_event_get_with_path('/rvcache/a'))
+
+    assert invocations == ['a', 'b']
+    assert json.loads(a['body']) == json.loads(a_again['body']) == {'kind': 'a'}
+    assert json.loads(b['body']) == {'kind': 'b'}
+
+
+def it_runs_the_guard_before_a_cached_response(response_cache):
+    run(aws_events.api_event_get_with_path('/cached/reference/1'))
+
+    result = run(aws_events.api_event_get_with_path('/cached/reference/1'), handler_guard_fn=unauthorised)
+
+    assert result['statusCode'] == 401
+
+
+def it_invalidates_by_route_and_by_tag(response_cache):
+    invocations.clear()
+    run(aws_events.api_event_get_with_path('/cached/reference/1'))
+    run(aws_events.api_event_get_with_path('/cached/tagged/c1'))
+
+    assert response_cache.invalidate(route=('API', 'GET', '/cached/reference/{id}')) == 1
+    assert response_cache.invalidate(tag='customer:c1') == 1
+    run(aws_events.api_event_get_with_path('/cached/reference/1'))
+    run(aws_events.api_event_get_with_path('/cached/tagged/c1'))
+
+    assert invocations == ['1', 'c1', '1', 'c1']
+
+
+def it_does_not_cache_failures_or_requests_without_a_subject(response_cache):
+    invocations.clear()
+
+    run(aws_events.api_event_get_with_path('/cached/reference/fail'))
+    run(aws_events.api_event_get_with_path('/cached/reference/fail'))
+    run(aws_events.api_event_get_with_path('/cached/subject'))
+    run(aws_events.api_event_get_with_path('/cached/subject'))
+
+    assert invocations == ['fail', 'fail', 'subject', 'subject']
+    assert response_cache.stats()['size'] == 0
+
+
+def it_expires_cached_responses_after_the_ttl(response_cache):
+    invocations.clear()
+
+    run(aws_events.api_event_get_with_path('/cached/expiring'))
+    run(aws_events.api_event_get_with_path('/cached/expiring'))
+
+    assert invocations == ['expiring', 'expiring']
+
+
+def it_rejects_an_unsupported_vary():
+    with pytest.raises(ValueError):
+        app_response_cache.compile_policy(('API', 'GET', '/cached/bad'), {'ttl': 60, 'vary': ['cookie']})
+
+
+#
+# Helpers
+#
+
+invocations = []
+
+
+@pytest.fixture
+def response_cache():
+    cache = app_response_cache.ResponseCache().configure()
+    yield cache
+    cache.clear()
+
+
+@app.route(pattern=('API', 'GET', '/cached/reference/{id}'), opts={'cache': {'ttl': 60, 'vary': ['path_params']}})
+def get_cached_reference(request):
+    invocations.append(request.event.path_params['id'])
+    if request.event.path_params['id'] == 'fail':
+        return monad.Left(request.replace('error', app.AppError(message='reference failure', code=500)))
+    return monad.Right(request.replace('response',
+                                       monad.Right(app.DictToJsonSerialiser({'id': request.event.path_params['id']}))))
+
+
+@app.route(pattern=('API', 'GET', '/cached/tagged/{customer}'), opts={'cache': {'ttl': 60, 'vary': ['path_params']}})
+def get_tagged(request):
+    customer = request.event.path_params['customer']
+    invocations.append(customer)
+    app_response_cache.tag(request, "customer:{}".format(customer))
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser({'customer': customer}))))
+
+
+@app.route(pattern=('API', 'GET', '/cached/subject'), opts={'cache': {'ttl': 60, 'vary': ['sub']}})
+def get_subject(request):
+    invocations.append('subject')
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser({}))))
+
+
+@app.route(pattern=('API', 'GET', '/rvcache/{kind}'), opts={'cache': {'ttl': 60}})
+def get_unvaried(request):
+    kind = request.event.path_params['kind']
+    invocations.append(kind)
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser({'kind': kind}))))
+
+
+@app.route(pattern=('API', 'GET', '/cached/expiring'), opts={'cache': {'ttl': 0}})
+def get_expiring(request):
+    invocations.append('expiring')
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser({}))))
+
+
+def unauthorised(request):
+    return monad.Left(app.AppError(message='unauthorised', code=401))
@@ -0,0 +1,128 @@
+import gzip
+import io
+import threading
+
+import boto3
+import pytest
+
+from .shared import *
+
+from metis_app import app, app_events, app_s3_reader, aws_client_helpers
+
+
+def it_streams_an_object_through_bounded_ranged_gets(aws_mock):
+    client = RecordingClient(s3_client())
+    put_object('lines.txt', "".join("line {}\n".format(i) for i in range(100)))
+
+    lines = list(app.S3Object(bucket=BUCKET, key='lines.txt').iter_lines(client=client, chunk_size=64, read_ahead=2))
+
+    assert lines == ["line {}".format(i) for i in range(100)]
+    assert client.ranges[0] == 'bytes=0-63'
+    assert len(client.ranges) == len(set(client.ranges)) > 10
+    assert client.max_in_flight <= 3
+
+
+def it_reads_the_object_as_bytes(aws_mock):
+    put_object('data.bin', bytes(range(256)) * 10)
+
+    with app.S3Object(bucket=BUCKET, key='data.bin').open(client=s3_client(), chunk_size=100) as stream:
+        assert stream.read(10) == bytes(range(10))
+        assert stream.read() == (bytes(range(256)) * 10)[10:]
+
+
+def it_reads_the_object_with_the_url_decoded_key_from_the_event(aws_mock):
+    put_object('incoming/my file(1).csv', "a\nb\n")
+    event = app_events.event_factory(aws_events.s3_event_with_objects([(BUCKET, 'incoming/my+file%281%29.csv')]))
+
+    obj = event.objects[0]
+
+    assert obj.key == 'incoming/my+file%281%29.csv'
+    assert list(obj.iter_lines(client=s3_client())) == ['a', 'b']
+
+
+def it_reads_without_read_ahead(aws_mock):
+    put_object('lines.txt', "a\nb\r\nc")
+
+    assert list(app_s3_reader.iter_lines(BUCKET, 'lines.txt', client=s3_client(), chunk_size=2, read_ahead=0)) == [
+        'a', 'b', 'c']
+
+
+def it_streams_json_lines_records_from_a_gzip_object(aws_mock):
+    put_object('records.jsonl.gz',
+               gzip.compress("".join('{{"id": {}}}\n\n'.format(i) for i in range(50)).encode('utf-8')))
+
+    records = list(app.S3Object(bucket=BUCKET, key='records.jsonl.gz').iter_records(client=s3_client(), chunk_size=32))
+
+    assert records == [{'id': i} for i in range(50)]
+
+
+def it_streams_csv_records(aws_mock):
+    put_object('records.csv', 'id,name\r\n1,"first, one"\r\n2,"multi\nline"\r\n')
+
+    records = list(app.S3Object(bucket=BUCKET, key='records.csv').iter_records(format='csv',
+                                                                               client=s3_client(),
+                                                                               chunk_size=8))
+
+    assert records == [{'id': '1', 'name': 'first, one'}, {'id': '2', 'name': 'multi\nline'}]
+
+
+def it_reads_an_empty_object(aws_mock):
+    put_object('empty.jsonl', b"")
+
+    assert list(app.S3Object(bucket=BUCKET, key='empty.jsonl').iter_records(client=s3_client())) == []
+
+
+def it_rejects_an_unknown_record_format(aws_mock):
+    with pytest.raises(ValueError):
+        list(app.S3Object(bucket=BUCKET, key='records.xml').iter_records(format='xml', client=s3_client()))
+
+
+def it_uses_the_cached_aws_client(aws_mock):
+    aws_client_helpers.invalidate_cache()
+    aws_client_helpers.AwsClientConfig().configure(region_name="us-east-1", aws_client_lib=boto3, services={'s3': {}})
+    put_object('lines.txt', "a\nb\n")
+
+    try:
+        assert list(app.S3Object(bucket=BUCKET, key='lines.txt').iter_lines()) == ['a', 'b']
+    finally:
+        aws_client_helpers.invalidate_cache()
+
+
+#
+# Helpers
+#
+
+BUCKET = 'stream.uat.example.io'
+
+
+def s3_client():
+    return boto3.client('s3', region_name='us-east-1')
+
+
+def put_object(key, body):
+    client = s3_client()
+    client.create_bucket(Bucket=BUCKET)
+    client.put_object(Bucket=BUCKET, Key=key, Body=body)
+
+
+class RecordingClient:
+    def __init__(self, client):
+        self.client = client
+        self.ranges = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def head_object(self, **kwargs):
+        return self.client.head_object(**kwargs)
+
+    def get_object(self, **kwargs):
+        with self.lock:
+            self.ranges.append(kwargs['Range'])
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            return {'Body': io.BytesIO(self.client.get_object(**kwargs)['Body'].read())}
+        finally:
+            with self.lock:
+                self.in_flight -= 1
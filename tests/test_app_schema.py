@@ -0,0 +1,163 @@
+import pytest
+
+from metis_fn import monad
+
+from .shared import *
+
+from metis_app import app, app_route, app_schema
+
+ORDER_SCHEMA = {
+    'type': 'object',
+    'required': ['customer', 'lines'],
+    'additionalProperties': False,
+    'properties': {
+        'customer': {'type': 'string', 'minLength': 1},
+        'priority': {'enum': ['low', 'high']},
+        'lines': {'type': 'array',
+                  'minItems': 1,
+                  'items': {'type': 'object',
+                            'required': ['sku', 'qty'],
+                            'properties': {'sku': {'type': 'string', 'pattern': '^[A-Z]{3}-[0-9]+$'},
+                                           'qty': {'type': 'integer', 'minimum': 1}}}}}}
+
+
+def it_compiles_the_schema_when_the_route_is_added():
+    f, opts = app_route.RouteMap().routes[('API', 'POST', '/schemaTest/orders')]
+
+    assert callable(opts['validator'])
+
+
+def it_returns_no_violations_for_a_valid_instance():
+    validator = app_schema.compile_schema(ORDER_SCHEMA)
+
+    assert validator({'customer': 'c1', 'lines': [{'sku': 'ABC-1', 'qty': 1}]}) == []
+
+
+def it_returns_all_the_violations():
+    validator = app_schema.compile_schema(ORDER_SCHEMA)
+
+    violations = validator({'priority': 'urgent', 'lines': [{'sku': 'abc', 'qty': 0}, {'qty': True}], 'x': 1})
+
+    assert sorted((v['path'], v['keyword']) for v in violations) == [('$.customer', 'required'),
+                                                                      ('$.lines[0].qty', 'minimum'),
+                                                                      ('$.lines[0].sku', 'pattern'),
+                                                                      ('$.lines[1].qty', 'type'),
+                                                                      ('$.lines[1].sku', 'required'),
+                                                                      ('$.priority', 'enum'),
+                                                                      ('$.x', 'additionalProperties')]
+
+
+def it_supports_any_of_and_one_of():
+    validator = app_schema.compile_schema({'oneOf': [{'type': 'integer'}, {'type': 'number'}]})
+
+    assert validator(1.5) == []
+    assert [v['keyword'] for v in validator(1)] == ['oneOf']
+
+
+def it_rejects_an_unsupported_keyword_when_compiled():
+    with pytest.raises(ValueError):
+        app_schema.compile_schema({'$ref': '#/definitions/order'})
+
+
+def it_checks_multiple_of_with_decimal_arithmetic():
+    validator = app_schema.compile_schema({'multipleOf': 0.1})
+
+    assert validator(0.3) == []
+    assert validator(3) == []
+    assert [v['keyword'] for v in validator(0.35)] == ['multipleOf']
+
+
+def it_reports_multiple_of_for_numbers_outside_the_decimal_range():
+    validator = app_schema.compile_schema({'multipleOf': 0.1})
+
+    assert [v['keyword'] for v in validator(1e30)] == ['multipleOf']
+    assert [v['keyword'] for v in validator(float('inf'))] == ['multipleOf']
+
+
+def it_treats_json_equal_numbers_as_duplicate_items():
+    validator = app_schema.compile_schema({'uniqueItems': True})
+
+    assert [v['keyword'] for v in validator([1, 1.0])] == ['uniqueItems']
+    assert [v['keyword'] for v in validator([{'qty': 2}, {'qty': 2.0}])] == ['uniqueItems']
+    assert validator([1, True]) == []
+
+
+def it_accepts_an_integral_float_as_an_integer():
+    validator = app_schema.compile_schema({'type': 'integer'})
+
+    assert validator(1.0) == []
+    assert [v['keyword'] for v in validator(1.5)] == ['type']
+    assert [v['keyword'] for v in validator(True)] == ['type']
+
+
+def it_tells_booleans_from_numbers_in_enum_and_const():
+    enum_validator = app_schema.compile_schema({'enum': [1, [0]]})
+    const_validator = app_schema.compile_schema({'const': 0})
+
+    assert enum_validator(1) == [] and enum_validator(1.0) == [] and enum_validator([0]) == []
+    assert [v['keyword'] for v in enum_validator(True)] == ['enum']
+    assert [v['keyword'] for v in enum_validator([False])] == ['enum']
+    assert const_validator(0) == []
+    assert [v['keyword'] for v in const_validator(False)] == ['const']
+
+
+def it_rejects_array_form_items_when_compiled():
+    with pytest.raises(ValueError):
+        app_schema.compile_schema({'items': [{'type': 'string'}, {'type': 'integer'}]})
+
+
+def it_responds_with_a_400_and_the_violations_before_the_params_parser(set_up_env):
+    parsed.clear()
+
+    result = run(order_event('{"customer": "", "lines": []}'), params_parser=params_parser)
+
+    assert result['statusCode'] == 400
+    body = json.loads(result['body'])
+    assert body['error'] == 'request body failed schema validation'
+    assert [v['path'] for v in body['ctx']['violations']] == ['$.customer', '$.lines']
+    assert parsed == []
+
+
+def it_responds_with_a_400_when_the_body_is_not_json(set_up_env):
+    result = run(order_event('not json'), params_parser=params_parser)
+
+    assert result['statusCode'] == 400
+    assert json.loads(result['body'])['ctx']['violations'][0]['keyword'] == 'json'
+
+
+def it_passes_the_parsed_body_to_the_route(set_up_env):
+    parsed.clear()
+
+    result = run(order_event('{"customer": "c1", "lines": [{"sku": "ABC-1", "qty": 2}]}'),
+                 params_parser=params_parser)
+
+    assert result['statusCode'] == 200
+    assert json.loads(result['body']) == {'lines': 1}
+    assert parsed == ['params']
+
+
+#
+# Helpers
+#
+
+parsed = []
+
+
+@app.route(pattern=('API', 'POST', '/schemaTest/orders'), opts={'schema': ORDER_SCHEMA})
+def post_order(request):
+    return monad.Right(request.replace('response',
+                                       monad.Right(app.DictToJsonSerialiser({'lines': len(request.event.body['lines'])}))))
+
+
+def order_event(body):
+    return {"httpMethod": "POST",
+            "path": "/schemaTest/orders",
+            "headers": {"Content-Type": "application/json"},
+            "queryStringParameters": None,
+            "isBase64Encoded": False,
+            "body": body}
+
+
+def params_parser(request):
+    parsed.append('params')
+    return monad.Right(request)
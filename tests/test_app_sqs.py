@@ -0,0 +1,112 @@
+import threading
+
+from metis_fn import monad
+
+from .shared import *
+
+from metis_app import app, app_events
+
+
+def it_identifies_an_sqs_event():
+    event = app_events.event_factory(aws_events.sqs_event_with_messages([('sqsTest-hello', 'm1', '{"id": 1}')]))
+
+    assert isinstance(event, app.SqsMessagesEvent)
+    assert event.kind == 'sqsTest-hello'
+    assert event.messages[0].queue_name == 'sqsTest-hello'
+    assert not event.messages[0].is_parsed()
+    assert event.messages[0].body == {'id': 1}
+
+
+def it_routes_by_queue_arn_pattern():
+    event = app_events.event_factory(aws_events.sqs_event_with_messages([('sqsTest-arn', 'm1', '{}')]))
+
+    assert event.kind == ('SQS', 'arn:aws:sqs:*:*:sqsTest-arn')
+
+
+def it_processes_messages_concurrently_and_reports_failed_message_ids(set_up_env):
+    processed.clear()
+    event = aws_events.sqs_event_with_messages([('sqsTest-orders', 'm1', '{"id": "a"}'),
+                                                ('sqsTest-orders', 'm2', '{"id": "fail"}'),
+                                                ('sqsTest-orders', 'm3', 'not json'),
+                                                ('sqsTest-orders', 'm4', '{"id": "b"}')])
+
+    result = run(event)
+
+    assert result['batchItemFailures'] == [{'itemIdentifier': 'm2'}, {'itemIdentifier': 'm3'}]
+    assert sorted(processed) == ['a', 'b']
+
+
+def it_processes_fifo_messages_in_order_per_message_group(set_up_env):
+    processed.clear()
+    event = aws_events.sqs_event_with_messages([('sqsTest-orders.fifo', 'm1', '{"id": "fail"}'),
+                                                ('sqsTest-orders.fifo', 'm2', '{"id": "a2"}'),
+                                                ('sqsTest-orders.fifo', 'm3', '{"id": "b1"}')],
+                                               group_ids=['a', 'a', 'b'])
+
+    result = run(event)
+
+    assert result['batchItemFailures'] == [{'itemIdentifier': 'm1'}, {'itemIdentifier': 'm2'}]
+    assert processed == ['b1']
+
+
+def it_invokes_a_batch_mode_route_once_with_all_messages(set_up_env):
+    result = run(aws_events.sqs_event_with_messages([('sqsTest-batch', 'm1', '{}'), ('sqsTest-batch', 'm2', '{}')]))
+
+    assert 'batchItemFailures' not in result
+    assert json.loads(result['body']) == {'messages': 2}
+
+
+def it_reports_every_message_when_a_batch_mode_route_fails(set_up_env):
+    result = run(aws_events.sqs_event_with_messages([('sqsTest-batchfail', 'm1', '{}'),
+                                                     ('sqsTest-batchfail', 'm2', '{}')]))
+
+    assert result['batchItemFailures'] == [{'itemIdentifier': 'm1'}, {'itemIdentifier': 'm2'}]
+
+
+def it_reports_the_messages_of_a_failed_batch_mode_group_in_a_mixed_batch(set_up_env):
+    processed.clear()
+    result = run(aws_events.sqs_event_with_messages([('sqsTest-orders', 'm1', '{"id": "a"}'),
+                                                     ('sqsTest-batchfail', 'm2', '{}'),
+                                                     ('sqsTest-batchfail', 'm3', '{}')]))
+
+    assert result['batchItemFailures'] == [{'itemIdentifier': 'm2'}, {'itemIdentifier': 'm3'}]
+    assert processed == ['a']
+
+
+#
+# Helpers
+#
+
+processed = []
+lock = threading.Lock()
+
+
+@app.route(pattern=('SQS', 'sqsTest-orders*'), opts={'max_workers': 2})
+def sqs_message_handler(request):
+    message = request.event.messages[0]
+    if message.body['id'] == 'fail':
+        return monad.Left(request.replace('error', app.AppError(message='message failure', code=500)))
+    with lock:
+        processed.append(message.body['id'])
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser({}))))
+
+
+@app.route(pattern=('SQS', 'arn:aws:sqs:*:*:sqsTest-arn'))
+def sqs_arn_handler(request):
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser({}))))
+
+
+@app.route(pattern='sqsTest-hello')
+def sqs_hello_handler(request):
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser({}))))
+
+
+@app.route(pattern='sqsTest-batch', opts={'mode': 'batch'})
+def sqs_batch_handler(request):
+    return monad.Right(request.replace('response',
+                                       monad.Right(app.DictToJsonSerialiser({'messages': len(request.event.messages)}))))
+
+
+@app.route(pattern='sqsTest-batchfail', opts={'mode': 'batch'})
+def sqs_failing_batch_handler(request):
+    return monad.Left(app.AppError(message='batch failure', code=500))
@@ -0,0 +1,80 @@
+import pytest
+from metis_fn import monad
+
+from .shared import *
+
+from metis_app import app, app_events, app_warmer, logger
+
+
+def it_answers_a_warmer_event_without_the_pipeline(warmer_config, event_bridge_event, mocker):
+    build_request = mocker.spy(app, '_build_request')
+    log_info = mocker.spy(logger, 'info')
+
+    result = app.pipeline(event=warmer_event(event_bridge_event),
+                          context={},
+                          env=Env(),
+                          params_parser=not_expected,
+                          pip_initiator=not_expected,
+                          handler_guard_fn=not_expected)
+
+    assert result == {'warmed': True}
+    assert build_request.call_count == 0
+    assert log_info.call_count == 0
+    assert warmer_config.stats() == {'invocations': 1}
+
+
+def it_runs_the_warm_up_hooks_and_survives_a_failing_hook(warmer_config, event_bridge_event):
+    warmed = []
+    warmer_config.add_hook(lambda: warmed.append('jwks'))
+    warmer_config.add_hook(failing_hook)
+    warmer_config.add_hook(lambda: warmed.append('pool'))
+
+    result = app.compile_pipeline(env=Env(),
+                                  params_parser=not_expected,
+                                  pip_initiator=not_expected,
+                                  handler_guard_fn=not_expected)(warmer_event(event_bridge_event), {})
+
+    assert result == {'warmed': True}
+    assert warmed == ['jwks', 'pool']
+
+
+def it_matches_a_warmer_by_detail_type_or_predicate(warmer_config, event_bridge_event):
+    warmer_config.configure(detail_types=['keep-alive'], predicate=lambda event: event.get('warmer', False))
+
+    assert app_warmer.is_warmer({**event_bridge_event, 'detail-type': 'keep-alive'})
+    assert app_warmer.is_warmer({'warmer': True})
+    assert not app_warmer.is_warmer(event_bridge_event)
+
+
+def it_builds_a_warmer_event_in_the_event_factory(warmer_config, event_bridge_event):
+    event = app_events.event_factory(warmer_event(event_bridge_event))
+
+    assert isinstance(event, app.WarmerEvent)
+    assert event.kind == app_warmer.WARMER_KIND
+
+
+def it_does_not_match_when_not_configured(event_bridge_event):
+    assert not app_warmer.is_warmer(warmer_event(event_bridge_event))
+
+
+#
+# Helpers
+#
+
+@pytest.fixture
+def warmer_config():
+    app_warmer.WarmerConfig().configure(sources=['warmerTest.ping'])
+    yield app_warmer.WarmerConfig()
+    app_warmer.WarmerConfig().clear()
+
+
+def warmer_event(event_bridge_event):
+    return {**event_bridge_event, 'source': 'warmerTest.ping'}
+
+
+def failing_hook():
+    raise ValueError("connection pool unavailable")
+
+
+def not_expected(_value):
+    raise AssertionError("not expected to be called for a warmer event")
@@ -0,0 +1,185 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+from metis_fn import monad
+
+from .shared import *
+
+from metis_app import app, app_async, http_adapter, single_flight
+
+
+def it_shares_one_call_between_concurrent_callers(flights):
+    release = threading.Event()
+    calls = []
+
+    def slow(value):
+        calls.append(value)
+        release.wait(2)
+        return monad.Right(value)
+
+    results = run_concurrently(lambda: flights.group('test').do('k', slow, 1), waiters=4, release=release)
+
+    assert calls == [1]
+    assert [result.value for result in results] == [1] * 5
+    assert flights.group('test').stats() == {'calls': 5, 'coalesced': 4, 'timeouts': 0, 'in_flight': 0}
+
+
+def it_computes_again_once_the_call_completes(flights):
+    flight = flights.group('test')
+
+    flight.do('k', monad.Right, 1)
+    flight.do('k', monad.Right, 2)
+
+    assert flight.stats()['coalesced'] == 0
+
+
+def it_times_out_a_waiter_with_a_504(flights):
+    release = threading.Event()
+    leader = threading.Thread(target=lambda: flights.group('test').do('k', lambda: release.wait(2)))
+    leader.start()
+    wait_for_in_flight()
+
+    result = flights.group('test').do('k', monad.Right, 1, timeout=0.01)
+    release.set()
+    leader.join()
+
+    assert result.is_left()
+    assert result.error().code == 504
+    assert flights.group('test').stats()['timeouts'] == 1
+
+
+def it_raises_the_leaders_exception_in_the_waiters(flights):
+    release = threading.Event()
+
+    def failing():
+        release.wait(2)
+        raise ValueError('boom')
+
+    def call():
+        try:
+            return flights.group('test').do('k', failing)
+        except ValueError as e:
+            return e
+
+    results = run_concurrently(call, waiters=2, release=release)
+
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def it_coalesces_coroutines(flights):
+    calls = []
+
+    async def fetch(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return monad.Right(value)
+
+    async def callers():
+        return await asyncio.gather(*[flights.group('test').do_async('k', fetch, 1) for _ in range(3)])
+
+    results = app_async.EventLoop().run(callers())
+
+    assert calls == [1]
+    assert [result.value for result in results] == [1, 1, 1]
+
+
+def it_shares_the_leaders_response_with_coalesced_requests(flights):
+    release = threading.Event()
+    invocations.clear()
+    releases['reference'] = release
+
+    results = run_concurrently(lambda: run(aws_events.api_event_get_with_path('/coalesced/reference')),
+                               waiters=2,
+                               release=release)
+
+    assert invocations == ['reference']
+    assert {result['statusCode'] for result in results} == {200}
+    assert {result['body'] for result in results} == {json.dumps({'id': 'reference'})}
+
+
+def it_responds_to_a_timed_out_coalesced_request_with_a_504(flights):
+    release = threading.Event()
+    releases['slow'] = release
+    leader = threading.Thread(target=lambda: run(aws_events.api_event_get_with_path('/coalesced/slow')))
+    leader.start()
+    wait_for_in_flight()
+
+    result = run(aws_events.api_event_get_with_path('/coalesced/slow'))
+    release.set()
+    leader.join()
+
+    assert result['statusCode'] == 504
+    assert json.loads(result['body'])['code'] == 504
+
+
+def it_coalesces_http_gets_with_a_coalesce_key(flights, requests_mock):
+    requests_mock.get("https://example.host/jwks", json={'keys': []})
+
+    http_adapter.get(endpoint="https://example.host/jwks", coalesce_key='jwks')
+    http_adapter.get(endpoint="https://example.host/jwks")
+
+    assert flights.group('http_adapter.get').stats()['calls'] == 1
+
+
+#
+# Helpers
+#
+
+invocations = []
+releases = {}
+
+
+@pytest.fixture
+def flights():
+    groups = single_flight.SingleFlightGroups()
+    yield groups
+    groups.clear()
+
+
+@app.route(pattern=('API', 'GET', '/coalesced/reference'))
+@single_flight.route(key_fn=lambda request: request.event.path, timeout=2.0)
+def get_coalesced_reference(request):
+    invocations.append('reference')
+    releases['reference'].wait(2)
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser({'id': 'reference'}))))
+
+
+@app.route(pattern=('API', 'GET', '/coalesced/slow'))
+@single_flight.route(key_fn=lambda request: request.event.path, timeout=0.01)
+def get_coalesced_slow(request):
+    releases['slow'].wait(2)
+    return monad.Right(request.replace('response', monad.Right(app.DictToJsonSerialiser({}))))
+
+
+def run_concurrently(fn, waiters, release):
+    results = []
+    leader = threading.Thread(target=lambda: results.append(fn()))
+    leader.start()
+    wait_for_in_flight()
+    threads = [threading.Thread(target=lambda: results.append(fn())) for _ in range(waiters)]
+    for thread in threads:
+        thread.start()
+    wait_for_coalesced(waiters)
+    release.set()
+    for thread in [leader, *threads]:
+        thread.join()
+    return results
+
+
+def wait_for_in_flight():
+    deadline = time.time() + 2
+    while not any(flight.calls for flight in single_flight.SingleFlightGroups().groups.values()):
+        if time.time() > deadline:
+            raise AssertionError('no call in flight')
+        time.sleep(0.001)
+
+
+def wait_for_coalesced(waiters):
+    deadline = time.time() + 2
+    while sum(flight.coalesced for flight in single_flight.SingleFlightGroups().groups.values()) < waiters:
+        if time.time() > deadline:
+            raise AssertionError('waiters not coalesced')
+        time.sleep(0.001)